@@ -7,6 +7,10 @@ Top level API (:mod:`pyproject2conda`)
 from importlib.metadata import PackageNotFoundError
 from importlib.metadata import version as _version
 
+from ._instrument import Counters, collect_stats
+from .aio import async_render_project, async_render_projects, async_write_project
+from .session import CheckResult, RenderedOutput, Session, WriteResult
+
 try:
     __version__ = _version("pyproject2conda")
 except PackageNotFoundError:  # pragma: no cover
@@ -17,5 +21,14 @@ __author__ = """William P. Krekelberg"""
 
 
 __all__ = [
+    "CheckResult",
+    "Counters",
+    "RenderedOutput",
+    "Session",
+    "WriteResult",
     "__version__",
+    "async_render_project",
+    "async_render_projects",
+    "async_write_project",
+    "collect_stats",
 ]
@@ -0,0 +1,258 @@
+"""
+Content addressed cache of rendered outputs.
+
+Entries live under ``{directory}/objects/{key[:2]}/{key}.json``, where ``key``
+hashes everything affecting an output (relevant ``pyproject.toml`` tables,
+options, environment, style, python, and the pyproject2conda version).  The
+directory can be shared between processes and machines (e.g., an NFS mount or
+a synced CI cache): entries are written atomically, each records a digest of
+its payload which is verified on read, and corrupt entries are discarded.
+Entries are touched on each hit, and :meth:`OutputCache.prune` evicts least
+recently used entries beyond a size limit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ._instrument import count
+from ._writer import atomic_write
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from .session import RenderedOutput
+
+
+logger = logging.getLogger(__name__)
+
+#: Environment variable setting the default cache directory.
+CACHE_DIR_ENV = "PYPROJECT2CONDA_CACHE_DIR"
+
+# Leftover temporary files (from interrupted writes) older than this are pruned.
+_TMP_MAX_AGE = 3600.0
+
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse size (e.g., ``"500M"``) to bytes.
+
+    Accepts an optional ``k``, ``m``, ``g``, or ``t`` suffix (powers of 1024).
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d*)?)\s*([kmgt]?)i?b?\s*", size.lower())
+    if match is None:
+        msg = f"Invalid size {size!r}"
+        raise ValueError(msg)
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _encode(rendered: RenderedOutput) -> dict[str, Any]:
+    return {
+        "env": rendered.env,
+        "style": rendered.style,
+        "python": rendered.python,
+        "output": None if rendered.output is None else str(rendered.output),
+        "name": rendered.name,
+        "channels": list(rendered.channels),
+        "conda_deps": list(rendered.conda_deps),
+        "pip_deps": list(rendered.pip_deps),
+        "content": rendered.content,
+        "output_pip": None if rendered.output_pip is None else str(rendered.output_pip),
+        "content_pip": rendered.content_pip,
+    }
+
+
+def _decode(data: dict[str, Any]) -> RenderedOutput:
+    from .session import RenderedOutput
+
+    return RenderedOutput(
+        env=data["env"],
+        style=data["style"],
+        python=data["python"],
+        output=None if data["output"] is None else Path(data["output"]),
+        name=data["name"],
+        channels=tuple(data["channels"]),
+        conda_deps=tuple(data["conda_deps"]),
+        pip_deps=tuple(data["pip_deps"]),
+        content=data["content"],
+        output_pip=None if data["output_pip"] is None else Path(data["output_pip"]),
+        content_pip=data["content_pip"],
+    )
+
+
+def _load_entry(text: str, key: str) -> RenderedOutput:
+    entry = json.loads(text)
+    if entry["key"] != key or entry["digest"] != _digest(entry["payload"]):
+        msg = "digest mismatch"
+        raise ValueError(msg)
+    return _decode(json.loads(entry["payload"]))
+
+
+@dataclass
+class CacheStats:
+    """Cache statistics for the life of an :class:`OutputCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    #: Entries failing integrity checks (counted as misses as well).
+    corrupt: int = 0
+    stored: int = 0
+    evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "corrupt": self.corrupt,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "hit_rate": self.hit_rate,
+        }
+
+
+@dataclass
+class OutputCache:
+    """
+    Cache of rendered outputs in ``directory``.
+
+    Parameters
+    ----------
+    directory : path-like
+        Cache root.  Created on first write.
+    max_size : int, optional
+        If set, :meth:`prune` evicts entries beyond this many bytes.
+    """
+
+    directory: Path
+    max_size: int | None = None
+    stats: CacheStats = field(default_factory=CacheStats)
+
+    def __post_init__(self) -> None:
+        self.directory = Path(self.directory)
+
+    @property
+    def objects(self) -> Path:
+        """Directory holding cache entries."""
+        return self.directory / "objects"
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Key for json-able ``parts``.  Includes the pyproject2conda version."""
+        from pyproject2conda import __version__
+
+        return _digest(json.dumps([__version__, *parts], sort_keys=True, default=str))
+
+    def path(self, key: str) -> Path:
+        """Path of entry ``key``."""
+        return self.objects / key[:2] / f"{key}.json"
+
+    def _read(self, path: Path, key: str) -> RenderedOutput | None:
+        try:
+            return _load_entry(path.read_text(encoding="utf-8"), key)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Discarding corrupt cache entry %s: %s", path, e)
+            self.stats.corrupt += 1
+            with suppress(OSError):
+                path.unlink()
+            return None
+
+    def get(self, key: str) -> RenderedOutput | None:
+        """Cached output for ``key``, or ``None``."""
+        path = self.path(key)
+        if (rendered := self._read(path, key)) is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        # mark as recently used for :meth:`prune`
+        with suppress(OSError):
+            os.utime(path)
+        return rendered
+
+    def put(self, key: str, rendered: RenderedOutput) -> None:
+        """Store ``rendered`` under ``key``.  Failures are logged, not raised."""
+        payload = json.dumps(_encode(rendered), sort_keys=True)
+        entry = {"key": key, "digest": _digest(payload), "payload": payload}
+        try:
+            atomic_write(json.dumps(entry), self.path(key), encoding="utf-8")
+        except OSError as e:
+            logger.warning("Could not write cache entry %s: %s", key, e)
+            return
+        self.stats.stored += 1
+
+    def get_or_render(
+        self, key: str, render: Callable[[], RenderedOutput]
+    ) -> RenderedOutput:
+        """Cached output for ``key``, or ``render()`` (which is then stored)."""
+        if (rendered := self.get(key)) is None:
+            count("output_cache_misses")
+            rendered = render()
+            self.put(key, rendered)
+        else:
+            count("output_cache_hits")
+        return rendered
+
+    def prune(self, max_size: int | None = None) -> int:
+        """
+        Evict least recently used entries until the cache is at most ``max_size`` bytes.
+
+        Defaults to :attr:`max_size`.  Also removes stale temporary files.
+
+        Returns
+        -------
+        int
+            Number of evicted entries.
+        """
+        if (max_size := self.max_size if max_size is None else max_size) is None:
+            return 0
+
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.objects.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.suffix == ".tmp":
+                if now - stat.st_mtime > _TMP_MAX_AGE:
+                    path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= max_size:
+                break
+            with suppress(OSError):
+                path.unlink()
+                evicted += 1
+            total -= size
+
+        self.stats.evicted += evicted
+        return evicted
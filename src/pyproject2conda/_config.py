@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
@@ -7,8 +8,10 @@ from packaging.utils import NormalizedName, canonicalize_name
 from pydantic import ValidationError
 
 from ._compat import tomllib
+from ._instrument import count, phase
 from ._schema import (
     Env,
+    EnvCondaRequirements,
     EnvRequirements,
     EnvYaml,
     PyProject2CondaSchema,
@@ -39,6 +42,9 @@ class PyProject2CondaConfig:
     all_pythons: list[str] = field(default_factory=list)
     options: dict[str, Any] = field(default_factory=dict)
     _cache: dict[NormalizedName | None, Env] = field(default_factory=dict, init=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self) -> None:
         # only include non null options
@@ -105,9 +111,17 @@ class PyProject2CondaConfig:
         )
 
     def get_env(self, env_name: NormalizedName | None) -> Env:
-        if env_name not in self._cache:
-            self._cache[env_name] = self.schema.get_env(env_name, self.options)
-        return self._cache[env_name]
+        if (env := self._cache.get(env_name)) is not None:
+            count("env_cache_hits")
+            return env
+
+        # Build outside the lock (validation is pure), but only publish the
+        # first result so every reader sees the same ``Env`` instance.
+        count("env_merges")
+        with phase("get_env"):
+            env = self.schema.get_env(env_name, self.options)
+        with self._lock:
+            return self._cache.setdefault(env_name, env)
 
     def parse_pythons(
         self,
@@ -131,7 +145,8 @@ class PyProject2CondaConfig:
             pythons = [pythons]
         return select_pythons(pythons, self.default_pythons, self.all_pythons)
 
-    def _iter_reqs(self, env_name: str) -> Iterator[tuple[str, EnvRequirements]]:
+    def requirements_env(self, env_name: str) -> EnvRequirements:
+        """Requirements options for ``env_name``."""
         env_name = canonicalize_name(env_name)
 
         env = self.get_env(env_name)
@@ -142,68 +157,130 @@ class PyProject2CondaConfig:
                 ext=env.requirements_ext,
             )
 
-        yield (
-            "requirements",
-            env.as_requirements(update={"output": output}),
+        return env.as_requirements(update={"output": output})
+
+    @staticmethod
+    def _conda_update(
+        env_name: NormalizedName,
+        env: Env,
+        python: str | None,
+        ext: str,
+    ) -> dict[str, Any]:
+        if python is None:
+            return {
+                "output": env.output
+                or path_from_template(
+                    template=env.template,
+                    env_name=env_name,
+                    ext=ext,
+                ),
+                "name": conda_env_name_from_template(
+                    name=env.name,
+                    python_version=env.python_version,
+                    env_name=env_name,
+                ),
+            }
+
+        return {
+            "output": path_from_template(
+                template=env.template_python,
+                python_version=python,
+                env_name=env_name,
+                ext=ext,
+            ),
+            "name": conda_env_name_from_template(
+                name=env.name,
+                python_version=python,
+                env_name=env_name,
+            ),
+            "python": python,
+        }
+
+    def yaml_env(self, env_name: str, python: str | None = None) -> EnvYaml:
+        """Yaml options for ``env_name`` and (optionally) single ``python`` version."""
+        env_name = canonicalize_name(env_name)
+        env = self.get_env(env_name)
+        return env.as_yaml(
+            update=self._conda_update(env_name, env, python, ext=env.yaml_ext)
         )
 
-    def _iter_yaml(self, env_name: str) -> Iterator[tuple[str, EnvYaml]]:
+    def json_env(self, env_name: str, python: str | None = None) -> EnvYaml:
+        """Json options for ``env_name`` and (optionally) single ``python`` version."""
         env_name = canonicalize_name(env_name)
         env = self.get_env(env_name)
-        if not (pythons := self._python(env_name)):
-            yield (
-                "yaml",
-                env.as_yaml(
-                    update={
-                        "output": env.output
-                        or path_from_template(
-                            template=env.template,
-                            env_name=env_name,
-                            ext=env.yaml_ext,
-                        ),
-                        "name": conda_env_name_from_template(
-                            name=env.name,
-                            python_version=env.python_version,
-                            env_name=env_name,
-                        ),
-                    }
-                ),
+        return env.as_yaml(
+            update=self._conda_update(env_name, env, python, ext=env.json_ext)
+        )
+
+    def conda_requirements_env(
+        self, env_name: str, python: str | None = None
+    ) -> EnvCondaRequirements:
+        """
+        Conda requirements options for ``env_name`` and (optionally) single ``python`` version.
+
+        Output paths are ``{prefix}-conda{ext}`` and ``{prefix}-pip{ext}``,
+        where ``prefix`` is created from the template and ``ext`` is the
+        requirements extension.
+        """
+        env_name = canonicalize_name(env_name)
+        env = self.get_env(env_name)
+        update = self._conda_update(env_name, env, python, ext="")
+        if (prefix := update["output"]) is not None:
+            update["output"] = prefix.with_name(
+                f"{prefix.name}-conda{env.requirements_ext}"
+            )
+            update["output_pip"] = prefix.with_name(
+                f"{prefix.name}-pip{env.requirements_ext}"
             )
+        return env.as_conda_requirements(update=update)
+
+    def _iter_reqs(self, env_name: str) -> Iterator[tuple[str, EnvRequirements]]:
+        yield ("requirements", self.requirements_env(env_name))
+
+    def _iter_yaml(
+        self, env_name: str, style: str = "yaml"
+    ) -> Iterator[tuple[str, EnvYaml]]:
+        env_name = canonicalize_name(env_name)
+        getter = {
+            "yaml": self.yaml_env,
+            "json": self.json_env,
+            "conda-requirements": self.conda_requirements_env,
+        }[style]
 
+        if not (pythons := self._python(env_name)):
+            yield (style, getter(env_name))
         else:
             for python in pythons:
-                yield (
-                    "yaml",
-                    env.as_yaml(
-                        update={
-                            "output": path_from_template(
-                                template=env.template_python,
-                                python_version=python,
-                                env_name=env_name,
-                                ext=env.yaml_ext,
-                            ),
-                            "name": conda_env_name_from_template(
-                                name=env.name,
-                                python_version=python,
-                                env_name=env_name,
-                            ),
-                            "python": python,
-                        }
-                    ),
-                )
+                yield (style, getter(env_name, python))
 
-    def iter_envs(
+    def iter_named_envs(
         self, envs: Iterable[str] | None = None
-    ) -> Iterator[tuple[str, EnvRequirements | EnvYaml]]:
+    ) -> Iterator[tuple[NormalizedName, str, EnvRequirements | EnvYaml]]:
+        """
+        Iterate over planned outputs.
+
+        Yields
+        ------
+        tuple of str, str, EnvRequirements or EnvYaml
+            ``(env_name, style, options)`` for each output.
+        """
         if not envs:
             envs = self.schema.envs.keys()  # pylint: disable=no-member
 
         for env_name in (canonicalize_name(e) for e in envs):
             for style in self.get_env(env_name).style:
-                if style == "yaml":
-                    yield from self._iter_yaml(env_name)
-                elif style == "requirements":
-                    yield from self._iter_reqs(env_name)
+                if style == "requirements":
+                    for _, reqs_env in self._iter_reqs(env_name):
+                        yield env_name, style, reqs_env
+                elif style in {"yaml", "json", "conda-requirements"}:
+                    for _, yaml_env in self._iter_yaml(env_name, style):
+                        yield env_name, style, yaml_env
                 else:  # pragma: no cover
                     msg = f"unknown style {style}"
                     raise ValueError(msg)
+
+    def iter_envs(
+        self, envs: Iterable[str] | None = None
+    ) -> Iterator[tuple[str, EnvRequirements | EnvYaml]]:
+        for _, style, env in self.iter_named_envs(envs):
+            yield style, env
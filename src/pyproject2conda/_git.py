@@ -0,0 +1,234 @@
+"""
+Git queries (:mod:`~pyproject2conda._git`)
+==========================================
+
+Files changed since a revision are computed with a single ``git diff`` (plus a
+listing of untracked files) per repository and revision, and cached for the
+life of the process.  Many projects checked in one process (e.g., with
+``batch``) therefore cost one git call, regardless of repository size.
+
+Inputs git cannot report on (ignored files, e.g., a wheelhouse, and files
+outside the repository, e.g., shared mapping tables) are always considered
+changed.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import IO
+
+    from ._typing_compat import Self
+
+
+_LOCK = threading.Lock()
+_TOPLEVEL_CACHE: dict[Path, Path] = {}
+_CHANGED_CACHE: dict[tuple[Path, str], frozenset[Path]] = {}
+_TRACKED_CACHE: dict[Path, frozenset[Path]] = {}
+_IGNORED_CACHE: dict[Path, bool] = {}
+
+
+def _git(*args: str, cwd: Path) -> str:
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except FileNotFoundError as e:
+        msg = "git executable not found"
+        raise ValueError(msg) from e
+    except subprocess.CalledProcessError as e:
+        msg = f"git {' '.join(args)} failed: {e.stderr.strip()}"
+        raise ValueError(msg) from e
+    return result.stdout
+
+
+def toplevel(path: str | Path) -> Path:
+    """Root of git repository containing ``path``."""
+    directory = Path(path).absolute()
+    if not directory.is_dir():
+        directory = directory.parent
+
+    with _LOCK:
+        if (out := _TOPLEVEL_CACHE.get(directory)) is None:
+            out = _TOPLEVEL_CACHE[directory] = Path(
+                _git("rev-parse", "--show-toplevel", cwd=directory).strip()
+            ).resolve()
+    return out
+
+
+def changed_files(rev: str, path: str | Path = ".") -> frozenset[Path]:
+    """
+    Absolute paths of files changed since ``rev``.
+
+    Includes committed and uncommitted changes to tracked files, and untracked
+    (not ignored) files, of the repository containing ``path``.
+    """
+    root = toplevel(path)
+    with _LOCK:
+        if (out := _CHANGED_CACHE.get((root, rev))) is None:
+            names = _git("diff", "--name-only", "-z", rev, "--", cwd=root).split("\0")
+            names.extend(
+                _git(
+                    "ls-files", "--others", "--exclude-standard", "-z", cwd=root
+                ).split("\0")
+            )
+            out = _CHANGED_CACHE[root, rev] = frozenset(
+                root / name for name in names if name
+            )
+    return out
+
+
+def tracked_files(path: str | Path = ".") -> frozenset[Path]:
+    """Absolute paths of files tracked in the repository containing ``path``."""
+    root = toplevel(path)
+    with _LOCK:
+        if (out := _TRACKED_CACHE.get(root)) is None:
+            out = _TRACKED_CACHE[root] = frozenset(
+                root / name
+                for name in _git("ls-files", "-z", cwd=root).split("\0")
+                if name
+            )
+    return out
+
+
+def has_ignored(directory: Path) -> bool:
+    """Whether ``directory`` contains files ignored by git."""
+    directory = directory.resolve()
+    with _LOCK:
+        if (out := _IGNORED_CACHE.get(directory)) is None:
+            out = _IGNORED_CACHE[directory] = bool(
+                _git(
+                    "ls-files",
+                    "--others",
+                    "--ignored",
+                    "--exclude-standard",
+                    "--directory",
+                    "-z",
+                    "--",
+                    ".",
+                    cwd=directory,
+                )
+            )
+    return out
+
+
+def _path_changed(
+    path: Path, root: Path, changed: frozenset[Path], tracked: frozenset[Path]
+) -> bool:
+    if not path.exists():
+        # missing inputs (e.g., optional .python-version) unless deleted
+        return path in changed
+    if not path.is_relative_to(root):
+        return True
+    if path.is_dir():
+        return any(c.is_relative_to(path) for c in changed) or has_ignored(path)
+    return path in changed or path not in tracked
+
+
+def any_changed(paths: Iterable[str | Path], rev: str) -> bool:
+    """
+    Whether any of ``paths`` changed since ``rev``.
+
+    Directories changed if any file under them changed.  Paths git cannot
+    report on (ignored, or outside the repository of the first path) are
+    always changed.
+    """
+    resolved = [Path(p).resolve() for p in paths]
+    if not resolved:
+        return False
+    root = toplevel(resolved[0])
+    changed = changed_files(rev, root)
+    tracked = tracked_files(root)
+    return any(_path_changed(p, root, changed, tracked) for p in resolved)
+
+
+def rev_list(revs: Iterable[str], cwd: str | Path = ".") -> list[str]:
+    """
+    Commits for ``revs``, oldest first.
+
+    Ranges (``A..B``) are expanded.  Other values are single commits.
+    """
+    cwd = Path(cwd)
+    out: list[str] = []
+    for rev in revs:
+        if ".." in rev:
+            out.extend(_git("rev-list", "--reverse", rev, cwd=cwd).split())
+        else:
+            out.append(
+                _git("rev-parse", "--verify", f"{rev}^{{commit}}", cwd=cwd).strip()
+            )
+    return out
+
+
+class CatFile:
+    """
+    Long-lived ``git cat-file --batch`` process.
+
+    Use as a context manager.  Reads are serialized, so a single instance can be
+    shared between threads.
+    """
+
+    def __init__(self, cwd: str | Path = ".") -> None:
+        self._cwd = Path(cwd)
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen[bytes] | None = None
+
+    def __enter__(self) -> Self:
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=self._cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if (proc := self._proc) is not None:
+            cast("IO[bytes]", proc.stdin).close()
+            _ = proc.wait()
+            cast("IO[bytes]", proc.stdout).close()
+            self._proc = None
+
+    def read(self, obj: str) -> tuple[str, bytes] | None:
+        """
+        Read object ``obj`` (e.g., ``"{rev}:path/to/file"``).
+
+        Returns
+        -------
+        tuple of str, bytes or None
+            Object name (sha) and contents, or ``None`` if missing.
+        """
+        if (proc := self._proc) is None:
+            msg = "CatFile must be used as a context manager"
+            raise RuntimeError(msg)
+        stdin, stdout = cast("IO[bytes]", proc.stdin), cast("IO[bytes]", proc.stdout)
+
+        with self._lock:
+            _ = stdin.write(obj.encode() + b"\n")
+            stdin.flush()
+            header = stdout.readline().decode().split()
+            if len(header) != 3:  # ruff: ignore[magic-value-comparison]
+                # "<obj> missing" (or ambiguous)
+                return None
+            sha, _, size = header
+            data = stdout.read(int(size))
+            _ = stdout.read(1)  # trailing newline
+        return sha, data
+
+
+def clear_cache() -> None:
+    """Clear cached git queries."""
+    with _LOCK:
+        _TOPLEVEL_CACHE.clear()
+        _CHANGED_CACHE.clear()
+        _TRACKED_CACHE.clear()
+        _IGNORED_CACHE.clear()
@@ -0,0 +1,195 @@
+"""
+Render environments for many git revisions.
+
+``pyproject.toml`` (and ``.python-version*``) blobs for every revision are read
+through one ``git cat-file --batch`` process.  Revisions whose relevant tables
+are identical share a single rendering, and distinct revisions are rendered in
+a thread pool.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING
+
+from ._compat import tomllib
+from ._config import PyProject2CondaConfig
+from ._git import CatFile, rev_list, toplevel
+from ._schema import PyProjectRequirementsWith2CondaSchema
+from ._utils import parse_default_pythons
+from .requirements import RequirementsConfig
+from .session import render_spec
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Any
+
+    from .session import RenderedOutput, ResolvedCache
+
+
+#: ``project`` keys affecting outputs.
+_PROJECT_KEYS = (
+    "name",
+    "dependencies",
+    "optional-dependencies",
+    "requires-python",
+    "classifiers",
+)
+
+
+def relevant_tables(data: dict[str, Any]) -> dict[str, Any]:
+    """Subset of parsed ``pyproject.toml`` affecting outputs."""
+    project = data.get("project", {})
+    return {
+        "project": {k: project[k] for k in _PROJECT_KEYS if k in project},
+        "build-system": data.get("build-system", {}).get("requires"),
+        "dependency-groups": data.get("dependency-groups"),
+        "tool": data.get("tool", {}).get("pyproject2conda"),
+    }
+
+
+@dataclass(frozen=True)
+class RevisionInput:
+    """Inputs to render at a single revision."""
+
+    rev: str
+    #: Parsed ``pyproject.toml``.  ``None`` if missing at ``rev``.
+    data: dict[str, Any] | None
+    default_pythons: tuple[str, ...]
+    #: Hash of relevant inputs.  Revisions with equal keys render identically.
+    key: str
+    #: Error parsing ``pyproject.toml``.
+    error: Exception | None = None
+
+
+def _key(data: dict[str, Any] | None, default_pythons: Iterable[str]) -> str:
+    payload = {
+        "tables": None if data is None else relevant_tables(data),
+        "pythons": list(default_pythons),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def read_revisions(
+    revs: Iterable[str],
+    pyproject: str | Path = "pyproject.toml",
+) -> list[RevisionInput]:
+    """Read inputs at each of ``revs`` (see :func:`~pyproject2conda._git.rev_list`)."""
+    pyproject = Path(pyproject).absolute()
+    root = toplevel(pyproject)
+    rel = PurePosixPath(pyproject.resolve().relative_to(root).as_posix())
+    # .python-version files are read from the current directory, as in ``project``.
+    cwd = PurePosixPath(Path.cwd().resolve().relative_to(root).as_posix())
+
+    # blob sha -> parsed (or parse error).  Unchanged files are parsed once.
+    parsed: dict[str, dict[str, Any] | tomllib.TOMLDecodeError] = {}
+    out: list[RevisionInput] = []
+    with CatFile(root) as cat:
+        for rev in rev_list(revs, root):
+            data: dict[str, Any] | tomllib.TOMLDecodeError | None = None
+            if (blob := cat.read(f"{rev}:{rel}")) is not None:
+                sha, content = blob
+                if (data := parsed.get(sha)) is None:
+                    try:
+                        data = tomllib.loads(content.decode("utf-8"))
+                    except tomllib.TOMLDecodeError as e:
+                        data = e
+                    parsed[sha] = data
+
+            default_pythons: list[str] = []
+            for name in (".python-version-default", ".python-version"):
+                if (blob := cat.read(f"{rev}:{cwd / name}")) is not None and (
+                    default_pythons := parse_default_pythons(blob[1].decode())
+                ):
+                    break
+
+            if isinstance(data, tomllib.TOMLDecodeError):
+                revision = RevisionInput(rev, None, (), f"error:{sha}", data)
+            else:
+                revision = RevisionInput(
+                    rev, data, tuple(default_pythons), _key(data, default_pythons)
+                )
+            out.append(revision)
+    return out
+
+
+def render_revision(
+    revision: RevisionInput,
+    envs: Iterable[str] | None = None,
+    options: dict[str, Any] | None = None,
+    root: str | Path | None = None,
+) -> list[RenderedOutput]:
+    """
+    Render planned outputs (without headers) for a single revision.
+
+    ``mapping-files`` are read from the working tree, relative to ``root``.
+    """
+    if revision.error is not None:
+        raise revision.error
+    if revision.data is None:
+        msg = f"no pyproject.toml at {revision.rev}"
+        raise ValueError(msg)
+
+    schema = PyProjectRequirementsWith2CondaSchema.model_validate(revision.data)
+    requirements = RequirementsConfig.from_schema(schema, root=root)
+    config = PyProject2CondaConfig.from_schema(
+        schema.tool.pyproject2conda,
+        default_pythons=revision.default_pythons,
+        all_pythons=schema.all_python_versions,
+        options=options,
+    )
+
+    resolved: ResolvedCache = {}
+    return [
+        render_spec(
+            requirements,
+            config,
+            env,
+            style,
+            spec,
+            header_cmd=None,
+            resolved=resolved,
+        )
+        for env, style, spec in config.iter_named_envs(envs)
+    ]
+
+
+def iter_history(
+    revs: Iterable[str],
+    pyproject: str | Path = "pyproject.toml",
+    envs: Iterable[str] | None = None,
+    options: dict[str, Any] | None = None,
+    max_workers: int | None = None,
+) -> Iterator[tuple[str, list[RenderedOutput] | Exception]]:
+    """
+    Render outputs at each revision.
+
+    Yields
+    ------
+    tuple of str, list of RenderedOutput or Exception
+        Revision (commit sha) and its outputs, or the error raised rendering it,
+        in the order of ``revs``.
+    """
+    revisions = read_revisions(revs, pyproject)
+    root = Path(pyproject).parent
+    envs = None if envs is None else list(envs)
+
+    def _render(revision: RevisionInput) -> list[RenderedOutput] | Exception:
+        try:
+            return render_revision(revision, envs, options, root=root)
+        except Exception as e:  # ruff:ignore[blind-except]  # pylint: disable=broad-exception-caught
+            return e
+
+    # render each distinct input once
+    unique = {r.key: r for r in reversed(revisions)}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = dict(zip(unique, pool.map(_render, unique.values()), strict=True))
+
+    for revision in revisions:
+        yield revision.rev, results[revision.key]
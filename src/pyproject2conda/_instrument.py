@@ -0,0 +1,432 @@
+"""
+Opt-in timing of pipeline phases.
+
+Phases (``parse``, ``validate``, ``get_env``, ``resolve``, ``markers``,
+``render``, and ``write``) are wrapped in :func:`phase` (or decorated with
+:func:`timed`).  While a :class:`Timings` recorder is active (see
+:func:`record`), each phase accumulates call counts, wall time, CPU time (of
+the calling thread), and exclusive wall time (excluding nested phases), keyed
+by phase and the environment and output of the enclosing :func:`scope`.
+Each command's work on a ``pyproject.toml`` file is the ``project`` phase
+(see :func:`project`).  Hooks (see :func:`hook`) are notified as phases start
+and end (e.g., to profile a single phase).  With no active recorder or hook, a
+phase costs a single list check.
+
+Gauges (see :func:`register_gauge`) report sizes of long lived caches, and
+counters (see :func:`count` and :func:`collect_stats`) count units of work and
+cache hits.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import UserDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import TYPE_CHECKING, Protocol, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+    from typing import Any, ParamSpec
+
+    P = ParamSpec("P")
+    R = TypeVar("R")
+
+
+#: Known phases, in pipeline order (used to order reports).
+PHASES = (
+    "project",
+    "parse",
+    "validate",
+    "get_env",
+    "resolve",
+    "markers",
+    "render",
+    "write",
+)
+
+#: Statistics key of ``phase``, ``env``, and ``output``.
+_Key = tuple[str, "str | None", "str | None"]
+
+
+@dataclass
+class PhaseStats:
+    """Accumulated statistics of a phase."""
+
+    calls: int = 0
+    #: Wall time (seconds), including nested phases.
+    wall: float = 0.0
+    #: Wall time (seconds), excluding nested phases.
+    exclusive: float = 0.0
+    #: CPU time (seconds) of the calling thread, including nested phases.
+    cpu: float = 0.0
+
+    def add(self, other: PhaseStats) -> None:
+        """Accumulate ``other``."""
+        self.calls += other.calls
+        self.wall += other.wall
+        self.exclusive += other.exclusive
+        self.cpu += other.cpu
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "calls": self.calls,
+            "wall": self.wall,
+            "exclusive": self.exclusive,
+            "cpu": self.cpu,
+        }
+
+
+def phase_order(name: str) -> tuple[int, str]:
+    """Sort key of phase ``name`` (pipeline order, then unknown phases by name)."""
+    return (PHASES.index(name) if name in PHASES else len(PHASES), name)
+
+
+@dataclass
+class Timings:
+    """Statistics of phases recorded while active."""
+
+    stats: dict[_Key, PhaseStats] = field(default_factory=dict)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def add(
+        self,
+        name: str,
+        env: str | None,
+        output: str | None,
+        wall: float,
+        exclusive: float,
+        cpu: float,
+    ) -> None:
+        """Record a single call of phase ``name``."""
+        with self._lock:
+            if (stats := self.stats.get((name, env, output))) is None:
+                stats = self.stats[name, env, output] = PhaseStats()
+            stats.add(PhaseStats(1, wall, exclusive, cpu))
+
+    def totals(self) -> dict[str, PhaseStats]:
+        """Statistics by phase (summed over environments and outputs)."""
+        out: dict[str, PhaseStats] = {}
+        with self._lock:
+            for (name, _, _), stats in self.stats.items():
+                out.setdefault(name, PhaseStats()).add(stats)
+        return {name: out[name] for name in sorted(out, key=phase_order)}
+
+    def by_output(self) -> dict[tuple[str | None, str | None], float]:
+        """Exclusive wall time by ``(env, output)`` (summed over phases)."""
+        out: dict[tuple[str | None, str | None], float] = {}
+        with self._lock:
+            for (_, env, output), stats in self.stats.items():
+                out[env, output] = out.get((env, output), 0.0) + stats.exclusive
+        return out
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        with self._lock:
+            records = [
+                {"phase": name, "env": env, "output": output, **stats.to_dict()}
+                for (name, env, output), stats in self.stats.items()
+            ]
+        records.sort(
+            key=lambda r: (phase_order(r["phase"]), r["env"] or "", r["output"] or "")
+        )
+        return {
+            "phases": {name: stats.to_dict() for name, stats in self.totals().items()},
+            "records": records,
+        }
+
+    def to_json(self) -> str:
+        """Json string of :meth:`to_dict`."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def table(self) -> str:
+        """Summary table of phases, and of exclusive time per output."""
+        lines = [
+            f"{'phase':<12}{'calls':>8}{'wall (s)':>12}{'excl (s)':>12}{'cpu (s)':>12}"
+        ]
+        lines.extend(
+            f"{name:<12}{s.calls:>8}{s.wall:>12.4f}{s.exclusive:>12.4f}{s.cpu:>12.4f}"
+            for name, s in self.totals().items()
+        )
+        outputs = sorted(
+            (
+                (key, seconds)
+                for key, seconds in self.by_output().items()
+                if key != (None, None)
+            ),
+            key=lambda x: -x[1],
+        )
+        if outputs:
+            lines.extend(["", f"{'env':<20}{'output':<36}{'excl (s)':>12}"])
+            lines.extend(
+                f"{env or '-':<20}{output or '-':<36}{seconds:>12.4f}"
+                for (env, output), seconds in outputs
+            )
+        return "\n".join(lines)
+
+
+# * Recording ------------------------------------------------------------------
+# Stack of active recorders.  Module level (not a context variable), so that
+# phases in worker threads are recorded.
+_ACTIVE: list[Timings] = []
+_SCOPE: ContextVar[tuple[str | None, str | None]] = ContextVar(
+    "_SCOPE", default=(None, None)
+)
+_PROJECT: ContextVar[str | None] = ContextVar("_PROJECT", default=None)
+_LOCAL = threading.local()
+
+
+class PhaseHook(Protocol):
+    """Callbacks on phase boundaries (called in the thread running the phase)."""
+
+    def phase_enter(self, name: str) -> None: ...
+
+    def phase_exit(self, name: str) -> None: ...
+
+
+_HOOKS: list[PhaseHook] = []
+
+
+def active() -> Timings | None:
+    """Currently active recorder, if any."""
+    return _ACTIVE[-1] if _ACTIVE else None
+
+
+@contextmanager
+def record() -> Generator[Timings, None, None]:
+    """
+    Record phases (from all threads) within the context.
+
+    Yields
+    ------
+    Timings
+        Statistics, filled in as phases complete.
+    """
+    timings = Timings()
+    _ACTIVE.append(timings)
+    try:
+        yield timings
+    finally:
+        _ACTIVE.remove(timings)
+
+
+@contextmanager
+def hook(callbacks: PhaseHook) -> Generator[None, None, None]:
+    """Notify ``callbacks`` of phases (from all threads) within the context."""
+    _HOOKS.append(callbacks)
+    try:
+        yield
+    finally:
+        _HOOKS.remove(callbacks)
+
+
+@contextmanager
+def scope(env: str | None = None, output: object = None) -> Generator[None, None, None]:
+    """Attribute phases within the context to ``env`` and ``output``."""
+    if not _ACTIVE:
+        yield
+        return
+    token = _SCOPE.set((env, None if output is None else str(output)))
+    try:
+        yield
+    finally:
+        _SCOPE.reset(token)
+
+
+@contextmanager
+def project(path: object) -> Generator[None, None, None]:
+    """
+    Time work on project ``path`` within the context as phase ``project``.
+
+    Phases within the context are attributed to the project (see
+    :func:`current_project`).
+    """
+    if not (_ACTIVE or _HOOKS):
+        yield
+        return
+    token = _PROJECT.set(str(path))
+    try:
+        with phase("project"):
+            yield
+    finally:
+        _PROJECT.reset(token)
+
+
+def current_project() -> str | None:
+    """Project of the enclosing :func:`project` context, if any."""
+    return _PROJECT.get()
+
+
+class _Phase:
+    __slots__ = ("_cpu", "_timings", "_wall", "name", "nested")
+
+    def __init__(self, timings: Timings | None, name: str) -> None:
+        self._timings = timings
+        self.name = name
+        self.nested = 0.0
+        self._wall = self._cpu = 0.0
+
+    def __enter__(self) -> None:
+        stack: list[_Phase] | None = getattr(_LOCAL, "stack", None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        stack.append(self)
+        for callbacks in _HOOKS:
+            callbacks.phase_enter(self.name)
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        stack: list[_Phase] = _LOCAL.stack
+        _ = stack.pop()
+        if stack:
+            stack[-1].nested += wall
+        for callbacks in _HOOKS:
+            callbacks.phase_exit(self.name)
+        if self._timings is not None:
+            self._timings.add(
+                self.name,
+                *_SCOPE.get(),
+                wall=wall,
+                exclusive=wall - self.nested,
+                cpu=cpu,
+            )
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: object) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name: str) -> _Phase | _NullPhase:
+    """
+    Context manager timing phase ``name``.
+
+    No-op unless recording (or hooked), or if already within phase ``name``
+    (in this thread), so that recursive calls count once.
+    """
+    if not (_ACTIVE or _HOOKS) or (
+        (stack := getattr(_LOCAL, "stack", None)) and stack[-1].name == name
+    ):
+        return _NULL_PHASE
+    return _Phase(_ACTIVE[-1] if _ACTIVE else None, name)
+
+
+def timed(name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorator timing calls as phase ``name``."""
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not (_ACTIVE or _HOOKS):
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# * Gauges ---------------------------------------------------------------------
+_GAUGES: dict[str, Callable[[], int]] = {}
+
+
+def register_gauge(name: str, func: Callable[[], int]) -> None:
+    """Register ``func`` reporting the current value of gauge ``name``."""
+    _GAUGES[name] = func
+
+
+def gauges() -> dict[str, int]:
+    """Current value of each registered gauge."""
+    return {name: func() for name, func in sorted(_GAUGES.items())}
+
+
+# * Counters -------------------------------------------------------------------
+class Counters(UserDict[str, int]):
+    """Counts of work and cache hits by name (e.g., ``marker_evaluations``)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, n: int = 1) -> None:
+        """Add ``n`` to counter ``name``."""
+        with self._lock:
+            self[name] = self.get(name, 0) + n
+
+    def to_json(self) -> str:
+        """Json string of counters (sorted by name)."""
+        return json.dumps(dict(sorted(self.items())), indent=2)
+
+    def table(self) -> str:
+        """Summary table of counters."""
+        lines = [f"{'counter':<30}{'count':>12}"]
+        lines.extend(f"{name:<30}{value:>12}" for name, value in sorted(self.items()))
+        return "\n".join(lines)
+
+
+# Stack of active counters (module level, so worker threads are counted).
+_COUNTERS: list[Counters] = []
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add ``n`` to counter ``name`` of active counters (no-op if none)."""
+    if _COUNTERS:
+        for counters in _COUNTERS:
+            counters.add(name, n)
+
+
+@contextmanager
+def collect_stats() -> Generator[Counters, None, None]:
+    """
+    Count work (from all threads) within the context.
+
+    Counters are ``requirements_parsed``, ``marker_evaluations`` (and
+    ``marker_cache_hits``), ``resolve_cache_hits`` and ``resolve_cache_misses``
+    (extras and dependency groups), ``env_merges`` (and ``env_cache_hits``),
+    ``outputs_rendered``, ``outputs_written``, ``outputs_linked``,
+    ``outputs_skipped`` (not updated, see ``overwrite``),
+    ``output_cache_hits`` and ``output_cache_misses`` (``--cache-dir``), and
+    ``projects_unchanged`` (``--since``).  Counters only appear once
+    incremented.
+
+    Yields
+    ------
+    Counters
+        Dictionary of counts, updated as work is done.
+
+    Examples
+    --------
+    >>> from pyproject2conda import Session, collect_stats
+    >>> with collect_stats() as stats:
+    ...     out = Session("tests/data/test-pyproject.toml").render(
+    ...         "test", python="3.10"
+    ...     )
+    >>> stats["outputs_rendered"]
+    1
+    """
+    counters = Counters()
+    _COUNTERS.append(counters)
+    try:
+        yield counters
+    finally:
+        # remove by identity (counters compare equal by contents)
+        _COUNTERS[:] = [x for x in _COUNTERS if x is not counters]
@@ -0,0 +1,203 @@
+"""
+Cross process locking of outputs.
+
+Concurrent invocations against the same ``pyproject.toml`` serialize on an
+advisory lock file.  After generating outputs, the lock holder records a
+*claim*: a hash of the invocation inputs and the signature of each output.  A
+process that waited for the lock and finds a claim, completed while it waited,
+for the same inputs (and with outputs unchanged since), reuses those outputs
+instead of regenerating them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+    from typing import IO, Any
+
+
+logger = logging.getLogger(__name__)
+
+#: Environment variable overriding the directory holding lock files.
+LOCK_DIR_ENV = "PYPROJECT2CONDA_LOCK_DIR"
+
+
+# * Lock file ------------------------------------------------------------------
+if sys.platform == "win32":  # pragma: no cover
+    import msvcrt
+
+    def _try_lock(f: IO[Any]) -> bool:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(f: IO[Any]) -> None:
+        _ = f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(f: IO[Any]) -> bool:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(f: IO[Any]) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def lock_path(pyproject: str | Path) -> Path:
+    """Lock file for ``pyproject``.  Kept outside the project tree."""
+    root = Path(os.environ.get(LOCK_DIR_ENV) or tempfile.gettempdir())
+    digest = hashlib.sha256(str(Path(pyproject).resolve()).encode()).hexdigest()
+    return root / "pyproject2conda-locks" / f"{digest[:32]}.lock"
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float | None = None) -> Generator[float, None, None]:
+    """
+    Hold exclusive advisory lock on ``path``.
+
+    Yields
+    ------
+    float
+        Seconds spent waiting for the lock (zero if it was free).
+
+    Raises
+    ------
+    TimeoutError
+        If lock is not acquired within ``timeout`` seconds.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+    waited, delay = 0.0, 0.01
+    with path.open("a+", encoding="utf-8") as f:
+        while not _try_lock(f):
+            waited = time.monotonic() - start
+            if timeout is not None and waited >= timeout:
+                msg = f"Could not acquire lock {path} within {timeout} seconds"
+                raise TimeoutError(msg)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+        if waited:
+            waited = time.monotonic() - start
+        try:
+            yield waited
+        finally:
+            _unlock(f)
+
+
+# * Claims ---------------------------------------------------------------------
+def _output_signature(path: Path) -> list[int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def inputs_key(paths: Iterable[Path], *extra: Any) -> str:
+    """Hash of input file contents (missing files allowed) and ``extra`` (json-able)."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(str(path).encode())
+        h.update(path.read_bytes() if path.exists() else b"\0")
+    h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+@dataclass
+class Claim:
+    """Claim on outputs of a single invocation.  See :func:`claim_outputs`."""
+
+    path: Path
+    key: str
+    started: float
+    #: Whether outputs of a concurrent invocation were reused.
+    reused: bool = False
+    outputs: list[str] = field(default_factory=list)
+
+    def _read(self) -> dict[str, Any] | None:
+        with suppress(OSError, ValueError):
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else None
+        return None
+
+    def check_reusable(self) -> bool:
+        """Whether a claim completed since we started matches our inputs."""
+        data = self._read()
+        if (
+            data is None
+            or data.get("key") != self.key
+            or data.get("completed", 0.0) < self.started
+        ):
+            return False
+
+        outputs: dict[str, Any] = data.get("outputs", {})
+        if any(_output_signature(Path(p)) != sig for p, sig in outputs.items()):
+            return False
+
+        self.outputs = list(outputs)
+        return True
+
+    def complete(self, outputs: Iterable[str | Path]) -> None:
+        """Record ``outputs`` as generated for this claim's inputs."""
+        from ._writer import atomic_write
+
+        self.outputs = [str(Path(p).resolve()) for p in outputs]
+        atomic_write(
+            json.dumps({
+                "key": self.key,
+                "pid": os.getpid(),
+                "completed": time.time(),
+                "outputs": {p: _output_signature(Path(p)) for p in self.outputs},
+            }),
+            self.path,
+            encoding="utf-8",
+        )
+
+
+@contextmanager
+def claim_outputs(
+    pyproject: str | Path,
+    key: str,
+    timeout: float | None = None,
+) -> Generator[Claim, None, None]:
+    """
+    Lock outputs of ``pyproject`` and claim the work identified by ``key``.
+
+    If ``claim.reused`` is ``True``, a concurrent invocation with identical
+    inputs finished while we waited and its outputs are up to date, so there is
+    nothing to do.  Otherwise, the caller should generate outputs and call
+    :meth:`Claim.complete`.
+
+    Yields
+    ------
+    Claim
+        Claim, held while the lock is held.
+    """
+    path = lock_path(pyproject)
+    claim = Claim(path=path.with_suffix(".json"), key=key, started=time.time())
+    with file_lock(path, timeout=timeout) as waited:
+        if waited:
+            logger.info("Waited %.3f seconds for lock on %s", waited, pyproject)
+        claim.reused = claim.check_reusable()
+        yield claim
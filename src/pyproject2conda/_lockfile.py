@@ -0,0 +1,206 @@
+"""
+Pin requirements to versions in a lockfile.
+
+Supports ``uv.lock`` and ``pylock.toml`` (:pep:`751`) files.  A lockfile is
+parsed once into an index of locked versions by package name.  Packages locked
+at several versions (e.g., ``uv`` forks by python version) are selected by
+evaluating their markers for the target python.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from packaging.markers import Marker
+from packaging.specifiers import SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from ._compat import tomllib
+from ._instrument import register_gauge
+from ._normalized_requirements import FallbackRequirement
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any, TypeVar
+
+    from packaging.utils import NormalizedName
+
+    from ._normalized_requirements import NormalizedRequirement
+
+    R = TypeVar("R", bound=NormalizedRequirement)
+
+
+logger = logging.getLogger(__name__)
+
+# (marker, version).  ``None`` marker applies everywhere.
+_Entry = tuple["Marker | None", str]
+
+
+def _parse_marker(markers: str | Iterable[str] | None) -> Marker | None:
+    if not markers:
+        return None
+    if isinstance(markers, str):
+        return Marker(markers)
+    return Marker(" or ".join(f"({m})" for m in markers))
+
+
+def _iter_entries(data: dict[str, Any]) -> Iterable[tuple[str, _Entry]]:
+    if "package" in data:
+        # uv.lock.  Packages without a version (e.g., virtual workspace roots)
+        # cannot be pinned.
+        for package in data["package"]:
+            if (version := package.get("version")) is not None:
+                marker = _parse_marker(package.get("resolution-markers"))
+                yield package["name"], (marker, version)
+    elif "packages" in data:
+        # pylock.toml
+        for package in data["packages"]:
+            if (version := package.get("version")) is not None:
+                yield package["name"], (_parse_marker(package.get("marker")), version)
+    else:
+        msg = "Lockfile must be a uv.lock or pylock.toml file"
+        raise ValueError(msg)
+
+
+def _marker_env(python_version: str | None) -> dict[str, str] | None:
+    if python_version is None:
+        return None
+    return {"python_version": python_version, "python_full_version": python_version}
+
+
+def _satisfies(specifier: SpecifierSet, version: str) -> bool:
+    """Whether locked ``version`` satisfies ``specifier`` (unparsable only an empty one)."""
+    try:
+        return specifier.contains(Version(version), prereleases=True)
+    except InvalidVersion:
+        return not specifier
+
+
+@dataclass
+class Lockfile:
+    """Locked versions from ``uv.lock`` or ``pylock.toml`` file ``path``."""
+
+    path: Path
+    _packages: dict[str, list[_Entry]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _versions: dict[tuple[str, str | None], str | None] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.path = Path(self.path)
+        with self.path.open("rb") as f:
+            data = tomllib.load(f)
+        for name, entry in _iter_entries(data):
+            self._packages.setdefault(canonicalize_name(name), []).append(entry)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._packages
+
+    def version(
+        self, name: NormalizedName | str, python_version: str | None = None
+    ) -> str | None:
+        """
+        Locked version of ``name`` for ``python_version``.
+
+        Markers are evaluated for ``python_version`` (and, for other marker
+        variables, the running interpreter).  Returns ``None`` if ``name`` is not
+        locked for ``python_version``.
+        """
+        key = (name, python_version)
+        if key in self._versions:
+            return self._versions[key]
+
+        env = _marker_env(python_version)
+        out = next(
+            (
+                version
+                for marker, version in self._packages.get(name, ())
+                if marker is None or marker.evaluate(env)
+            ),
+            None,
+        )
+        self._versions[key] = out
+        return out
+
+    def _pin(
+        self,
+        req: R,
+        python_version: str | None,
+        unlocked: set[str],
+        conflicts: set[str],
+    ) -> R:
+        if isinstance(req, FallbackRequirement) or req.url or req.name == "python":
+            return req
+        if (
+            req.marker is not None
+            and python_version
+            and not req.marker.evaluate(_marker_env(python_version))
+        ):
+            # not installed for target python
+            return req
+        if (version := self.version(req.name, python_version)) is None:
+            unlocked.add(req.name)
+            return req
+        if not _satisfies(req.specifier, version):
+            # stale lockfile.  Don't contradict project metadata.
+            conflicts.add(f"{req} (locked {version})")
+            return req
+        # channel (of conda requirements) is kept by the round trip
+        out = type(req)(str(req))
+        out.specifier = SpecifierSet(f"=={version}")
+        return out
+
+    def pin(self, reqs: Iterable[R], python_version: str | None = None) -> list[R]:
+        """
+        Pin requirements (by their PyPI names) to locked versions.
+
+        Returns pinned requirements in the order of ``reqs``.  Requirements whose
+        markers exclude ``python_version`` are left as is.  Requirements not in
+        the lockfile, or whose locked version does not satisfy their specifier
+        (e.g., a stale lockfile), are left as is, and reported with a warning.
+        """
+        unlocked: set[str] = set()
+        conflicts: set[str] = set()
+        out = [self._pin(req, python_version, unlocked, conflicts) for req in reqs]
+        if unlocked:
+            logger.warning(
+                "Not pinned (missing from %s): %s",
+                self.path,
+                ", ".join(sorted(unlocked)),
+            )
+        if conflicts:
+            logger.warning(
+                "Not pinned (locked version does not satisfy requirement in %s): %s",
+                self.path,
+                ", ".join(sorted(conflicts)),
+            )
+        return out
+
+
+_LOCKFILES: dict[tuple[Path, int, int], Lockfile] = {}
+_LOCKFILES_LOCK = threading.Lock()
+register_gauge("lockfiles", _LOCKFILES.__len__)
+
+
+def load_lockfile(path: str | Path) -> Lockfile:
+    """Cached :class:`Lockfile` (reloaded if the file changes)."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _LOCKFILES_LOCK:
+        if (out := _LOCKFILES.get(key)) is None:
+            out = _LOCKFILES[key] = Lockfile(path)
+    return out
+
+
+def clear_cache() -> None:
+    """Forget files loaded by :func:`load_lockfile`."""
+    with _LOCKFILES_LOCK:
+        _LOCKFILES.clear()
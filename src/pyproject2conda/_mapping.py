@@ -0,0 +1,291 @@
+"""
+Shared dependency mapping tables.
+
+``mapping-files`` (``.toml`` or ``.json``) map dependency names to tables with
+the same keys as ``[tool.pyproject2conda.dependencies]`` (``pip``, ``skip``,
+``channel``, ``packages``).  Each file is compiled once into a SQLite index
+keyed by the hash of its contents, and entries are looked up (and validated)
+lazily, so large shared tables cost little when a project uses few
+dependencies.
+
+Keys of ``[tool.pyproject2conda.dependencies]`` may also be glob patterns
+(e.g., ``"jupyterlab-*"``) or regular expressions (``"re:types-.+"``), matched
+against normalized names.  See :class:`NamePatterns`.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import uuid
+from collections.abc import Mapping
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from packaging.utils import canonicalize_name
+
+from ._compat import tomllib
+from ._instrument import register_gauge
+from ._repodata import INDEX_DIR_ENV
+from ._schema import DependencyMapping
+from ._utils import REGEX_PREFIX
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Any
+
+    from packaging.utils import NormalizedName
+
+
+T = TypeVar("T")
+
+
+def _load_table(path: Path) -> dict[str, Any]:
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+    else:
+        data = tomllib.loads(path.read_text(encoding="utf-8"))
+    # allow copying ``[tool.pyproject2conda.dependencies]`` verbatim
+    for key in ("tool", "pyproject2conda", "dependencies"):
+        if (
+            isinstance(data, dict)
+            and len(data) == 1
+            and isinstance(data.get(key), dict)
+        ):
+            data = data[key]
+    if not isinstance(data, dict):
+        msg = f"Mapping file {path} must contain a table"
+        raise TypeError(msg)
+    return data
+
+
+def compile_mapping(path: str | Path, index: str | Path) -> None:
+    """Compile mapping file ``path`` to SQLite ``index`` (atomically)."""
+    path, index = Path(path), Path(index)
+    rows = [
+        (
+            canonicalize_name(name),
+            DependencyMapping.model_validate(value).model_dump_json(),
+        )
+        for name, value in _load_table(path).items()
+    ]
+    index.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index.with_name(f".{index.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with closing(sqlite3.connect(tmp)) as conn:
+            _ = conn.executescript(
+                """
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE mapping (
+                    name TEXT PRIMARY KEY, value TEXT NOT NULL
+                ) WITHOUT ROWID;
+                """
+            )
+            _ = conn.executemany("INSERT OR REPLACE INTO mapping VALUES (?, ?)", rows)
+            conn.commit()
+        _ = tmp.replace(index)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+@dataclass
+class MappingFile:
+    """Lazily queried, compiled mapping file."""
+
+    path: Path
+    #: Sha256 of file contents.
+    digest: str = field(init=False)
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+    _cache: dict[str, DependencyMapping | None] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.path = Path(self.path)
+        self.digest = hashlib.sha256(self.path.read_bytes()).hexdigest()
+        root = Path(os.environ.get(INDEX_DIR_ENV) or tempfile.gettempdir())
+        index = root / "pyproject2conda-mappings" / f"{self.digest[:32]}.sqlite"
+        if not index.exists():
+            compile_mapping(self.path, index)
+        self._conn = sqlite3.connect(
+            f"file:{index}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def get(self, name: str) -> DependencyMapping | None:
+        """Mapping for (normalized) ``name``."""
+        with self._lock:
+            if name not in self._cache:
+                row = self._conn.execute(
+                    "SELECT value FROM mapping WHERE name = ?", (name,)
+                ).fetchone()
+                self._cache[name] = (
+                    None
+                    if row is None
+                    else DependencyMapping.model_validate_json(row[0])
+                )
+            return self._cache[name]
+
+    def close(self) -> None:
+        """Close database connection."""
+        self._conn.close()
+
+
+_FILES: dict[tuple[Path, int, int], MappingFile] = {}
+_FILES_LOCK = threading.Lock()
+register_gauge("mapping_files", _FILES.__len__)
+
+
+def load_mapping_file(path: str | Path) -> MappingFile:
+    """Cached :class:`MappingFile` (reloaded if the file changes)."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _FILES_LOCK:
+        if (out := _FILES.get(key)) is None:
+            out = _FILES[key] = MappingFile(path)
+    return out
+
+
+def clear_cache() -> None:
+    """Close and forget files loaded by :func:`load_mapping_file`."""
+    with _FILES_LOCK:
+        for file in _FILES.values():
+            file.close()
+        _FILES.clear()
+
+
+# * Patterns -------------------------------------------------------------------
+_TRIE_VALUE = ""
+
+
+class NamePatterns(Generic[T]):
+    """
+    Compiled glob (``"jupyterlab-*"``) and regular expression
+    (``"re:types-.+"``) patterns.
+
+    Patterns of the form ``"prefix*"`` are stored in a prefix trie, and the
+    longest matching prefix wins.  All other patterns are combined into a
+    single regular expression, and the first (in input order) to match the
+    full name wins.  Prefix patterns take precedence over other patterns.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, T]]) -> None:
+        self._trie: dict[str, Any] = {}
+        self._values: list[T] = []
+        alternatives: list[str] = []
+        for pattern, value in patterns:
+            if pattern.startswith(REGEX_PREFIX):
+                regex = pattern[len(REGEX_PREFIX) :]
+                _ = re.compile(regex)  # report errors per pattern
+            elif (
+                pattern.endswith("*")
+                and (prefix := pattern[:-1])
+                and not any(c in prefix for c in "*?[")
+            ):
+                node = self._trie
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                _ = node.setdefault(_TRIE_VALUE, value)
+                continue
+            else:
+                regex = fnmatch.translate(pattern)
+            alternatives.append(f"(?P<_p{len(self._values)}>{regex})")
+            self._values.append(value)
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __bool__(self) -> bool:
+        return bool(self._trie) or self._regex is not None
+
+    def match(self, name: str) -> T | None:
+        """Value of the pattern matching ``name``, or ``None``."""
+        out: T | None = None
+        node = self._trie
+        for char in name:
+            if (node := node.get(char)) is None:  # type: ignore[assignment]
+                break
+            out = node.get(_TRIE_VALUE, out)
+        if out is not None or self._regex is None:
+            return out
+        if (match := self._regex.fullmatch(name)) is None:
+            return None
+        groups = match.groupdict()
+        return next(
+            value
+            for index, value in enumerate(self._values)
+            if groups[f"_p{index}"] is not None
+        )
+
+
+# * Mapping --------------------------------------------------------------------
+class DependencyMap(Mapping["NormalizedName", DependencyMapping]):
+    """
+    Dependency mappings from a table (``[tool.pyproject2conda.dependencies]``),
+    mapping files, and name patterns.
+
+    Exact names take precedence over patterns.  Lookups check the table, then
+    each file in order, then ``patterns``, and are memoized.  Iteration only
+    covers the table.
+    """
+
+    def __init__(
+        self,
+        table: Mapping[NormalizedName, DependencyMapping] | None = None,
+        files: Iterable[str | Path] = (),
+        patterns: Iterable[tuple[str, DependencyMapping]] = (),
+    ) -> None:
+        self.table = dict(table or {})
+        self.files = [load_mapping_file(path) for path in files]
+        self.patterns = NamePatterns(patterns)
+        self._cache: dict[str, DependencyMapping | None] = {}
+
+    @property
+    def paths(self) -> list[Path]:
+        """Paths of mapping files."""
+        return [file.path for file in self.files]
+
+    @property
+    def digests(self) -> list[str]:
+        """Content hashes of mapping files."""
+        return [file.digest for file in self.files]
+
+    def _lookup(self, name: str) -> DependencyMapping | None:
+        for file in self.files:
+            if (out := file.get(name)) is not None:
+                return out
+        return self.patterns.match(name)
+
+    def __getitem__(self, name: NormalizedName) -> DependencyMapping:
+        if (out := self.table.get(name)) is not None:
+            return out
+        if name in self._cache:
+            out = self._cache[name]
+        else:
+            out = self._cache[name] = self._lookup(name)
+        if out is None:
+            raise KeyError(name)
+        return out
+
+    def __iter__(self) -> Iterator[NormalizedName]:
+        return iter(self.table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, name: object) -> bool:
+        try:
+            _ = self[name]  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
@@ -0,0 +1,219 @@
+"""
+Opt-in memory accounting with :mod:`tracemalloc`.
+
+:class:`MemoryReport` is a phase hook (see :mod:`~pyproject2conda._instrument`)
+recording, for each phase and project, the peak of traced memory above that at
+the start of the phase, and the net memory retained by the phase.  For the
+``project`` phase (wrapping each command's work on a ``pyproject.toml`` file)
+and phases directly within it, snapshots taken at the phase boundaries are
+compared to find the allocation sites of retained memory.  Registered gauges
+report sizes of long lived caches.
+
+Peaks are tracked with :func:`tracemalloc.reset_peak`, which is process wide,
+so peaks of phases running concurrently in several threads are approximate.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from . import _instrument
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from ._typing_compat import Self
+
+#: Number of allocation sites reported per phase and project.
+TOP = 5
+
+# Snapshots only trace allocations made while tracing.  Ignore the snapshot
+# machinery itself.
+_FILTERS = (
+    tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+    tracemalloc.Filter(inclusive=False, filename_pattern=__file__),
+)
+
+
+@dataclass
+class PhaseMemory:
+    """Accumulated memory statistics of a phase."""
+
+    calls: int = 0
+    #: Largest peak (bytes) above traced memory at the start of a call.
+    peak: int = 0
+    #: Net traced memory (bytes) retained by all calls.
+    net: int = 0
+    #: Net bytes retained by allocation site (top level calls only).
+    sites: dict[str, int] = field(default_factory=dict)
+
+    def top(self, count: int = TOP) -> list[tuple[str, int]]:
+        """Allocation sites retaining the most memory."""
+        return sorted(
+            ((site, size) for site, size in self.sites.items() if size > 0),
+            key=lambda x: -x[1],
+        )[:count]
+
+    def to_dict(self, count: int = TOP) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "calls": self.calls,
+            "peak": self.peak,
+            "net": self.net,
+            "top": [{"site": site, "size": size} for site, size in self.top(count)],
+        }
+
+
+@dataclass
+class _Frame:
+    name: str
+    start: int
+    #: Highest traced memory seen so far in this phase (bytes).
+    high: int
+    snapshot: tracemalloc.Snapshot | None = None
+
+
+_KIB = 1024
+
+
+def _format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < _KIB:
+            return f"{value:.1f} {unit}"
+        value /= _KIB
+    return f"{value:.1f} GiB"
+
+
+class MemoryReport:
+    """
+    Record memory of phases within the context.
+
+    Starts :mod:`tracemalloc` (if not already tracing) on entry, and stops it
+    on exit.
+    """
+
+    def __init__(self, top: int = TOP) -> None:
+        self.top = top
+        self.stats: dict[tuple[str, str | None], PhaseMemory] = {}
+        #: Gauges at exit (see :func:`~pyproject2conda._instrument.gauges`).
+        self.gauges: dict[str, int] = {}
+        #: Peak traced memory (bytes) while recording.
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._exit_stack = ExitStack()
+
+    def _stack(self) -> list[_Frame]:
+        if (stack := getattr(self._local, "stack", None)) is None:
+            stack = self._local.stack = []
+        return stack
+
+    def phase_enter(self, name: str) -> None:
+        """Note traced memory (and, if top level, take a snapshot)."""
+        stack = self._stack()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self.peak = max(self.peak, peak)
+        if stack:
+            stack[-1].high = max(stack[-1].high, peak)
+        tracemalloc.reset_peak()
+        snapshot = (
+            tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            if self.top and all(frame.name == "project" for frame in stack)
+            else None
+        )
+        stack.append(_Frame(name, start=current, high=current, snapshot=snapshot))
+
+    def phase_exit(self, name: str) -> None:
+        """Accumulate statistics of phase ``name``."""
+        stack = self._stack()
+        frame = stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        high = max(frame.high, peak)
+        if stack:
+            stack[-1].high = max(stack[-1].high, high)
+
+        sites: list[tuple[str, int]] = []
+        if frame.snapshot is not None:
+            after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            sites = [
+                (str(diff.traceback[0]), diff.size_diff)
+                for diff in after.compare_to(frame.snapshot, "lineno")
+                if diff.size_diff
+            ]
+
+        key = (name, _instrument.current_project())
+        with self._lock:
+            self.peak = max(self.peak, high)
+            if (stats := self.stats.get(key)) is None:
+                stats = self.stats[key] = PhaseMemory()
+            stats.calls += 1
+            stats.peak = max(stats.peak, high - frame.start)
+            stats.net += current - frame.start
+            for site, size in sites:
+                stats.sites[site] = stats.sites.get(site, 0) + size
+
+    def __enter__(self) -> Self:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _ = self._exit_stack.callback(tracemalloc.stop)
+        self._exit_stack.enter_context(_instrument.hook(self))
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.gauges = _instrument.gauges()
+        with self._lock:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        self._exit_stack.close()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        with self._lock:
+            phases = [
+                {"phase": name, "project": project, **stats.to_dict(self.top)}
+                for (name, project), stats in self.stats.items()
+            ]
+        phases.sort(
+            key=lambda x: (x["project"] or "", _instrument.phase_order(x["phase"]))
+        )
+        return {"peak": self.peak, "phases": phases, "gauges": self.gauges}
+
+    def to_json(self) -> str:
+        """Json string of :meth:`to_dict`."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def table(self) -> str:
+        """Summary tables of phases, allocation sites, and gauges."""
+        data = self.to_dict()
+        lines = [
+            f"Peak traced memory: {_format_size(data['peak'])}",
+            "",
+            f"{'project':<30}{'phase':<10}{'calls':>7}{'peak':>12}{'net':>12}",
+        ]
+        lines.extend(
+            f"{x['project'] or '-':<30}{x['phase']:<10}{x['calls']:>7}"
+            f"{_format_size(x['peak']):>12}{_format_size(x['net']):>12}"
+            for x in data["phases"]
+        )
+        for x in data["phases"]:
+            if x["top"]:
+                lines.extend([
+                    "",
+                    f"Top allocations: {x['project'] or '-'} {x['phase']}",
+                ])
+                lines.extend(
+                    f"  {_format_size(site['size']):>12}  {site['site']}"
+                    for site in x["top"]
+                )
+        if data["gauges"]:
+            lines.extend(["", f"{'cache':<30}{'entries':>12}"])
+            lines.extend(
+                f"{name:<30}{value:>12}" for name, value in data["gauges"].items()
+            )
+        return "\n".join(lines)
@@ -7,6 +7,7 @@ from packaging.requirements import InvalidRequirement, Requirement
 from packaging.specifiers import SpecifierSet
 from packaging.utils import NormalizedName, canonicalize_name
 
+from ._instrument import count
 from ._typing_compat import override
 from ._utils import MISSING
 
@@ -24,6 +25,7 @@ if TYPE_CHECKING:
 class NormalizedRequirement(Requirement):
     def __init__(self, requirement_string: str) -> None:
         super().__init__(requirement_string)
+        count("requirements_parsed")
 
         self.name: NormalizedName = canonicalize_name(self.name)  # pyright: ignore[reportIncompatibleVariableOverride]  # pyrefly: ignore[bad-override]
         self.extras = {canonicalize_name(e) for e in self.extras}
@@ -0,0 +1,110 @@
+"""Export planned outputs as build graphs (make, ninja, or json)."""
+
+from __future__ import annotations
+
+import json
+import shlex
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Any
+
+
+@dataclass(frozen=True)
+class PlanOutput:
+    """Single planned output file."""
+
+    env: str
+    style: str
+    python: str | None
+    path: str
+
+
+@dataclass(frozen=True)
+class PlanTarget:
+    """All outputs of a single environment, and the command regenerating them."""
+
+    env: str
+    outputs: tuple[PlanOutput, ...]
+    command: tuple[str, ...]
+
+    @property
+    def paths(self) -> list[str]:
+        """Output paths."""
+        return [o.path for o in self.outputs]
+
+
+def to_json(inputs: Sequence[str], targets: Sequence[PlanTarget]) -> str:
+    """Json plan with keys ``inputs`` and ``outputs``."""
+    outputs: list[dict[str, Any]] = [
+        {
+            "env": output.env,
+            "style": output.style,
+            "python": output.python,
+            "output": output.path,
+            "inputs": list(inputs),
+            "command": list(target.command),
+        }
+        for target in targets
+        for output in target.outputs
+    ]
+    return json.dumps({"inputs": list(inputs), "outputs": outputs}, indent=2) + "\n"
+
+
+def _make_escape(path: str) -> str:
+    return path.replace("$", "$$").replace(" ", r"\ ").replace("#", r"\#")
+
+
+def to_make(inputs: Sequence[str], targets: Sequence[PlanTarget]) -> str:
+    """
+    Makefile fragment.
+
+    Each environment is a grouped target (``&:``, GNU make 4.3+) so its
+    outputs are created by a single command.  ``p2c-all`` depends on every
+    output.
+    """
+    all_paths = [_make_escape(p) for t in targets for p in t.paths]
+    lines = [
+        "# Generated by pyproject2conda plan",
+        "P2C_INPUTS := " + " ".join(map(_make_escape, inputs)),
+        "",
+        ".PHONY: p2c-all",
+        "p2c-all: " + " ".join(all_paths),
+        "",
+    ]
+    for target in targets:
+        command = shlex.join(target.command).replace("$", "$$")
+        lines.extend([
+            " ".join(map(_make_escape, target.paths)) + " &: $(P2C_INPUTS)",
+            f"\t{command}",
+            "",
+        ])
+    return "\n".join(lines)
+
+
+def _ninja_escape(path: str) -> str:
+    return path.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+
+
+def to_ninja(inputs: Sequence[str], targets: Sequence[PlanTarget]) -> str:
+    """Ninja build file.  Each environment is a single edge with multiple outputs."""
+    deps = " ".join(map(_ninja_escape, inputs))
+    lines = [
+        "# Generated by pyproject2conda plan",
+        "rule p2c",
+        "  command = $cmd",
+        "  description = pyproject2conda $env",
+        "",
+    ]
+    for target in targets:
+        lines.extend([
+            f"build {' '.join(map(_ninja_escape, target.paths))}: p2c {deps}",
+            "  cmd = " + shlex.join(target.command).replace("$", "$$"),
+            f"  env = {target.env}",
+            "",
+        ])
+    all_paths = " ".join(_ninja_escape(p) for t in targets for p in t.paths)
+    lines.extend([f"build p2c-all: phony {all_paths}", "default p2c-all", ""])
+    return "\n".join(lines)
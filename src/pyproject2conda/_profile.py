@@ -0,0 +1,171 @@
+"""
+Profile commands with :mod:`cProfile`.
+
+A :class:`Profiler` profiles everything within its context, or, with
+``phase``, only the time spent in that phase (see
+:mod:`~pyproject2conda._instrument`).  Results are written as :mod:`pstats`
+data and as collapsed stacks (``frame;frame;frame microseconds`` lines, as read
+by ``flamegraph.pl``, speedscope, and similar tools).
+
+Collapsed stacks are reconstructed from the caller/callee graph of the
+profile, with the time of functions called from several places split in
+proportion to the time spent under each caller.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from . import _instrument
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from ._typing_compat import Self, TypeAlias
+
+    #: ``(filename, line, function name)`` key of :mod:`pstats` data.
+    _Func: TypeAlias = tuple[str, int, str]
+
+
+logger = logging.getLogger(__name__)
+
+#: Stacks with less time than this (in seconds) are dropped.
+MIN_TIME = 1e-6
+
+
+def _label(func: _Func) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def collapsed_stacks(
+    stats: pstats.Stats, min_time: float = MIN_TIME
+) -> dict[str, float]:
+    """Seconds of exclusive time by ``;`` separated stack of ``stats``."""
+    raw: dict[_Func, Any] = stats.stats  # type: ignore[attr-defined]
+    children: dict[_Func, dict[_Func, float]] = {}
+    # values are (primitive calls, calls, exclusive, cumulative, callers), with
+    # callers mapping to the same (first four) statistics per caller
+    for func, (*_, callers) in raw.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, {})[func] = edge[3]
+
+    out: dict[str, float] = {}
+
+    def walk(func: _Func, stack: tuple[_Func, ...], weight: float) -> None:
+        _, _, exclusive, cumulative, _ = raw[func]
+        stack = (*stack, func)
+        scale = weight / cumulative if cumulative else 0.0
+        if (seconds := exclusive * scale) >= min_time:
+            key = ";".join(map(_label, stack))
+            out[key] = out.get(key, 0.0) + seconds
+        for child, edge in children.get(func, {}).items():
+            # skip recursion
+            if child not in stack and (child_weight := edge * scale) >= min_time:
+                walk(child, stack, child_weight)
+
+    for func, (*_, cumulative, callers) in raw.items():
+        if not callers:
+            walk(func, (), cumulative)
+    return out
+
+
+def write_collapsed(
+    stats: pstats.Stats, path: str | Path, min_time: float = MIN_TIME
+) -> None:
+    """Write collapsed stacks (integer microseconds) of ``stats`` to ``path``."""
+    lines = [
+        f"{stack} {micro}"
+        for stack, seconds in sorted(collapsed_stacks(stats, min_time).items())
+        if (micro := round(seconds * 1e6)) > 0
+    ]
+    _ = Path(path).write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+
+class Profiler:
+    """
+    Profile code run within the context.
+
+    With ``phase``, only time within phase ``phase`` is profiled.  Only one
+    thread can be profiled at a time, so phases running concurrently in other
+    threads are skipped.
+    """
+
+    def __init__(self, phase: str | None = None) -> None:
+        if phase is not None and phase not in _instrument.PHASES:
+            msg = (
+                f"Unknown phase {phase!r}.  Use one of {', '.join(_instrument.PHASES)}"
+            )
+            raise ValueError(msg)
+        self.phase = phase
+        self.profile = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._owner: int | None = None
+        self._enabled = False
+        self._exit_stack = ExitStack()
+
+    def _enable(self) -> bool:
+        try:
+            self.profile.enable()
+        except ValueError:
+            # another profiler is active (e.g., a concurrent batch command)
+            logger.warning("Not profiling: another profiler is active")
+            return False
+        return True
+
+    def phase_enter(self, name: str) -> None:
+        """Start profiling if ``name`` is the profiled phase."""
+        if name == self.phase and self._lock.acquire(blocking=False):
+            if self._enable():
+                self._owner = threading.get_ident()
+            else:
+                self._lock.release()
+
+    def phase_exit(self, name: str) -> None:
+        """Stop profiling at the end of the profiled phase."""
+        if name == self.phase and self._owner == threading.get_ident():
+            self.profile.disable()
+            self._owner = None
+            self._lock.release()
+
+    def __enter__(self) -> Self:
+        if self.phase is not None:
+            self._exit_stack.enter_context(_instrument.hook(self))
+        else:
+            self._enabled = self._enable()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._enabled:
+            self.profile.disable()
+            self._enabled = False
+        self._exit_stack.close()
+
+    def stats(self) -> pstats.Stats | None:
+        """Profile statistics (``None`` if nothing was profiled)."""
+        self.profile.create_stats()
+        if not self.profile.stats:
+            return None
+        return pstats.Stats(self.profile)
+
+    def write(self, path: str | Path) -> None:
+        """
+        Write :mod:`pstats` data to ``path``, and collapsed stacks to ``path``
+        with suffix ``.folded``.
+        """
+        path = Path(path)
+        if (stats := self.stats()) is None:
+            logger.warning("Nothing profiled.  Not writing %s", path)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(path)
+        write_collapsed(stats, folded := path.with_suffix(".folded"))
+        logger.info("Wrote profile to %s and %s", path, folded)
@@ -0,0 +1,480 @@
+"""
+Local index of conda package availability.
+
+Sources are ``repodata.json`` snapshots, ``conda-meta`` directories, or
+package cache directories (``*/info/index.json``).  They are parsed once into a
+SQLite index of package names and versions, stored outside the project tree,
+and rebuilt only when a source changes.  ``repodata.json`` files are stream
+parsed, so memory use does not grow with file size.
+
+The index also records the python constraint of each record, so that
+:meth:`RepodataIndex.pin` can choose exact versions for a target python without
+a solver.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import closing, suppress
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from packaging.specifiers import InvalidSpecifier, Specifier
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from ._instrument import register_gauge
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import IO, Any
+
+    from packaging.requirements import Requirement
+
+    from ._normalized_requirements import CondaRequirement
+
+
+logger = logging.getLogger(__name__)
+
+#: Environment variable overriding the directory holding indexes.
+INDEX_DIR_ENV = "PYPROJECT2CONDA_INDEX_DIR"
+
+#: Bump to invalidate existing indexes.
+_INDEX_VERSION = 2
+
+_RECORD_TABLES = ("packages", "packages.conda")
+
+
+# * Streaming repodata parser --------------------------------------------------
+class _JsonStream:
+    """Incrementally decode values of a large json document."""
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 20) -> None:
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> None:
+        # grow reads with the pending buffer so large values decode in O(n)
+        data = self._f.read(max(self._chunk_size, len(self._buf) - self._pos))
+        self._eof = not data
+        self._buf = self._buf[self._pos :] + data
+        self._pos = 0
+
+    def peek(self) -> str:
+        """Next non-whitespace character (``""`` at end of input)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf) or self._eof:
+                return self._buf[self._pos : self._pos + 1]
+            self._fill()
+
+    def take(self, char: str) -> None:
+        """Consume ``char``."""
+        if (found := self.peek()) != char:
+            msg = f"Expected {char!r} in repodata, found {found!r}"
+            raise ValueError(msg)
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode next value."""
+        _ = self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._fill()
+                continue
+            if end == len(self._buf) and not self._eof:
+                # possibly truncated number
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+
+def _python_constraint(record: dict[str, Any]) -> str:
+    """Version constraint of ``python`` in ``depends`` of ``record`` (or ``""``)."""
+    for dep in record.get("depends", ()):
+        name, *spec = dep.split()
+        if name == "python":
+            return spec[0] if spec else ""
+    return ""
+
+
+def iter_repodata(path: str | Path) -> Iterator[tuple[str, str, str]]:
+    """
+    Stream records of ``repodata.json``.
+
+    Yields
+    ------
+    tuple of str
+        Package name, version, and python constraint (e.g.,
+        ``">=3.10,<3.11.0a0"``, or ``""`` if none) of each record.
+    """
+    with Path(path).open(encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        stream.take("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.take(":")
+            if key in _RECORD_TABLES:
+                stream.take("{")
+                while stream.peek() != "}":
+                    _ = stream.value()
+                    stream.take(":")
+                    record = stream.value()
+                    yield record["name"], record["version"], _python_constraint(record)
+                    if stream.peek() == ",":
+                        stream.take(",")
+                stream.take("}")
+            else:
+                _ = stream.value()
+            if stream.peek() == ",":
+                stream.take(",")
+
+
+def _iter_record(path: Path) -> Iterator[tuple[str, str, str]]:
+    record = json.loads(path.read_text(encoding="utf-8"))
+    yield record["name"], record["version"], _python_constraint(record)
+
+
+# * Sources --------------------------------------------------------------------
+def _is_record(path: Path) -> bool:
+    return path.name == "index.json" or path.parent.name == "conda-meta"
+
+
+def expand_sources(sources: Iterable[str | Path]) -> list[Path]:
+    """
+    Files making up ``sources``.
+
+    Directories are searched for ``repodata.json`` files, ``conda-meta/*.json``
+    records, and package cache ``*/info/index.json`` records.
+    """
+    out: list[Path] = []
+    for source in map(Path, sources):
+        if not source.is_dir():
+            out.append(source.absolute())
+            continue
+        out.extend(
+            sorted(
+                path.absolute()
+                for pattern in (
+                    "**/repodata.json",
+                    "conda-meta/*.json",
+                    "*/info/index.json",
+                )
+                for path in source.glob(pattern)
+            )
+        )
+    return out
+
+
+def _signature(files: Iterable[Path]) -> str:
+    items: list[Any] = [_INDEX_VERSION]
+    for path in files:
+        stat = path.stat()
+        items.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+
+def signature(sources: Iterable[str | Path]) -> str:
+    """Hash of paths, sizes, and modification times of files of ``sources``."""
+    return _signature(expand_sources(sources))
+
+
+def index_path(sources: Iterable[str | Path]) -> Path:
+    """Default index location for ``sources``."""
+    root = Path(os.environ.get(INDEX_DIR_ENV) or tempfile.gettempdir())
+    digest = hashlib.sha256(
+        json.dumps([str(Path(s).absolute()) for s in sources]).encode()
+    ).hexdigest()
+    return root / "pyproject2conda-repodata" / f"{digest[:32]}.sqlite"
+
+
+def _read_signature(path: Path) -> str | None:
+    if not path.exists():
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = 'signature'"
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    return None if row is None else str(row[0])
+
+
+def build_index(files: Iterable[Path], path: Path, signature: str) -> None:
+    """Build index of ``files`` at ``path`` (atomically replacing any existing)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with closing(sqlite3.connect(tmp)) as conn:
+            _ = conn.executescript(
+                """
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE versions (
+                    name TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    python TEXT NOT NULL,
+                    PRIMARY KEY (name, version, python)
+                ) WITHOUT ROWID;
+                """
+            )
+            for file in files:
+                records = (
+                    _iter_record(file) if _is_record(file) else iter_repodata(file)
+                )
+                # conda names (e.g., ``ruamel.yaml``) compared to normalized pip names
+                _ = conn.executemany(
+                    "INSERT OR IGNORE INTO versions VALUES (?, ?, ?)",
+                    (
+                        (canonicalize_name(name), version, python)
+                        for name, version, python in records
+                    ),
+                )
+            _ = conn.execute("INSERT INTO meta VALUES ('signature', ?)", (signature,))
+            conn.commit()
+        _ = tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+# * Index ----------------------------------------------------------------------
+def _parse_version(version: str) -> Version | None:
+    try:
+        return Version(version)
+    except InvalidVersion:
+        return None
+
+
+def _conda_specifier(spec: str) -> Specifier:
+    if spec[0] not in "<>=!~":
+        # bare conda versions are fuzzy: ``3.10`` matches ``3.10.*``
+        spec = f"=={spec.removesuffix('*').removesuffix('.')}.*"
+    elif spec[0] == "=" and spec[:2] != "==":
+        spec = f"={spec.removesuffix('*').removesuffix('.')}.*"
+    return Specifier(spec)
+
+
+@cache
+def python_matches(constraint: str, python_version: str) -> bool:
+    """
+    Whether conda version ``constraint`` on python admits ``python_version``.
+
+    Unparsable constraints are assumed to match.
+    """
+    if not constraint:
+        return True
+    try:
+        version = Version(python_version)
+        return any(
+            all(
+                _conda_specifier(part).contains(version, prereleases=True)
+                for part in alternative.split(",")
+            )
+            for alternative in constraint.split("|")
+        )
+    except (InvalidSpecifier, InvalidVersion):
+        return True
+
+
+@dataclass
+class RepodataIndex:
+    """
+    Package availability from an index built by :func:`build_index`.
+
+    Use :meth:`open` to build (if needed) and open an index for sources.
+    """
+
+    path: Path
+    #: Signature (see :func:`signature`) of sources the index was built from.
+    signature: str | None = None
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+    _versions: dict[str, tuple[Version, ...]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _available: dict[str, bool] = field(default_factory=dict, init=False, repr=False)
+    _candidates: dict[str, tuple[tuple[Version, str], ...]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _selected: dict[tuple[str, str | None, str], Version | None] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self._conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    @classmethod
+    def open(
+        cls, sources: Iterable[str | Path], path: str | Path | None = None
+    ) -> RepodataIndex:
+        """Open index of ``sources``, (re)building it if missing or stale."""
+        sources = list(sources)
+        files = expand_sources(sources)
+        path = index_path(sources) if path is None else Path(path)
+        if _read_signature(path) != (signature := _signature(files)):
+            build_index(files, path, signature)
+        return cls(path, signature=signature)
+
+    def close(self) -> None:
+        """Close database connection."""
+        self._conn.close()
+
+    def versions(self, name: str) -> tuple[Version, ...]:
+        """Available (PEP 440 parsable) versions of package ``name``."""
+        with self._lock:
+            if (out := self._versions.get(name)) is None:
+                rows = self._conn.execute(
+                    "SELECT DISTINCT version FROM versions WHERE name = ?", (name,)
+                ).fetchall()
+                out = self._versions[name] = tuple(
+                    v for (version,) in rows if (v := _parse_version(version))
+                )
+        return out
+
+    def __contains__(self, name: object) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM versions WHERE name = ? LIMIT 1", (name,)
+            ).fetchone()
+        return row is not None
+
+    def available(self, requirement: Requirement) -> bool:
+        """Whether a version of ``requirement`` satisfying its specifier is available."""
+        key = f"{requirement.name}{requirement.specifier}"
+        if (out := self._available.get(key)) is None:
+            if not requirement.specifier:
+                out = requirement.name in self
+            else:
+                out = any(
+                    requirement.specifier.contains(v, prereleases=True)
+                    for v in self.versions(requirement.name)
+                )
+            self._available[key] = out
+        return out
+
+    def candidates(self, name: str) -> tuple[tuple[Version, str], ...]:
+        """(version, python constraint) of records of package ``name``."""
+        with self._lock:
+            if (out := self._candidates.get(name)) is None:
+                rows = self._conn.execute(
+                    "SELECT version, python FROM versions WHERE name = ?", (name,)
+                ).fetchall()
+                out = self._candidates[name] = tuple(
+                    (v, python)
+                    for version, python in rows
+                    if (v := _parse_version(version))
+                )
+        return out
+
+    def select(
+        self,
+        requirement: Requirement,
+        python_version: str | None = None,
+        strategy: str = "highest",
+    ) -> Version | None:
+        """
+        Highest (or lowest) available version satisfying ``requirement``.
+
+        Only records whose python constraint admits ``python_version`` (if
+        passed) are considered.  Pre-releases are only selected if no final
+        release satisfies ``requirement``, or its specifier explicitly allows
+        them.
+        """
+        key = (f"{requirement.name}{requirement.specifier}", python_version, strategy)
+        if key not in self._selected:
+            versions = {
+                version
+                for version, python in self.candidates(requirement.name)
+                if python_version is None or python_matches(python, python_version)
+            }
+            matching = list(requirement.specifier.filter(versions))
+            choose = min if strategy == "lowest" else max
+            self._selected[key] = choose(matching, default=None)
+        return self._selected[key]
+
+    def pin(
+        self,
+        conda_reqs: Iterable[CondaRequirement],
+        python_version: str | None = None,
+        strategy: str = "highest",
+    ) -> set[CondaRequirement]:
+        """
+        Pin conda requirements to exact versions chosen by :meth:`select`.
+
+        Requirements without a satisfying version are left as is, and reported
+        with a warning.
+        """
+        out: set[CondaRequirement] = set()
+        missing: list[str] = []
+        for req in conda_reqs:
+            if req.name == "python" or req.url:
+                out.add(req)
+            elif (version := self.select(req, python_version, strategy)) is None:
+                missing.append(str(req))
+                out.add(req)
+            else:
+                out.add(req.update(specifier=f"=={version}"))
+        if missing:
+            logger.warning(
+                "Not pinned (no matching version in repodata): %s",
+                ", ".join(sorted(missing)),
+            )
+        return out
+
+
+_INDEXES: dict[tuple[str, ...], RepodataIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+register_gauge("repodata_indexes", _INDEXES.__len__)
+register_gauge("repodata_python_matches", lambda: python_matches.cache_info().currsize)
+
+
+def load_index(sources: Iterable[str | Path]) -> RepodataIndex:
+    """
+    Cached :meth:`RepodataIndex.open` (reopened when files of ``sources`` are
+    added, removed, or changed).
+    """
+    key = tuple(str(Path(s).absolute()) for s in sources)
+    files = expand_sources(key)
+    signature = _signature(files)
+    with _INDEXES_LOCK:
+        if (out := _INDEXES.get(key)) is None or out.signature != signature:
+            path = index_path(key)
+            if _read_signature(path) != signature:
+                build_index(files, path, signature)
+            # replaced index is left open for concurrent readers
+            out = _INDEXES[key] = RepodataIndex(path, signature=signature)
+    return out
+
+
+def clear_cache() -> None:
+    """Close and forget indexes opened by :func:`load_index`."""
+    with _INDEXES_LOCK:
+        for index in _INDEXES.values():
+            with suppress(sqlite3.Error):
+                index.close()
+        _INDEXES.clear()
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
@@ -10,6 +11,7 @@ from typing import TYPE_CHECKING
 from packaging.dependency_groups import DependencyGroupResolver
 from packaging.utils import NormalizedName, canonicalize_name
 
+from ._instrument import count
 from ._normalized_requirements import NormalizedRequirement, canonicalize_requirement
 from ._typing_compat import override
 
@@ -23,12 +25,22 @@ if TYPE_CHECKING:
 
 @dataclass
 class _Resolve(ABC):
-    """Base resolver"""
+    """
+    Base resolver
+
+    Resolved values are stored as :class:`frozenset` and never mutated after
+    they are cached, so concurrent readers can share them.  Filling the cache is
+    guarded by a reentrant lock (resolution of one key may recurse into others).
+    """
 
     package_name: NormalizedName
     unresolved: dict[str, Any]
-    resolved: dict[NormalizedName, set[NormalizedRequirement]] = field(
-        init=False, default_factory=dict[NormalizedName, set[NormalizedRequirement]]
+    resolved: dict[NormalizedName, frozenset[NormalizedRequirement]] = field(
+        init=False,
+        default_factory=dict[NormalizedName, frozenset[NormalizedRequirement]],
+    )
+    _lock: threading.RLock = field(
+        init=False, default_factory=threading.RLock, repr=False, compare=False
     )
 
     @abstractmethod
@@ -41,11 +53,23 @@ class _Resolve(ABC):
         self, extras: Iterable[NormalizedName]
     ) -> Iterable[NormalizedRequirement]: ...
 
-    def _resolve(self, key: NormalizedName) -> set[NormalizedRequirement]:
+    def _resolve(self, key: NormalizedName) -> frozenset[NormalizedRequirement]:
         """Do underlying resolve of normalized group/extra"""
-        if key in self.resolved:
-            return self.resolved[key]
+        if (out := self.resolved.get(key)) is not None:
+            count("resolve_cache_hits")
+            return out
+
+        with self._lock:
+            if (out := self.resolved.get(key)) is None:
+                count("resolve_cache_misses")
+                out = self.resolved[key] = self._resolve_uncached(key)
+            else:
+                count("resolve_cache_hits")
+        return out
 
+    def _resolve_uncached(
+        self, key: NormalizedName
+    ) -> frozenset[NormalizedRequirement]:
         resolved: set[NormalizedRequirement] = set()
         for dep in self._get_unresolved_deps(key):
             if dep in resolved:
@@ -59,8 +83,7 @@ class _Resolve(ABC):
             else:
                 resolved.add(dep)
 
-        self.resolved[key] = resolved
-        return resolved
+        return frozenset(resolved)
 
     def get(self, keys: Iterable[NormalizedName]) -> set[NormalizedRequirement]:
         out: set[NormalizedRequirement] = set()
@@ -17,6 +17,7 @@ from pydantic import (
 )
 
 from ._utils import (
+    validate_dict_dependency_names,
     validate_dict_normalizedname,
     validate_list_of_normalizedname,
     validate_list_of_str,
@@ -46,6 +47,21 @@ class Overwrite(str, Enum):
     force = "force"
 
 
+class Dedupe(str, Enum):
+    """Options for ``--dedupe``"""
+
+    none = "none"
+    hardlink = "hardlink"
+    symlink = "symlink"
+
+
+class PinStrategy(str, Enum):
+    """Options for ``--pin-strategy``"""
+
+    highest = "highest"
+    lowest = "lowest"
+
+
 class _BaseOptionsRequirements(BaseModel):
     # config
     skip_package: bool = False
@@ -59,6 +75,10 @@ class _BaseOptionsRequirements(BaseModel):
         default_factory=list,
         validation_alias=AliasChoices("reqs", "pip-deps", "pip_deps"),
     )
+    # pinning
+    pin_from: str | None = None
+    wheelhouse: str | None = None
+    hashes: bool = False
 
 
 class _BaseOptionsYaml(_BaseOptionsRequirements):
@@ -75,6 +95,8 @@ class _BaseOptionsYaml(_BaseOptionsRequirements):
         default_factory=list,
         validation_alias=AliasChoices("deps", "conda-deps", "conda_deps"),
     )
+    repodata: ListString = Field(default_factory=list)
+    pin_strategy: PinStrategy | None = None
 
 
 class _BaseOptions(_BaseOptionsYaml):
@@ -92,6 +114,7 @@ class _BaseOptions(_BaseOptionsYaml):
         default=".txt", validation_alias=AliasChoices("reqs_ext", "reqs-ext")
     )
     yaml_ext: str = ".yaml"
+    json_ext: str = ".json"
 
     style: Annotated[
         list[Literal["yaml", "requirements", "conda-requirements", "json"]],
@@ -114,6 +137,10 @@ class EnvYaml(_BaseOptionsYaml, _EnvMixin):
     pass
 
 
+class EnvCondaRequirements(EnvYaml):
+    output_pip: Path | None = None
+
+
 class Env(_BaseOptions, _EnvMixin):
     """Environment table"""
 
@@ -127,6 +154,16 @@ class Env(_BaseOptions, _EnvMixin):
         new = self.model_copy(update=update) if update else self
         return EnvYaml.model_validate(new.model_dump(exclude_unset=True))
 
+    def as_conda_requirements(
+        self, update: Mapping[Any, Any] | None = None
+    ) -> EnvCondaRequirements:
+        update = dict(update or {})
+        output_pip = update.pop("output_pip", None)
+        return EnvCondaRequirements.model_validate({
+            **self.as_yaml(update).model_dump(exclude_unset=True),
+            "output_pip": output_pip,
+        })
+
 
 class _OverrideEnvs(Env):
     """Override envs table"""
@@ -153,8 +190,10 @@ class DependencyMapping(BaseModel):
 class _Dependencies(BaseModel):
     dependencies: Annotated[
         dict[NormalizedName, DependencyMapping],
-        BeforeValidator(validate_dict_normalizedname),
+        BeforeValidator(validate_dict_dependency_names),
     ] = Field(default_factory=dict)
+    #: Files with additional dependency mappings (see :mod:`._mapping`).
+    mapping_files: ListString = Field(default_factory=list)
 
 
 class PyProject2CondaSchema(_BaseOptions, _Dependencies):
@@ -177,7 +216,13 @@ class PyProject2CondaSchema(_BaseOptions, _Dependencies):
     @cached_property
     def _base_dict(self) -> dict[str, Any]:
         return self.model_dump(
-            exclude={"default_envs", "dependencies", "envs", "overrides"},
+            exclude={
+                "default_envs",
+                "dependencies",
+                "envs",
+                "mapping_files",
+                "overrides",
+            },
             exclude_unset=True,
         )
 
@@ -0,0 +1,208 @@
+"""
+Split work between CI nodes.
+
+Planned items (outputs of ``project``, or commands of ``batch``) are
+partitioned deterministically into ``n`` shards with balanced estimated cost.
+Each node processes its shard (``--shard i/n``) and writes a partial
+:class:`Manifest`.  :func:`merge_manifests` checks that the partial manifests
+cover every planned item exactly once, with no conflicting outputs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ._writer import atomic_write
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+    from typing import Any
+
+
+#: Manifest format version.
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Shard ``index`` (one based) of ``count``."""
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.index <= self.count:
+            msg = f"Shard index must be between 1 and {self.count}, got {self.index}"
+            raise ValueError(msg)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @classmethod
+    def parse(cls, value: str | Shard) -> Shard:
+        """Parse ``"i/n"``."""
+        if isinstance(value, Shard):
+            return value
+        try:
+            index, count = (int(x) for x in value.split("/"))
+        except ValueError:
+            msg = f"Shard must be of the form i/n, got {value!r}"
+            raise ValueError(msg) from None
+        return cls(index, count)
+
+    def select(self, costs: Mapping[str, float]) -> list[str]:
+        """Items of ``costs`` in this shard (see :func:`partition`), in input order."""
+        selected = set(partition(costs, self.count)[self.index - 1])
+        return [item for item in costs if item in selected]
+
+
+def partition(costs: Mapping[str, float], count: int) -> list[list[str]]:
+    """
+    Partition items into ``count`` bins of balanced total cost.
+
+    Greedy longest processing time first: items in order of decreasing cost go
+    to the currently cheapest bin.  Ties are broken by item name and bin index,
+    so the result depends only on ``costs`` and ``count``.
+    """
+    bins: list[list[str]] = [[] for _ in range(count)]
+    heap = [(0.0, index) for index in range(count)]
+    for item in sorted(costs, key=lambda item: (-costs[item], item)):
+        total, index = heapq.heappop(heap)
+        bins[index].append(item)
+        heapq.heappush(heap, (total + costs[item], index))
+    return bins
+
+
+def file_digest(path: str | Path) -> str | None:
+    """Sha256 of file contents, or ``None`` if missing."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+@dataclass
+class Manifest:
+    """
+    Record of planned items and those processed by one or more shards.
+
+    ``planned`` lists every item across all shards, so that merged manifests can
+    be checked for completeness.  ``items`` maps processed items to json-able
+    details.  For ``project``, details include a ``files`` mapping of paths to
+    content digests.
+    """
+
+    kind: str
+    planned: list[str]
+    items: dict[str, dict[str, Any]] = field(default_factory=dict)
+    #: Shards contributing to this manifest.
+    shards: list[str] = field(default_factory=list)
+
+    @property
+    def plan(self) -> str:
+        """Digest of planned items."""
+        return hashlib.sha256(json.dumps(sorted(self.planned)).encode()).hexdigest()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "version": MANIFEST_VERSION,
+            "kind": self.kind,
+            "shards": self.shards,
+            "plan": self.plan,
+            "planned": self.planned,
+            "items": self.items,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Manifest:
+        """Inverse of :meth:`to_dict`."""
+        if data.get("version") != MANIFEST_VERSION:
+            msg = f"Unsupported manifest version {data.get('version')!r}"
+            raise ValueError(msg)
+        return cls(
+            kind=data["kind"],
+            planned=list(data["planned"]),
+            items=dict(data["items"]),
+            shards=list(data["shards"]),
+        )
+
+    @classmethod
+    def read(cls, path: str | Path) -> Manifest:
+        """Read manifest from ``path``."""
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def write(self, path: str | Path) -> None:
+        """Write manifest to ``path``."""
+        atomic_write(
+            json.dumps(self.to_dict(), indent=2) + "\n", path, encoding="utf-8"
+        )
+
+
+def _check_shards(shards: list[str]) -> list[str]:
+    problems = [
+        f"Shard {shard} appears more than once"
+        for shard in sorted(set(shards))
+        if shards.count(shard) > 1
+    ]
+    counts = {Shard.parse(s).count for s in shards}
+    if len(counts) > 1:
+        problems.append(f"Mixed shard counts {sorted(counts)}")
+    elif counts:
+        count = counts.pop()
+        expected = [str(Shard(i, count)) for i in range(1, count + 1)]
+        if missing := [s for s in expected if s not in shards]:
+            problems.append(f"Missing shards {', '.join(missing)}")
+    return problems
+
+
+def merge_manifests(manifests: Iterable[Manifest]) -> tuple[Manifest, list[str]]:
+    """
+    Merge partial manifests.
+
+    Returns
+    -------
+    manifest : Manifest
+        Union of ``manifests``.
+    problems : list of str
+        Empty if the union covers every planned item, each shard contributed
+        once, and no item or output file was produced with conflicting content.
+    """
+    manifests = list(manifests)
+    if not manifests:
+        return Manifest(kind="", planned=[]), ["No manifests"]
+
+    first = manifests[0]
+    merged = Manifest(kind=first.kind, planned=list(first.planned))
+    problems: list[str] = []
+    files: dict[str, Any] = {}
+
+    for manifest in manifests:
+        if (manifest.kind, manifest.plan) != (first.kind, first.plan):
+            problems.append(
+                f"Manifest for shards {manifest.shards} has a different plan"
+            )
+            continue
+        merged.shards.extend(manifest.shards)
+
+        for item, details in manifest.items.items():
+            if merged.items.setdefault(item, details) != details:
+                problems.append(f"Conflicting results for {item}")
+            for path, digest in details.get("files", {}).items():
+                if files.setdefault(path, digest) != digest:
+                    problems.append(f"Conflicting content for {path}")
+
+    problems.extend(_check_shards(merged.shards))
+    planned = set(merged.planned)
+    problems.extend(
+        f"Missing {item}" for item in merged.planned if item not in merged.items
+    )
+    problems.extend(
+        f"Unexpected {item}" for item in merged.items if item not in planned
+    )
+    return merged, problems
@@ -6,12 +6,14 @@ Utility methods (:mod:`pyproject2conda.utils`)
 from __future__ import annotations
 
 import enum
+import hashlib
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, cast
 
 from packaging.utils import canonicalize_name
 from packaging.version import Version
 
+from ._instrument import count
 from ._typing_compat import override
 
 if TYPE_CHECKING:
@@ -51,14 +53,19 @@ Sentinel to indicate the lack of a value when ``None`` is ambiguous.
 """
 
 
+def parse_default_pythons(text: str) -> list[str]:
+    """Parse contents of .python-version file"""
+    if out := text.split():
+        # only keep major.minor
+        out[0] = ".".join(out[0].split(".")[:2])
+    return out
+
+
 def get_default_pythons(path: str | Path = ".python-version") -> list[str]:
     """Get default python value from .python-version file"""
     path = Path(path)
     if path.exists():
-        out = path.read_text().split()
-        # only keep major.minor
-        out[0] = ".".join(out[0].split(".")[:2])
-        return out
+        return parse_default_pythons(path.read_text())
     return []
 
 
@@ -114,12 +121,36 @@ def select_pythons(
     return [str(Version(p)) for p in pythons]
 
 
+def directory_signature(path: Path) -> str:
+    """
+    Hash of names, sizes, and modification times of files in directory ``path``.
+
+    Subdirectories and hidden files (e.g., hash databases) are ignored.
+    """
+    h = hashlib.sha256()
+    for child in sorted(path.iterdir()):
+        if not child.name.startswith(".") and child.is_file():
+            stat = child.stat()
+            h.update(f"{child.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
 def update_target(
     target: str | Path | None,
     *deps: str | Path,
     overwrite: str,
 ) -> bool:
     """Check if target is older than deps:"""
+    if not (out := _update_target(target, *deps, overwrite=overwrite)):
+        count("outputs_skipped")
+    return out
+
+
+def _update_target(
+    target: str | Path | None,
+    *deps: str | Path,
+    overwrite: str,
+) -> bool:
     if target is None:
         # No output file. always run.
         return True
@@ -242,3 +273,23 @@ def validate_list_of_normalizedname(s: Any) -> list[NormalizedName]:
 
 def validate_dict_normalizedname(d: Mapping[Any, Any]) -> dict[NormalizedName, Any]:
     return {canonicalize_name(name): d[name] for name in d}
+
+
+#: Prefix of regular expression keys of the dependencies table.
+REGEX_PREFIX = "re:"
+
+
+def is_name_pattern(name: str) -> bool:
+    """Whether dependencies table key ``name`` is a glob or regular expression."""
+    return name.startswith(REGEX_PREFIX) or any(c in name for c in "*?[")
+
+
+def validate_dict_dependency_names(d: Mapping[Any, Any]) -> dict[NormalizedName, Any]:
+    """Normalize dependencies table keys.  Regular expressions are left as is."""
+    return {
+        cast(
+            "NormalizedName",
+            name if name.startswith(REGEX_PREFIX) else canonicalize_name(name),
+        ): d[name]
+        for name in d
+    }
@@ -0,0 +1,291 @@
+"""
+Pin pip requirements to distributions in a local wheelhouse.
+
+Each requirement is pinned to the highest version of a wheel or sdist in the
+wheelhouse directory satisfying it, optionally with the ``sha256`` hashes of
+that version's files (for ``pip install --require-hashes``).  Files are hashed
+in parallel from memory mapped reads, and hashes are cached by path, size, and
+modification time in a sidecar SQLite database, so unchanged files are never
+hashed twice.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import InitVar, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from packaging.specifiers import SpecifierSet
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+
+from ._instrument import register_gauge
+from ._normalized_requirements import FallbackRequirement
+from ._repodata import INDEX_DIR_ENV
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from packaging.utils import NormalizedName
+    from packaging.version import Version
+
+    from ._normalized_requirements import NormalizedRequirement
+
+
+logger = logging.getLogger(__name__)
+
+#: Name of the hash database in the wheelhouse directory.
+SIDECAR_NAME = ".pyproject2conda-hashes.sqlite"
+
+
+def parse_filename(path: Path) -> tuple[NormalizedName, Version] | None:
+    """Name and version of wheel or sdist ``path`` (``None`` if neither)."""
+    try:
+        if path.suffix == ".whl":
+            name, version, *_ = parse_wheel_filename(path.name)
+            return name, version
+        if path.name.endswith((".tar.gz", ".zip")):
+            return parse_sdist_filename(path.name)
+    except (InvalidWheelFilename, InvalidSdistFilename):
+        pass
+    return None
+
+
+def sha256(path: str | Path) -> str:
+    """Sha256 of file contents, read through a memory map."""
+    with Path(path).open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.sha256(m).hexdigest()
+
+
+# * Hash cache -----------------------------------------------------------------
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    _ = conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    return conn
+
+
+def hash_db_path(directory: Path) -> Path:
+    """
+    Hash database for wheelhouse ``directory``.
+
+    Uses a sidecar file in ``directory`` if writable, else a file in the
+    temporary directory (or ``PYPROJECT2CONDA_INDEX_DIR``).
+    """
+    if os.access(directory, os.W_OK):
+        return directory / SIDECAR_NAME
+    root = Path(os.environ.get(INDEX_DIR_ENV) or tempfile.gettempdir())
+    digest = hashlib.sha256(str(directory).encode()).hexdigest()
+    return root / "pyproject2conda-hashes" / f"{digest[:32]}.sqlite"
+
+
+def file_hashes(
+    paths: Iterable[Path], db: Path, max_workers: int | None = None
+) -> dict[Path, str]:
+    """
+    Sha256 of each of ``paths``.
+
+    Hashes are read from (and new hashes stored in) SQLite database ``db``,
+    keyed by path, size, and modification time.  Missing hashes are computed in
+    a thread pool.
+    """
+    stats = {path: path.stat() for path in paths}
+    out: dict[Path, str] = {}
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with closing(_connect(db)) as conn:
+        for path, stat in stats.items():
+            row = conn.execute(
+                "SELECT sha256 FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (str(path), stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+            if row is not None:
+                out[path] = row[0]
+
+        if missing := [path for path in stats if path not in out]:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                out.update(zip(missing, pool.map(sha256, missing), strict=True))
+            _ = conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                (
+                    (str(p), stats[p].st_size, stats[p].st_mtime_ns, out[p])
+                    for p in missing
+                ),
+            )
+            conn.commit()
+    return out
+
+
+# * Wheelhouse -----------------------------------------------------------------
+#: Distributions (path, name, version) and signature of a wheelhouse directory.
+_Scan = tuple[list[tuple[Path, "NormalizedName", "Version"]], str]
+
+
+def _scan(directory: Path) -> _Scan:
+    """
+    Distributions in ``directory``, and the signature of their names, sizes,
+    and modification times.  Other files (e.g., the hash database) are ignored.
+    """
+    out: list[tuple[Path, NormalizedName, Version]] = []
+    h = hashlib.sha256()
+    for path in sorted(directory.iterdir()):
+        if path.is_file() and (parsed := parse_filename(path)) is not None:
+            out.append((path, *parsed))
+            stat = path.stat()
+            h.update(f"{path.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return out, h.hexdigest()
+
+
+@dataclass
+class Wheelhouse:
+    """
+    Wheels and sdists in ``directory`` (not searched recursively).
+
+    Pass ``scan`` (from :func:`_scan` of the resolved ``directory``) to reuse a
+    listing already made.
+    """
+
+    directory: Path
+    _files: dict[str, dict[Version, list[Path]]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    #: Hash of distribution names, sizes, and modification times.
+    signature: str = field(init=False)
+    scan: InitVar[_Scan | None] = None
+
+    def __post_init__(self, scan: _Scan | None) -> None:
+        self.directory = Path(self.directory).resolve()
+        distributions, self.signature = _scan(self.directory) if scan is None else scan
+        for path, name, version in distributions:
+            self._files.setdefault(name, {}).setdefault(version, []).append(path)
+
+    def select(self, requirement: NormalizedRequirement) -> Version | None:
+        """Highest version in the wheelhouse satisfying ``requirement``."""
+        versions = self._files.get(requirement.name, {})
+        return max(requirement.specifier.filter(versions), default=None)
+
+    def files(self, name: str, version: Version) -> list[Path]:
+        """Distributions of ``name`` at ``version``."""
+        return self._files.get(name, {}).get(version, [])
+
+    def pin(
+        self, requirements: Iterable[NormalizedRequirement]
+    ) -> list[tuple[NormalizedRequirement, list[Path]]]:
+        """
+        Pin ``requirements`` to ``==version`` of the selected distributions.
+
+        Returns
+        -------
+        list of tuple
+            Pinned requirement and its distributions, sorted by requirement.
+            Requirements without a match are left as is (with no
+            distributions), and reported with a warning.
+        """
+        out: list[tuple[NormalizedRequirement, list[Path]]] = []
+        missing: list[str] = []
+        for req in requirements:
+            if isinstance(req, FallbackRequirement) or req.url:
+                out.append((req, []))
+            elif (version := self.select(req)) is None:
+                missing.append(str(req))
+                out.append((req, []))
+            else:
+                pinned = type(req)(str(req))
+                pinned.specifier = SpecifierSet(f"=={version}")
+                out.append((pinned, self.files(req.name, version)))
+        if missing:
+            logger.warning(
+                "Not pinned (no matching distribution in %s): %s",
+                self.directory,
+                ", ".join(sorted(missing)),
+            )
+        return sorted(out, key=lambda x: str(x[0]))
+
+    def lines(
+        self,
+        pinned: Iterable[tuple[NormalizedRequirement, list[Path]]],
+        hashes: bool = False,
+        max_workers: int | None = None,
+    ) -> list[str]:
+        """
+        Requirements file lines for ``pinned`` (from :meth:`pin`).
+
+        With ``hashes``, each line lists ``--hash`` options for every
+        distribution of the pinned version.  Since ``pip install
+        --require-hashes`` rejects files with any unhashed requirement, a
+        :class:`ValueError` is raised if a requirement has no distribution.
+        """
+        pinned = list(pinned)
+        if not hashes:
+            return [str(req) for req, _ in pinned]
+        if unhashed := [str(req) for req, paths in pinned if not paths]:
+            msg = (
+                f"Cannot hash requirements without a distribution in "
+                f"{self.directory}: {', '.join(unhashed)}"
+            )
+            raise ValueError(msg)
+
+        with self._lock:
+            digests = file_hashes(
+                (path for _, paths in pinned for path in paths),
+                hash_db_path(self.directory),
+                max_workers=max_workers,
+            )
+        return [
+            " \\\n    ".join([
+                str(req),
+                *sorted(f"--hash=sha256:{digests[path]}" for path in paths),
+            ])
+            for req, paths in pinned
+        ]
+
+
+_WHEELHOUSES: dict[Path, Wheelhouse] = {}
+_WHEELHOUSES_LOCK = threading.Lock()
+register_gauge("wheelhouses", _WHEELHOUSES.__len__)
+
+
+def load_wheelhouse(directory: str | Path) -> Wheelhouse:
+    """
+    Cached :class:`Wheelhouse` (rescanned when distributions are added, removed,
+    or changed).
+    """
+    directory = Path(directory).resolve()
+    scan = _scan(directory)
+    with _WHEELHOUSES_LOCK:
+        if (out := _WHEELHOUSES.get(directory)) is None or out.signature != scan[1]:
+            out = _WHEELHOUSES[directory] = Wheelhouse(directory, scan=scan)
+    return out
+
+
+def clear_cache() -> None:
+    """Forget wheelhouses loaded by :func:`load_wheelhouse`."""
+    with _WHEELHOUSES_LOCK:
+        _WHEELHOUSES.clear()
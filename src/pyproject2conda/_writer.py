@@ -0,0 +1,162 @@
+"""
+Write rendered outputs.
+
+All writes are atomic: content goes to a temporary file in the target
+directory, which then replaces the target with :func:`os.replace`.  Readers
+therefore see either the old or the new file, never a partial one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import locale
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ._instrument import count, timed
+from ._schema import Dedupe
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Literal
+
+
+def _get_umask() -> int:
+    mask = os.umask(0)
+    _ = os.umask(mask)
+    return mask
+
+
+# Temporary files are created with mode 0o600.  Use normal permissions instead.
+_FILE_MODE = 0o666 & ~_get_umask()
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _fsync_dir(path: Path) -> None:
+    if os.name == "nt":  # pragma: no cover
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_tmp(tmp: Path, content: str, fsync: bool, encoding: str | None) -> None:
+    encoding = encoding or locale.getpreferredencoding(False)
+    try:
+        f = tmp.open("x", encoding=encoding)
+    except FileNotFoundError:
+        # parents not created by a pre-pass (see :func:`make_parents`).
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        f = tmp.open("x", encoding=encoding)
+
+    with f:
+        _ = f.write(content)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    tmp.chmod(_FILE_MODE)
+
+
+def make_parents(paths: Iterable[str | Path | None]) -> None:
+    """Create parent directories of ``paths``, once per unique directory."""
+    for parent in {Path(p).parent for p in paths if p is not None}:
+        parent.mkdir(parents=True, exist_ok=True)
+
+
+def atomic_write(
+    content: str,
+    path: str | Path,
+    *,
+    fsync: bool = False,
+    encoding: str | None = None,
+) -> None:
+    """
+    Atomically write ``content`` to ``path``.
+
+    Parameters
+    ----------
+    content : str
+        Text to write.
+    path : path-like
+        Destination.  Missing parent directories are created.
+    fsync : bool, default False
+        If ``True``, flush file contents and the directory entry to disk
+        before returning.
+    encoding : str, optional
+        Defaults to the preferred locale encoding.
+    """
+    path = Path(path)
+    tmp = _tmp_path(path)
+    try:
+        _write_tmp(tmp, content, fsync=fsync, encoding=encoding)
+        # replaces the directory entry, so never writes through an existing link.
+        _ = tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def _link(canonical: Path, path: Path, dedupe: Dedupe) -> bool:
+    if path.exists() and path.samefile(canonical):
+        # already linked (from a previous run).
+        return True
+
+    tmp = _tmp_path(path)
+    try:
+        if dedupe == Dedupe.symlink:
+            tmp.symlink_to(os.path.relpath(canonical, path.parent))
+        else:
+            os.link(canonical, tmp)
+        _ = tmp.replace(path)
+    except OSError:
+        # e.g., cross device or no link support.  Fall back to plain write.
+        tmp.unlink(missing_ok=True)
+        return False
+    return True
+
+
+@dataclass
+class OutputWriter:
+    """
+    Write outputs, tracking content hashes.
+
+    With ``dedupe`` other than ``none``, the first output with a given content
+    is written, and later outputs with identical content are linked to it.
+    With ``fsync``, each write is flushed to disk.
+    """
+
+    dedupe: Dedupe = Dedupe.none
+    fsync: bool = False
+    _seen: dict[str, Path] = field(default_factory=dict, init=False, repr=False)
+
+    @timed("write")
+    def write(self, content: str, path: str | Path) -> Literal["written", "linked"]:
+        """Write (or link) ``content`` to ``path``."""
+        path = Path(path)
+        digest = hashlib.sha256(content.encode()).hexdigest()
+
+        if (
+            self.dedupe != Dedupe.none
+            and (canonical := self._seen.get(digest)) is not None
+            and _link(canonical, path, self.dedupe)
+        ):
+            if self.fsync:
+                _fsync_dir(path.parent)
+            count("outputs_linked")
+            return "linked"
+
+        atomic_write(content, path, fsync=self.fsync)
+        self._seen.setdefault(digest, path)
+        count("outputs_written")
+        return "written"
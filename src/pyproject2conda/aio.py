@@ -0,0 +1,175 @@
+"""
+Asyncio interface (:mod:`~pyproject2conda.aio`)
+===============================================
+
+Coroutines that render (and optionally write) outputs without blocking the
+event loop.  File access and dependency resolution run in worker threads
+(:func:`asyncio.to_thread`), with concurrency bounded by a semaphore.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .session import Session
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Sequence
+    from typing import Any, TypeVar
+
+    from .session import RenderedOutput, WriteResult
+
+    T = TypeVar("T")
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def _render_sync(
+    path: Path, envs: list[str] | None, session_kws: dict[str, Any]
+) -> list[RenderedOutput]:
+    return list(Session(path, **session_kws).iter_outputs(envs))
+
+
+def _write_sync(
+    path: Path, envs: list[str] | None, session_kws: dict[str, Any]
+) -> list[WriteResult]:
+    return Session(path, **session_kws).write_all(envs)
+
+
+async def _in_thread(
+    func: Callable[[Path, list[str] | None, dict[str, Any]], T],
+    limiter: asyncio.Semaphore | None,
+    path: str | Path,
+    envs: Iterable[str] | None,
+    session_kws: dict[str, Any],
+) -> T:
+    args = (Path(path), None if envs is None else list(envs), session_kws)
+    if limiter is None:
+        return await asyncio.to_thread(func, *args)
+    async with limiter:
+        return await asyncio.to_thread(func, *args)
+
+
+async def async_render_project(
+    path: str | Path,
+    envs: Iterable[str] | None = None,
+    *,
+    limiter: asyncio.Semaphore | None = None,
+    options: dict[str, Any] | None = None,
+    default_pythons: Sequence[str] | None = None,
+    header_cmd: str | None = "",
+) -> list[RenderedOutput]:
+    """
+    Render planned outputs for a single project off the event loop.
+
+    Parameters
+    ----------
+    path : path-like
+        Path to ``pyproject.toml``.
+    envs : iterable of str, optional
+        Environments to render.  Default is all environments.
+    limiter : asyncio.Semaphore, optional
+        Shared semaphore used to bound concurrency across calls.
+    options, default_pythons, header_cmd :
+        Passed to :class:`~pyproject2conda.session.Session`.
+
+    Returns
+    -------
+    list of RenderedOutput
+    """
+    return await _in_thread(
+        _render_sync,
+        limiter,
+        path,
+        envs,
+        {
+            "options": options or {},
+            "default_pythons": default_pythons,
+            "header_cmd": header_cmd,
+        },
+    )
+
+
+async def async_write_project(
+    path: str | Path,
+    envs: Iterable[str] | None = None,
+    *,
+    limiter: asyncio.Semaphore | None = None,
+    options: dict[str, Any] | None = None,
+    default_pythons: Sequence[str] | None = None,
+    header_cmd: str | None = "",
+) -> list[WriteResult]:
+    """
+    Write planned outputs for a single project off the event loop.
+
+    See :func:`async_render_project` for parameters.
+
+    Returns
+    -------
+    list of WriteResult
+    """
+    return await _in_thread(
+        _write_sync,
+        limiter,
+        path,
+        envs,
+        {
+            "options": options or {},
+            "default_pythons": default_pythons,
+            "header_cmd": header_cmd,
+        },
+    )
+
+
+async def async_render_projects(
+    paths: Iterable[str | Path],
+    envs: Iterable[str] | None = None,
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    write: bool = False,
+    options: dict[str, Any] | None = None,
+    default_pythons: Sequence[str] | None = None,
+    header_cmd: str | None = "",
+) -> dict[Path, list[RenderedOutput] | list[WriteResult]]:
+    """
+    Render (or write) outputs for many projects concurrently.
+
+    At most ``max_concurrency`` projects are processed at once.
+
+    Returns
+    -------
+    dict
+        Mapping from ``pyproject.toml`` path to its results (in the same order
+        as ``paths``).  Results are :class:`~pyproject2conda.session.WriteResult`
+        if ``write``, and :class:`~pyproject2conda.session.RenderedOutput`
+        otherwise.
+    """
+    if max_concurrency < 1:
+        msg = f"max_concurrency must be positive, not {max_concurrency}"
+        raise ValueError(msg)
+
+    paths_ = [Path(p) for p in paths]
+    envs = None if envs is None else list(envs)
+    limiter = asyncio.Semaphore(max_concurrency)
+    kws: dict[str, Any] = {
+        "limiter": limiter,
+        "options": options,
+        "default_pythons": default_pythons,
+        "header_cmd": header_cmd,
+    }
+
+    results: list[list[RenderedOutput] | list[WriteResult]]
+    if write:
+        results = list(
+            await asyncio.gather(*(async_write_project(p, envs, **kws) for p in paths_))
+        )
+    else:
+        results = list(
+            await asyncio.gather(
+                *(async_render_project(p, envs, **kws) for p in paths_)
+            )
+        )
+    return dict(zip(paths_, results, strict=True))
@@ -3,34 +3,60 @@
 Console script for pyproject2conda (:mod:`~pyproject2conda.cli`)
 ================================================================
 """
-# ruff:file-ignore[print,too-many-positional-arguments,too-many-arguments]
+# ruff:file-ignore[too-many-positional-arguments,too-many-arguments]
 
 from __future__ import annotations
 
-import locale
 import logging
 import os
-from functools import lru_cache
+import threading
+from collections import OrderedDict
+from enum import Enum
+from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING, Annotated
+from typing import TYPE_CHECKING, Annotated, ClassVar
 
 import typer
 from typer.core import TyperGroup
 
 from pyproject2conda import __version__
-from pyproject2conda._config import PyProject2CondaConfig
-from pyproject2conda._schema import Overwrite, PyProjectRequirementsWith2CondaSchema
+from pyproject2conda._schema import (
+    Dedupe,
+    Overwrite,
+    PinStrategy,
+)
 from pyproject2conda._utils import (
     update_target,
 )
-from pyproject2conda.requirements import RequirementsConfig, conda_and_pip_reqs_to_list
+from pyproject2conda.requirements import (
+    RequirementsConfig,
+    _check_allow_empty,  # pyright: ignore[reportPrivateUsage]
+    conda_and_pip_reqs_to_list,
+)
 
+from ._cache import CACHE_DIR_ENV, OutputCache, parse_size
 from ._compat import tomllib
+from ._instrument import collect_stats, count, record, register_gauge, scope
+from ._instrument import project as project_phase
+from ._lock import claim_outputs, inputs_key
+from ._shard import Manifest, Shard, file_digest
 from ._typing_compat import override
+from ._writer import OutputWriter, atomic_write, make_parents
+from .session import load_configs, mapping_paths, source_paths, source_signature
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from typing import Any
 
+    from pyproject2conda._config import PyProject2CondaConfig
+
+    from ._instrument import Counters, Timings
+    from ._lockfile import Lockfile
+    from ._memory import MemoryReport
+    from ._normalized_requirements import CondaRequirement, NormalizedRequirement
+    from ._wheelhouse import Wheelhouse
+    from .session import RenderedOutput, ResolvedCache
+
 # * Logger -----------------------------------------------------------------------------
 
 FORMAT = "%(message)s [%(name)s - %(levelname)s]"
@@ -74,16 +100,57 @@ def _callback_version(value: bool) -> None:
         raise typer.Exit
 
 
+class ReportFormat(str, Enum):
+    """Options for ``--timings``, ``--memory-report``, and ``--stats``"""
+
+    table = "table"
+    json = "json"
+
+
+def _callback_pyproject(ctx: typer.Context, value: Path) -> Path:
+    # attribute timings and memory to the project until the command finishes
+    if not ctx.resilient_parsing:
+        ctx.with_resource(project_phase(value))
+    return value
+
+
+def _callback_profile_phase(value: str | None) -> str | None:
+    from ._instrument import PHASES
+
+    if value is not None and value not in PHASES:
+        msg = f"Must be one of {', '.join(PHASES)}"
+        raise typer.BadParameter(msg)
+    return value
+
+
+def _report(
+    report: Timings | MemoryReport | Counters, output_format: ReportFormat
+) -> None:
+    typer.echo(
+        report.to_json() if output_format == ReportFormat.json else report.table(),
+        err=True,
+    )
+
+
 # * Typer App --------------------------------------------------------------------------
 class _AliasedGroup(TyperGroup):
     """Provide aliasing for commands"""
 
+    # Commands added after prefixes were established.  These can only be invoked
+    # by full name so existing prefixes (e.g., ``c`` for ``conda-requirements``)
+    # remain unique.
+    _exact_only: ClassVar[frozenset[str]] = frozenset({"check", "plan"})
+
     @override
     def get_command(self, ctx: Any, cmd_name: str) -> Any | None:
         if (rv := super().get_command(ctx, cmd_name)) is not None:
             return rv
         if not (
-            matches := [x for x in self.list_commands(ctx) if x.startswith(cmd_name)]
+            matches := [
+                x
+                for x in self.list_commands(ctx)
+                if x.startswith(cmd_name) and x not in self._exact_only
+            ]
         ):
             return None
         if len(matches) == 1:
@@ -97,12 +164,29 @@ class _AliasedGroup(TyperGroup):
     def list_commands(self, ctx: Any) -> list[str]:  # ruff:ignore[unused-method-argument]
         return list(self.commands)
 
+    @override
+    def invoke(self, ctx: Any) -> Any:
+        if (path := ctx.params.get("profile")) is None:
+            return super().invoke(ctx)
+
+        from ._profile import Profiler
+
+        profiler = Profiler(phase=ctx.params.get("profile_phase"))
+        try:
+            with profiler:
+                return super().invoke(ctx)
+        finally:
+            profiler.write(
+                str(path).replace("{command}", ctx.invoked_subcommand or "main")
+            )
+
 
 app: typer.Typer = typer.Typer(cls=_AliasedGroup, no_args_is_help=True)
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: Annotated[  # ruff:ignore[unused-function-argument]
         bool,
         typer.Option("--version", "-v", callback=_callback_version, is_eager=True),
@@ -117,6 +201,69 @@ def main(
             is_eager=True,
         ),
     ] = None,
+    timings: Annotated[
+        ReportFormat | None,
+        typer.Option(
+            "--timings",
+            envvar="P2C_TIMINGS",
+            help="""
+            Record wall time, CPU time, and call counts of each phase (parsing,
+            validation, environment merging, resolution, marker evaluation,
+            rendering, and writing), per environment and output.  Print a
+            summary ``table`` or ``json`` to standard error on exit.
+            """,
+        ),
+    ] = None,
+    profile: Annotated[  # ruff:ignore[unused-function-argument]
+        Path | None,
+        typer.Option(
+            "--profile",
+            help="""
+            Profile the command with ``cProfile``.  Writes ``pstats`` data to
+            this path, and collapsed stacks (for flame graph tools) to the same
+            path with suffix ``.folded``.  ``{command}`` in the path is replaced
+            by the command name.
+            """,
+        ),
+    ] = None,
+    profile_phase: Annotated[  # ruff:ignore[unused-function-argument]
+        str | None,
+        typer.Option(
+            "--profile-phase",
+            help="""
+            Only profile this phase (one of ``project``, ``parse``,
+            ``validate``, ``get_env``, ``resolve``, ``markers``, ``render``,
+            ``write``).
+            """,
+            callback=_callback_profile_phase,
+        ),
+    ] = None,
+    memory_report: Annotated[
+        ReportFormat | None,
+        typer.Option(
+            "--memory-report",
+            envvar="P2C_MEMORY_REPORT",
+            help="""
+            Trace memory allocations (with ``tracemalloc``).  Print peak and
+            retained memory of each phase and project, top allocation sites,
+            and sizes of caches as a ``table`` or ``json`` to standard error on
+            exit.
+            """,
+        ),
+    ] = None,
+    stats: Annotated[
+        ReportFormat | None,
+        typer.Option(
+            "--stats",
+            envvar="P2C_STATS",
+            help="""
+            Count work and cache hits (requirements parsed, marker evaluations,
+            resolution cache hits and misses, environment merges, and outputs
+            rendered, written, and skipped).  Print counters as a ``table`` or
+            ``json`` to standard error on exit.
+            """,
+        ),
+    ] = None,
 ) -> None:
     """
     Extract conda ``environment.yaml`` and pip ``requirement.txt`` files from ``pyproject.toml``
@@ -132,7 +279,17 @@ def main(
             $ p2c y ...
             $ python -m pyproject2conda yaml ...
     """
-    return
+    if timings is not None:
+        ctx.call_on_close(partial(_report, ctx.with_resource(record()), timings))
+    if stats is not None:
+        ctx.call_on_close(partial(_report, ctx.with_resource(collect_stats()), stats))
+    if memory_report is not None:
+        from ._memory import MemoryReport
+
+        # report after tracing stops (callbacks run last in, first out)
+        report = MemoryReport()
+        ctx.call_on_close(partial(_report, report, memory_report))
+        _ = ctx.with_resource(report)
 
 
 # * Options ----------------------------------------------------------------------------
@@ -142,6 +299,7 @@ PYPROJECT_CLI = Annotated[
     typer.Option(
         "--pyproject",
         help="input pyproject.toml file",
+        callback=_callback_pyproject,
         default_factory=lambda: Path("./pyproject.toml"),
         show_default="pyproject.toml",
     ),
@@ -253,6 +411,69 @@ PIP_ONLY_CLI = Annotated[
         help="""Treat all requirements as pip requirements. Use option ``pip_only`` in pyproject.toml""",
     ),
 ]
+REPODATA_CLI = Annotated[
+    list[str] | None,
+    typer.Option(
+        "--repodata",
+        help="""
+        Local ``repodata.json`` snapshot, ``conda-meta`` directory, or package cache
+        directory.  Can be specified multiple times.  Dependencies without a
+        ``[tool.pyproject2conda.dependencies]`` entry go to pip if no package
+        satisfying them is available in these sources.  Sources are indexed once
+        (to a SQLite file, rebuilt when a source changes).  Use option ``repodata``
+        in pyproject.toml.
+        """,
+    ),
+]
+PIN_FROM_CLI = Annotated[
+    str | None,
+    typer.Option(
+        "--pin-from",
+        help="""
+        ``uv.lock`` or ``pylock.toml`` file.  Conda and pip requirements are pinned
+        to the versions locked for the target python (the running python for
+        ``requirements`` output).  Requirements missing from
+        the lockfile, or whose locked version does not satisfy their specifier,
+        are reported and left unpinned.  Use option ``pin_from`` in
+        pyproject.toml.
+        """,
+    ),
+]
+PIN_STRATEGY_CLI = Annotated[
+    PinStrategy | None,
+    typer.Option(
+        "--pin-strategy",
+        case_sensitive=False,
+        help="""
+        Pin each conda requirement to the highest (or lowest) version in the
+        ``--repodata`` sources satisfying its specifier and the target python.
+        Requires ``--repodata``.  Use option ``pin_strategy`` in pyproject.toml.
+        """,
+    ),
+]
+WHEELHOUSE_CLI = Annotated[
+    str | None,
+    typer.Option(
+        "--wheelhouse",
+        help="""
+        Directory of wheels and sdists.  Requirements are pinned to the highest
+        version available there.  Use option ``wheelhouse`` in pyproject.toml.
+        """,
+    ),
+]
+HASHES_CLI = Annotated[
+    bool,
+    typer.Option(
+        "--hashes",
+        help="""
+        Add ``--hash`` options (for ``pip install --require-hashes``) for the
+        ``--wheelhouse`` distributions of each pinned requirement.  Requires
+        ``--wheelhouse``, and fails if a requirement has no distribution there.
+        Hashes are cached in a sidecar database in the wheelhouse.  Use option
+        ``hashes`` in pyproject.toml.
+        """,
+    ),
+]
 PYTHON_INCLUDE_CLI = Annotated[
     str | None,
     typer.Option(
@@ -385,6 +606,15 @@ YAML_EXT_CLI = Annotated[
         """,
     ),
 ]
+JSON_EXT_CLI = Annotated[
+    str | None,
+    typer.Option(
+        "--json-ext",
+        help="""
+        Extension to use with json file output created from template.  Defaults to ``".json"``
+        """,
+    ),
+]
 DRY_CLI = Annotated[
     bool,
     typer.Option(
@@ -392,6 +622,212 @@ DRY_CLI = Annotated[
         help="If passed, do a dry run",
     ),
 ]
+
+
+class ProjectFormat(str, Enum):
+    """Options for ``project --format``"""
+
+    files = "files"
+    ndjson = "ndjson"
+
+
+class CheckFormat(str, Enum):
+    """Options for ``check --format``"""
+
+    diff = "diff"
+    json = "json"
+
+
+CHECK_FORMAT_CLI = Annotated[
+    CheckFormat,
+    typer.Option(
+        "--format",
+        case_sensitive=False,
+        help="""
+        Report format.
+        (diff): Unified diff of each stale or missing output.
+        (json): Summary with keys ``checked`` (number of files) and ``stale`` (list of
+        records with keys ``env``, ``style``, ``python``, ``path``, and ``status``).
+        """,
+    ),
+]
+JOBS_CLI = Annotated[
+    int | None,
+    typer.Option(
+        "--jobs",
+        "-j",
+        min=1,
+        help="Number of threads used to render outputs.  Defaults to a value based on the number of processors.",
+    ),
+]
+
+
+class PlanFormat(str, Enum):
+    """Options for ``plan --format``"""
+
+    json = "json"
+    make = "make"
+    ninja = "ninja"
+
+
+PLAN_FORMAT_CLI = Annotated[
+    PlanFormat,
+    typer.Option(
+        "--format",
+        case_sensitive=False,
+        help="""
+        Build graph format.
+        (json): Record per output with keys ``env``, ``style``, ``python``, ``output``,
+        ``inputs``, and ``command``.
+        (make): Makefile fragment with a grouped target (GNU make 4.3+) per environment, and
+        phony target ``p2c-all``.
+        (ninja): Ninja build file with an edge per environment, and default target ``p2c-all``.
+        """,
+    ),
+]
+
+
+PROJECT_FORMAT_CLI = Annotated[
+    ProjectFormat,
+    typer.Option(
+        "--format",
+        case_sensitive=False,
+        help="""
+        Output format.
+        (files): Create output files.
+        (ndjson): Stream one json record per planned output (environment, python version, and style)
+        to stdout, with keys ``env``, ``style``, ``python``, ``output``, ``name``, ``channels``,
+        ``dependencies`` (conda), and ``pip``.  No files are written.
+        """,
+    ),
+]
+DEDUPE_CLI = Annotated[
+    Dedupe,
+    typer.Option(
+        "--dedupe",
+        case_sensitive=False,
+        help="""
+        How to handle outputs with byte-identical content.
+        (none): Write each output.
+        (hardlink): Write the first output, and hard link the others to it.
+        (symlink): Write the first output, and symlink (relative) the others to it.
+        Falls back to writing if links are not supported.
+        """,
+    ),
+]
+FSYNC_CLI = Annotated[
+    bool,
+    typer.Option(
+        "--fsync/--no-fsync",
+        help="""
+        Flush each output (and its directory entry) to disk before continuing.
+        Use where durability matters (e.g., before snapshotting a container layer).
+        """,
+    ),
+]
+LOCK_CLI = Annotated[
+    bool,
+    typer.Option(
+        "--lock/--no-lock",
+        help="""
+        Serialize concurrent invocations on the same ``pyproject.toml`` with an
+        advisory file lock.  An invocation that waited on one with identical inputs
+        reuses its outputs instead of regenerating them.  Lock files are placed in
+        the temporary directory (override with ``PYPROJECT2CONDA_LOCK_DIR``).
+        """,
+    ),
+]
+LOCK_TIMEOUT_CLI = Annotated[
+    float | None,
+    typer.Option(
+        "--lock-timeout",
+        help="Seconds to wait for the lock before failing.  Default is to wait indefinitely.",
+    ),
+]
+SINCE_CLI = Annotated[
+    str | None,
+    typer.Option(
+        "--since",
+        metavar="REV",
+        help="""
+        Only create outputs if an input (``pyproject.toml``,
+        ``.python-version-default``, ``.python-version``, mapping files,
+        lockfile, repodata, or wheelhouse) changed (per git) since revision
+        ``REV`` (e.g., ``origin/main``), or if any output is missing.  Inputs
+        ignored by git or outside the repository are always considered changed.
+        """,
+    ),
+]
+CACHE_DIR_CLI = Annotated[
+    Path | None,
+    typer.Option(
+        "--cache-dir",
+        envvar=CACHE_DIR_ENV,
+        help="""
+        Directory caching rendered outputs, keyed by a hash of everything affecting
+        them.  Can be shared between processes and machines (e.g., a CI cache or
+        network mount).  Outputs found in the cache are copied rather than resolved.
+        """,
+    ),
+]
+CACHE_MAX_SIZE_CLI = Annotated[
+    int | None,
+    typer.Option(
+        "--cache-max-size",
+        metavar="SIZE",
+        parser=parse_size,
+        help="""
+        Evict least recently used cache entries beyond ``SIZE`` (e.g., ``500M``
+        or ``2G``) after each run.  Default is to never evict.
+        """,
+    ),
+]
+SHARD_CLI = Annotated[
+    Shard | None,
+    typer.Option(
+        "--shard",
+        metavar="I/N",
+        parser=Shard.parse,
+        help="""
+        Only process shard ``I`` (one based) of ``N``.  Planned items are
+        partitioned deterministically into ``N`` shards of balanced estimated
+        cost, so that ``N`` nodes running shards ``1/N`` through ``N/N`` together
+        process everything once.
+        """,
+    ),
+]
+MANIFEST_CLI = Annotated[
+    Path | None,
+    typer.Option(
+        "--manifest",
+        help="""
+        Write (partial) manifest of planned and processed items to this file.
+        Combine manifests of all shards with ``merge-manifests``.
+        """,
+    ),
+]
+REVS_CLI = Annotated[
+    list[str],
+    typer.Option(
+        "--revs",
+        metavar="REVS",
+        help="""
+        Git revisions to render.  Either a range (``A..B``, expanded oldest first)
+        or a single revision.  Can be specified multiple times.
+        """,
+    ),
+]
+OUTPUT_DIR_CLI = Annotated[
+    Path | None,
+    typer.Option(
+        "--output-dir",
+        "-d",
+        help="""
+        Write outputs to ``OUTPUT_DIR/{short sha}/{output}`` instead of
+        printing newline delimited json to stdout.
+        """,
+    ),
+]
 # For conda-requirements
 PREFIX_CLI = Annotated[
     Path | None,
@@ -435,23 +871,174 @@ def _get_header_cmd(
     if header:
         import sys
 
-        return " ".join([Path(sys.argv[0]).name, *sys.argv[1:]])
+        argv: list[str] = getattr(_LOCAL, "argv", None) or sys.argv
+        return " ".join([Path(argv[0]).name, *argv[1:]])
 
     return None
 
 
-@lru_cache
+_ECHO_LOCK = threading.Lock()
+# Per thread invocation state (captured stdout and command line) used by ``batch``.
+_LOCAL = threading.local()
+
+
+def _echo(message: str = "", nl: bool = True) -> None:
+    """
+    Write ``message`` to stdout as a single write.
+
+    Commands can run concurrently (for example, from several threads), so
+    output is serialized to keep each message contiguous.  If the current
+    thread is capturing output (see ``batch``), write to that buffer instead.
+    """
+    if (buffer := getattr(_LOCAL, "stdout", None)) is not None:
+        buffer.write(f"{message}\n" if nl else message)
+        return
+
+    with _ECHO_LOCK:
+        typer.echo(message, nl=nl)
+
+
+#: Maximum number of cached configs (least recently used are evicted).
+_CONFIGS_MAXSIZE = 128
+# Guards _CONFIGS_CACHE and _CONFIGS_LOADING.  Files are parsed under per path
+# locks (in _CONFIGS_LOADING), so different files load concurrently.
+_CONFIGS_LOCK = threading.Lock()
+# path -> ((mtime_ns, size), configs)
+_CONFIGS_CACHE: OrderedDict[
+    Path, tuple[tuple[int, int], tuple[RequirementsConfig, PyProject2CondaConfig]]
+] = OrderedDict()
+# path -> (lock, number of threads holding or waiting on lock)
+_CONFIGS_LOADING: dict[Path, tuple[threading.Lock, int]] = {}
+
+
+def _cached_configs(
+    path: Path, stamp: tuple[int, int]
+) -> tuple[RequirementsConfig, PyProject2CondaConfig] | None:
+    """Cached configs for ``path`` (if loaded from a file with ``stamp``)."""
+    with _CONFIGS_LOCK:
+        if (entry := _CONFIGS_CACHE.get(path)) is None or entry[0] != stamp:
+            return None
+        _CONFIGS_CACHE.move_to_end(path)
+        return entry[1]
+
+
 def _get_configs(path: Path) -> tuple[RequirementsConfig, PyProject2CondaConfig]:
-    schema = PyProjectRequirementsWith2CondaSchema.model_validate(
-        tomllib.loads(path.read_text(encoding="utf-8"))
-    )
-    requirements_config = RequirementsConfig.from_schema(schema)
-    tool_config = PyProject2CondaConfig.from_schema(
-        schema.tool.pyproject2conda,
-        default_pythons=None,
-        all_pythons=schema.all_python_versions,
-    )
-    return requirements_config, tool_config
+    """
+    Cached (and thread safe) configs for ``path``.
+
+    Configs are reloaded if the size or modification time of ``path`` changes.
+    Concurrent callers parse each file once.
+    """
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if (out := _cached_configs(path, stamp)) is not None:
+        return out
+
+    with _CONFIGS_LOCK:
+        loading, users = _CONFIGS_LOADING.get(path, (None, 0))
+        if loading is None:
+            loading = threading.Lock()
+        _CONFIGS_LOADING[path] = (loading, users + 1)
+    try:
+        with loading:
+            if (out := _cached_configs(path, stamp)) is None:
+                out = load_configs(path)
+                with _CONFIGS_LOCK:
+                    _CONFIGS_CACHE[path] = (stamp, out)
+                    _CONFIGS_CACHE.move_to_end(path)
+                    while len(_CONFIGS_CACHE) > _CONFIGS_MAXSIZE:
+                        _ = _CONFIGS_CACHE.popitem(last=False)
+    finally:
+        # forget lock once no other thread holds or waits on it
+        with _CONFIGS_LOCK:
+            _, users = _CONFIGS_LOADING[path]
+            if users == 1:
+                del _CONFIGS_LOADING[path]
+            else:
+                _CONFIGS_LOADING[path] = (loading, users - 1)
+    return out
+
+
+def _clear_configs_cache() -> None:
+    with _CONFIGS_LOCK:
+        _CONFIGS_CACHE.clear()
+
+
+def _all_configs() -> list[tuple[RequirementsConfig, PyProject2CondaConfig]]:
+    with _CONFIGS_LOCK:
+        return [configs for _, configs in _CONFIGS_CACHE.values()]
+
+
+# pylint: disable=protected-access
+register_gauge("configs", _CONFIGS_CACHE.__len__)
+register_gauge(
+    "envs",
+    lambda: sum(len(c._cache) for _, c in _all_configs()),  # ruff:ignore[private-member-access]  # pyright: ignore[reportPrivateUsage]
+)
+register_gauge(
+    "requirements",
+    lambda: sum(
+        len(r.optional_dependencies.resolved) + len(r.dependency_groups.resolved)
+        for r, _ in _all_configs()
+    ),
+)
+register_gauge(
+    "markers",
+    lambda: sum(len(r._marker_cache) for r, _ in _all_configs()),  # ruff:ignore[private-member-access]  # pyright: ignore[reportPrivateUsage]
+)
+# pylint: enable=protected-access
+
+
+def _available(
+    repodata: list[str] | None,
+) -> Callable[[NormalizedRequirement], bool] | None:
+    """Availability check against ``repodata`` sources (if any)."""
+    if not repodata:
+        return None
+    from ._repodata import load_index
+
+    return load_index(repodata).available
+
+
+def _pin_conda(
+    repodata: list[str] | None, pin_strategy: PinStrategy | None
+) -> Callable[[set[CondaRequirement], str | None], set[CondaRequirement]] | None:
+    """Pin conda requirements to versions in ``repodata`` (if ``pin_strategy``)."""
+    if pin_strategy is None:
+        return None
+    if not repodata:
+        msg = "--pin-strategy requires --repodata"
+        raise ValueError(msg)
+    from ._repodata import load_index
+
+    return partial(load_index(repodata).pin, strategy=pin_strategy.value)
+
+
+def _wheelhouse(wheelhouse: str | None) -> Wheelhouse | None:
+    """Wheelhouse to pin requirements to (if any)."""
+    if not wheelhouse:
+        return None
+    from ._wheelhouse import load_wheelhouse
+
+    return load_wheelhouse(wheelhouse)
+
+
+def _repodata_signature(repodata: list[str] | None) -> str | None:
+    """Signature of ``repodata`` files (if any)."""
+    if not repodata:
+        return None
+    from ._repodata import signature
+
+    return signature(repodata)
+
+
+def _lockfile(pin_from: str | Path | None) -> Lockfile | None:
+    """Lockfile to pin requirements to (if any)."""
+    if not pin_from:
+        return None
+    from ._lockfile import load_lockfile
+
+    return load_lockfile(pin_from)
 
 
 def _log_skipping(
@@ -479,6 +1066,287 @@ def _log_creating(
     logger.info(s)
 
 
+def _rendered_to_str(rendered: RenderedOutput, allow_empty: bool) -> str:
+    if rendered.content is None:
+        return _check_allow_empty(allow_empty)
+    if rendered.style == "conda-requirements":
+        return f"#conda requirements\n{rendered.content}\n#pip requirements\n{rendered.content_pip}"
+    return rendered.content
+
+
+def _stream_ndjson(
+    requirements_config: RequirementsConfig,
+    config: PyProject2CondaConfig,
+    envs: list[str] | None,
+) -> None:
+    import json
+
+    from .session import render_spec
+
+    for env_name, style, spec in config.iter_named_envs(envs):
+        rendered = render_spec(
+            requirements_config, config, env_name, style, spec, header_cmd=None
+        )
+        _echo(json.dumps(rendered.to_dict()))
+
+
+def _config_files(
+    pyproject_filename: Path, requirements_config: RequirementsConfig
+) -> list[Path]:
+    """Configuration files affecting outputs of ``pyproject_filename``."""
+    return [
+        pyproject_filename,
+        Path(".python-version-default"),
+        Path(".python-version"),
+        *mapping_paths(requirements_config),
+    ]
+
+
+def _input_files(
+    pyproject_filename: Path,
+    requirements_config: RequirementsConfig,
+    planned: list[tuple[str, str, Any]],
+) -> list[Path]:
+    """
+    Files affecting ``planned`` outputs of ``pyproject_filename``.
+
+    Includes lockfiles, repodata files, and wheelhouse directories.
+    """
+    return [
+        *_config_files(pyproject_filename, requirements_config),
+        *source_paths(spec for _, _, spec in planned),
+    ]
+
+
+def _unchanged_since(
+    rev: str,
+    inputs: list[Path],
+    planned: list[tuple[str, str, Any]],
+) -> bool:
+    from . import _git
+
+    if _git.any_changed(inputs, rev):
+        return False
+
+    # missing outputs are always created
+    return all(
+        path.exists()
+        for _, _, spec in planned
+        for path in (spec.output, getattr(spec, "output_pip", None))
+        if path is not None
+    )
+
+
+def _output_cost(
+    requirements_config: RequirementsConfig, style: str, spec: Any
+) -> float:
+    """Estimated cost of rendering an output: requirements to resolve (and map)."""
+    extras = requirements_config.optional_dependencies.unresolved
+    groups = requirements_config.dependency_groups.unresolved
+    n_reqs = len(spec.pip_deps) + len(getattr(spec, "conda_deps", ()))
+    if not spec.skip_package:
+        n_reqs += len(requirements_config.dependencies)
+    n_reqs += sum(len(extras.get(name, ())) for name in spec.extras)
+    n_reqs += sum(len(groups.get(name, ())) for name in spec.groups)
+    n_reqs += sum(
+        len(extras.get(name, groups.get(name, ()))) for name in spec.extras_or_groups
+    )
+    # conda styles also map names to conda packages
+    return (1 + n_reqs) * (1 if style == "requirements" else 2)
+
+
+def _shard_outputs(
+    requirements_config: RequirementsConfig,
+    config: PyProject2CondaConfig,
+    envs: list[str] | None,
+    shard: Shard | None,
+) -> tuple[list[str], list[tuple[str, str, Any]]]:
+    """All planned outputs, and those (with specs) in ``shard``."""
+    planned: list[tuple[str, str, Any]] = list(config.iter_named_envs(envs))
+    all_outputs = [str(spec.output) for _, _, spec in planned]
+    if shard is None:
+        return all_outputs, planned
+
+    selected = set(
+        shard.select({
+            str(spec.output): _output_cost(requirements_config, style, spec)
+            for _, style, spec in planned
+        })
+    )
+    return all_outputs, [p for p in planned if str(p[2].output) in selected]
+
+
+def _project_manifest(
+    all_outputs: list[str],
+    planned: list[tuple[str, str, Any]],
+    shard: Shard | None,
+) -> Manifest:
+    """Manifest recording digests of outputs (on disk) in ``planned``."""
+    return Manifest(
+        kind="project",
+        planned=all_outputs,
+        items={
+            str(spec.output): {
+                "env": env_name,
+                "style": style,
+                "python": getattr(spec, "python", None),
+                "files": {
+                    str(path): file_digest(path)
+                    for path in (spec.output, getattr(spec, "output_pip", None))
+                    if path is not None
+                },
+            }
+            for env_name, style, spec in planned
+        },
+        shards=[str(shard or Shard(1, 1))],
+    )
+
+
+def _claim_and_generate(
+    pyproject_filename: Path,
+    key: str,
+    timeout: float | None,
+    generate: Callable[[], list[Path]],
+) -> None:
+    """Run ``generate`` under lock, unless a concurrent run already did the work."""
+    with claim_outputs(pyproject_filename, key, timeout=timeout) as claim:
+        if claim.reused:
+            logger.info(
+                "Reusing outputs of concurrent invocation for %s", pyproject_filename
+            )
+        else:
+            claim.complete(generate())
+
+
+def _output_wheelhouse(
+    wheelhouses: dict[str, Wheelhouse | None], style: str, spec: Any
+) -> Wheelhouse | None:
+    """Wheelhouse of output (loaded once per directory in ``wheelhouses``)."""
+    # only requirements are pinned to wheelhouses
+    if style != "requirements" or not spec.wheelhouse:
+        return None
+    if spec.wheelhouse not in wheelhouses:
+        wheelhouses[spec.wheelhouse] = _wheelhouse(spec.wheelhouse)
+    return wheelhouses[spec.wheelhouse]
+
+
+def _project_outputs(
+    requirements_config: RequirementsConfig,
+    config: PyProject2CondaConfig,
+    planned: list[tuple[str, str, Any]],
+    pyproject_filename: Path,
+    writer: OutputWriter,
+    *,
+    dry: bool,
+    verbose: int | None,
+    cache: OutputCache | None = None,
+) -> list[Path]:
+    """Create (or print, if ``dry``) planned outputs.  Returns written paths."""
+    from .session import render_spec
+
+    cache_inputs: tuple[Any, ...] = ()
+    if cache is not None:
+        from ._history import relevant_tables
+
+        cache_inputs = (
+            relevant_tables(
+                tomllib.loads(pyproject_filename.read_text(encoding="utf-8"))
+            ),
+            config.default_pythons,
+            # contents of mapping files
+            getattr(requirements_config.dependency_map, "digests", None),
+        )
+    if not dry:
+        make_parents(
+            path
+            for _, _, spec in planned
+            for path in (spec.output, getattr(spec, "output_pip", None))
+        )
+
+    # resolve each environment once for all of its conda styles
+    resolved: ResolvedCache = {}
+    # scan each wheelhouse once
+    wheelhouses: dict[str, Wheelhouse | None] = {}
+    written: list[Path] = []
+    for env_name, style, spec_tmp in planned:
+        spec = spec_tmp.model_copy(update={"output": None}) if dry else spec_tmp
+        if dry:
+            # small header
+            _echo("# " + "-" * 20 + f"\n# Creating {style} {spec_tmp.output}")
+
+        # Special case: have output and userconfig.  Check update
+        if not update_target(
+            spec.output,
+            pyproject_filename,
+            overwrite=spec.overwrite,
+        ):
+            if verbose:
+                _log_skipping(logger, style, spec.output)
+            continue
+
+        with scope(env_name, spec_tmp.output):
+            header_cmd = _get_header_cmd(spec.custom_command, spec.header, spec.output)
+            spec = spec.model_copy(
+                update={"custom_command": None, "header": header_cmd is not None}
+            )
+            wheelhouse = _output_wheelhouse(wheelhouses, style, spec)
+            render = partial(
+                render_spec,
+                requirements_config,
+                config,
+                env_name,
+                style,
+                spec,
+                header_cmd=header_cmd,
+                resolved=resolved,
+                wheelhouse=wheelhouse,
+            )
+            rendered = (
+                render()
+                if cache is None
+                else cache.get_or_render(
+                    cache.key(
+                        *cache_inputs,
+                        env_name,
+                        style,
+                        spec.model_dump(mode="json"),
+                        header_cmd,
+                        # contents of lockfile, wheelhouse, and repodata
+                        spec.pin_from and file_digest(spec.pin_from),
+                        wheelhouse and wheelhouse.signature,
+                        _repodata_signature(getattr(spec, "repodata", None)),
+                    ),
+                    render,
+                )
+            )
+
+            if spec.output is None:
+                _echo(_rendered_to_str(rendered, spec.allow_empty), nl=False)
+            else:
+                _log_creating(logger, style, spec.output)
+                for path, content in rendered.files():
+                    if writer.write(content, path) == "linked":
+                        logger.info("Linked %s to identical output", path)
+                    written.append(path)
+    return written
+
+
+def _close_cache(cache: OutputCache | None) -> None:
+    """Evict entries beyond size limit and log statistics."""
+    if cache is None:
+        return
+    _ = cache.prune()
+    stats = cache.stats
+    logger.info(
+        "Output cache: %d hits, %d misses (%.0f%% hit rate), %d corrupt, %d evicted",
+        stats.hits,
+        stats.misses,
+        100 * stats.hit_rate,
+        stats.corrupt,
+        stats.evicted,
+    )
+
+
 # * Commands ---------------------------------------------------------------------------
 # ** List
 # @app.command("l", hidden=True)
@@ -492,14 +1360,14 @@ def create_list(
 
     d, _ = _get_configs(pyproject_filename)
 
+    lines: list[str] = []
     for name, vals in (
         ("Extras", d.optional_dependencies.unresolved.keys()),
         ("Groups", d.dependency_groups.unresolved.keys()),
     ):
-        print(name)
-        print("======")
-        for val in sorted(vals):
-            print("*", val)
+        lines.extend((name, "======"))
+        lines.extend(f"* {val}" for val in sorted(vals))
+    _echo("\n".join(lines))
 
 
 # ** Yaml
@@ -518,6 +1386,9 @@ def yaml(
     python: PYTHON_CLI = None,
     skip_package: SKIP_PACKAGE_CLI = False,
     pip_only: PIP_ONLY_CLI = False,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
     header: HEADER_CLI = None,
     custom_command: CUSTOM_COMMAND_CLI = None,
     overwrite: OVERWRITE_CLI = Overwrite.force,
@@ -543,6 +1414,9 @@ def yaml(
         "python": python,
         "skip_package": skip_package,
         "pip_only": pip_only,
+        "repodata": repodata,
+        "pin_from": pin_from,
+        "pin_strategy": pin_strategy,
         "overwrite": overwrite,
         "verbose": verbose,
         "conda_deps": conda_deps,
@@ -553,7 +1427,8 @@ def yaml(
     d, c = _get_configs(pyproject_filename)
 
     c = c.update_options(options)
-    channels = channels or c.get_env(None).channels
+    env = c.get_env(None)
+    channels = channels or env.channels
 
     python_include, python_version = c.parse_pythons(
         python_include=python_include,
@@ -578,9 +1453,14 @@ def yaml(
         conda_deps=conda_deps,
         pip_deps=pip_deps,
         allow_empty=allow_empty,
+        available=_available(repodata or env.repodata),
+        lockfile=_lockfile(pin_from or env.pin_from),
+        pin_conda=_pin_conda(
+            repodata or env.repodata, pin_strategy or env.pin_strategy
+        ),
     )
     if not output:
-        print(s, end="")
+        _echo(s, nl=False)
 
 
 # ** Requirements
@@ -599,14 +1479,17 @@ def requirements(
     verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
     pip_deps: PIP_DEPS_CLI = None,
     allow_empty: Annotated[bool, ALLOW_EMPTY_OPTION] = False,
+    pin_from: PIN_FROM_CLI = None,
+    wheelhouse: WHEELHOUSE_CLI = None,
+    hashes: HASHES_CLI = False,
 ) -> None:
     """Create requirements.txt for pip dependencies.  Note that all requirements are normalized using ``packaging.requirements.Requirement``"""
     if not update_target(output, pyproject_filename, overwrite=overwrite.value):
         _log_skipping(logger, "requirements", output)
         return
 
-    d, _c = _get_configs(pyproject_filename)
-
+    d, c = _get_configs(pyproject_filename)
+    env = c.get_env(None)
     _log_creating(logger, "requirements", output)
 
     s = d.to_requirements(
@@ -618,9 +1501,12 @@ def requirements(
         header_cmd=_get_header_cmd(custom_command, header, output),
         pip_deps=pip_deps,
         allow_empty=allow_empty,
+        lockfile=_lockfile(pin_from or env.pin_from),
+        wheelhouse=_wheelhouse(wheelhouse or env.wheelhouse),
+        hashes=hashes or env.hashes,
     )
     if not output:
-        print(s, end="")
+        _echo(s, nl=False)
 
 
 # ** From project
@@ -637,13 +1523,29 @@ def project(
     conda_deps: CONDA_DEPS_CLI = None,
     reqs_ext: REQS_EXT_CLI = ".txt",
     yaml_ext: YAML_EXT_CLI = ".yaml",
+    json_ext: JSON_EXT_CLI = ".json",
     header: HEADER_CLI = None,
     custom_command: CUSTOM_COMMAND_CLI = None,
     overwrite: OVERWRITE_CLI = Overwrite.force,
     verbose: VERBOSE_CLI = None,
     dry: DRY_CLI = False,
     pip_only: PIP_ONLY_CLI = False,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
+    wheelhouse: WHEELHOUSE_CLI = None,
+    hashes: HASHES_CLI = False,
     allow_empty: Annotated[bool | None, ALLOW_EMPTY_OPTION] = None,
+    output_format: PROJECT_FORMAT_CLI = ProjectFormat.files,
+    dedupe: DEDUPE_CLI = Dedupe.none,
+    fsync: FSYNC_CLI = False,
+    lock: LOCK_CLI = True,
+    lock_timeout: LOCK_TIMEOUT_CLI = None,
+    since: SINCE_CLI = None,
+    cache_dir: CACHE_DIR_CLI = None,
+    cache_max_size: CACHE_MAX_SIZE_CLI = None,
+    shard: SHARD_CLI = None,
+    manifest: MANIFEST_CLI = None,
 ) -> None:
     """
     Create multiple environment files from ``pyproject.toml`` specification.
@@ -657,6 +1559,7 @@ def project(
     options = {
         "reqs_ext": reqs_ext,
         "yaml_ext": yaml_ext,
+        "json_ext": json_ext,
         "template": template,
         "template_python": template_python,
         "pip_deps": pip_deps,
@@ -667,42 +1570,61 @@ def project(
         "verbose": verbose,
         "allow_empty": allow_empty,
         "pip_only": pip_only or None,
+        "repodata": repodata,
+        "pin_from": pin_from,
+        "pin_strategy": pin_strategy,
+        "wheelhouse": wheelhouse,
+        "hashes": hashes or None,
     }
 
-    _, c = _get_configs(pyproject_filename)
+    d, c = _get_configs(pyproject_filename)
     c = c.update_options(options)
 
-    for style, env_tmp in c.iter_envs(envs=envs):
-        env = env_tmp.model_copy(update={"output": None}) if dry else env_tmp
-        if dry:
-            # small header
-            print("# " + "-" * 20)
-            print(f"# Creating {style} {env_tmp.output}")
+    if output_format == ProjectFormat.ndjson:
+        _stream_ndjson(d, c, envs)
+        return
 
-        # Special case: have output and userconfig.  Check update
-        if not update_target(
-            env.output,
+    all_outputs, planned = _shard_outputs(d, c, envs, shard)
+    inputs = _input_files(pyproject_filename, d, planned)
+    if since is not None and _unchanged_since(since, inputs, planned):
+        count("projects_unchanged")
+        logger.info("Skipping %s. Unchanged since %s", pyproject_filename, since)
+    else:
+        cache = (
+            None
+            if cache_dir is None
+            else OutputCache(cache_dir, max_size=cache_max_size)
+        )
+        generate = partial(
+            _project_outputs,
+            d,
+            c,
+            planned,
             pyproject_filename,
-            overwrite=env.overwrite,
-        ):
-            if verbose:
-                _log_skipping(logger, style, env.output)
+            OutputWriter(dedupe=dedupe, fsync=fsync),
+            dry=dry,
+            verbose=verbose,
+            cache=cache,
+        )
+        if dry or not lock:
+            _ = generate()
         else:
-            env = env.model_copy(update={"overwrite": Overwrite.force})
-            if style == "yaml":
-                yaml(
-                    pyproject_filename=pyproject_filename,
-                    **env.model_dump(exclude_unset=True),
-                )
-
-            elif style == "requirements":
-                requirements(
-                    pyproject_filename=pyproject_filename,
-                    **env.model_dump(exclude_unset=True),
-                )
-            else:  # pragma: no cover
-                msg = f"unknown style {style}"
-                raise ValueError(msg)
+            # lockfiles, repodata, and wheelhouses by signature (repodata may be large)
+            key = inputs_key(
+                _config_files(pyproject_filename, d),
+                source_signature(source_paths(spec for _, _, spec in planned)),
+                str(Path.cwd()),
+                {k: v for k, v in options.items() if k != "verbose"},
+                envs,
+                dedupe.value,
+                _get_header_cmd(None, True, None),
+                str(shard),
+            )
+            _claim_and_generate(pyproject_filename, key, lock_timeout, generate)
+        _close_cache(cache)
+
+    if manifest is not None and not dry:
+        _project_manifest(all_outputs, planned, shard).write(manifest)
 
 
 # ** Conda requirements
@@ -729,6 +1651,9 @@ def conda_requirements(
     # paths,
     conda_deps: CONDA_DEPS_CLI = None,
     pip_deps: PIP_DEPS_CLI = None,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
     verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
 ) -> None:
     """
@@ -747,7 +1672,8 @@ def conda_requirements(
         python=python,
     )
 
-    channels = channels or c.get_env(None).channels
+    env = c.get_env(None)
+    channels = channels or env.channels
 
     if path_conda and not path_pip:
         msg = "can only specify both path_conda and path_pip or neither"
@@ -775,11 +1701,16 @@ def conda_requirements(
         header_cmd=_get_header_cmd(custom_command, header, path_conda),
         conda_deps=conda_deps,
         pip_deps=pip_deps,
+        available=_available(repodata or env.repodata),
+        lockfile=_lockfile(pin_from or env.pin_from),
+        pin_conda=_pin_conda(
+            repodata or env.repodata, pin_strategy or env.pin_strategy
+        ),
     )
 
     if not path_conda:
         s = f"#conda requirements\n{deps_str}\n#pip requirements\n{reqs_str}"
-        print(s, end="")
+        _echo(s, nl=False)
 
 
 # ** json
@@ -798,6 +1729,9 @@ def to_json(
     skip_package: SKIP_PACKAGE_CLI = False,
     conda_deps: CONDA_DEPS_CLI = None,
     pip_deps: PIP_DEPS_CLI = None,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
     verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
     overwrite: OVERWRITE_CLI = Overwrite.force,
 ) -> None:
@@ -816,6 +1750,7 @@ def to_json(
     import json
 
     d, c = _get_configs(pyproject_filename)
+    env = c.get_env(None)
 
     python_include, python_version = c.parse_pythons(
         python_include=python_include,
@@ -833,6 +1768,11 @@ def to_json(
             skip_package=skip_package,
             conda_deps=conda_deps or (),
             pip_deps=pip_deps or (),
+            available=_available(repodata or env.repodata),
+            lockfile=_lockfile(pin_from or env.pin_from),
+            pin_conda=_pin_conda(
+                repodata or env.repodata, pin_strategy or env.pin_strategy
+            ),
         )
     )
 
@@ -841,11 +1781,583 @@ def to_json(
         "pip": pip_deps,
     }
 
-    if channels := channels or c.get_env(None).channels:
+    if channels := channels or env.channels:
         result["channels"] = channels
 
     if output:
-        with Path(output).open("w", encoding=locale.getpreferredencoding(False)) as f:
-            json.dump(result, f)
+        atomic_write(json.dumps(result), output)
+    else:
+        _echo(json.dumps(result))  # , indent=2))
+
+
+# ** Check
+@app.command()
+def check(
+    pyproject_filename: PYPROJECT_CLI,
+    envs: ENVS_CLI = None,
+    template: TEMPLATE_CLI = None,
+    template_python: TEMPLATE_PYTHON_CLI = None,
+    pip_deps: PIP_DEPS_CLI = None,
+    conda_deps: CONDA_DEPS_CLI = None,
+    reqs_ext: REQS_EXT_CLI = ".txt",
+    yaml_ext: YAML_EXT_CLI = ".yaml",
+    json_ext: JSON_EXT_CLI = ".json",
+    pip_only: PIP_ONLY_CLI = False,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
+    wheelhouse: WHEELHOUSE_CLI = None,
+    hashes: HASHES_CLI = False,
+    allow_empty: Annotated[bool | None, ALLOW_EMPTY_OPTION] = None,
+    output_format: CHECK_FORMAT_CLI = CheckFormat.diff,
+    jobs: JOBS_CLI = None,
+    verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Check that outputs of ``project`` are up to date.
+
+    Every planned output is rendered in memory and compared to the file on disk
+    (ignoring the header comment).  Nothing is written.  Exits with a non-zero
+    status if any output is stale or missing.
+    """
+    import json
+
+    from .session import Session
+
+    options = {
+        "reqs_ext": reqs_ext,
+        "yaml_ext": yaml_ext,
+        "json_ext": json_ext,
+        "template": template,
+        "template_python": template_python,
+        "pip_deps": pip_deps,
+        "conda_deps": conda_deps,
+        "allow_empty": allow_empty,
+        "pip_only": pip_only or None,
+        "repodata": repodata,
+        "pin_from": pin_from,
+        "pin_strategy": pin_strategy,
+        "wheelhouse": wheelhouse,
+        "hashes": hashes or None,
+    }
+    session = Session(
+        pyproject_filename,
+        options=options,
+        header_cmd=None,
+    )
+    results = session.check(envs, max_workers=jobs)
+    stale = [r for r in results if r.status != "ok"]
+
+    if output_format == CheckFormat.json:
+        _echo(
+            json.dumps({
+                "checked": len(results),
+                "stale": [r.to_dict() for r in stale],
+            })
+        )
     else:
-        print(json.dumps(result))  # , indent=2))
+        for result in stale:
+            logger.info("%s output %s", result.status.capitalize(), result.path)
+            _echo(result.diff(), nl=False)
+
+    if stale:
+        raise typer.Exit(1)
+
+
+# ** Plan
+def _plan_args(options: dict[str, Any]) -> list[str]:
+    """Command line arguments recreating non-default ``project`` options."""
+    flags = {
+        "template": "--template",
+        "template_python": "--template-python",
+        "reqs_ext": "--pip_deps-ext",
+        "yaml_ext": "--yaml-ext",
+        "json_ext": "--json-ext",
+        "custom_command": "--custom-command",
+        "pip_deps": "--pip-dep",
+        "conda_deps": "--conda-dep",
+        "repodata": "--repodata",
+        "pin_from": "--pin-from",
+        "pin_strategy": "--pin-strategy",
+        "wheelhouse": "--wheelhouse",
+    }
+    args: list[str] = []
+    for key, flag in flags.items():
+        value = options.get(key)
+        if isinstance(value, list):
+            for v in value:  # pyright: ignore[reportUnknownVariableType]
+                args.extend([flag, str(v)])  # pyright: ignore[reportUnknownArgumentType]
+        elif isinstance(value, Enum):
+            args.extend([flag, str(value.value)])
+        elif value is not None:
+            args.extend([flag, str(value)])
+
+    for key, flag in (("header", "header"), ("allow_empty", "allow-empty")):
+        if (value := options.get(key)) is not None:
+            args.append(f"--{flag}" if value else f"--no-{flag}")
+    args.extend(
+        f"--{key.replace('_', '-')}"
+        for key in ("pip_only", "hashes")
+        if options.get(key)
+    )
+    return args
+
+
+@app.command()
+def plan(
+    pyproject_filename: PYPROJECT_CLI,
+    envs: ENVS_CLI = None,
+    template: TEMPLATE_CLI = None,
+    template_python: TEMPLATE_PYTHON_CLI = None,
+    pip_deps: PIP_DEPS_CLI = None,
+    conda_deps: CONDA_DEPS_CLI = None,
+    reqs_ext: REQS_EXT_CLI = None,
+    yaml_ext: YAML_EXT_CLI = None,
+    json_ext: JSON_EXT_CLI = None,
+    header: HEADER_CLI = None,
+    custom_command: CUSTOM_COMMAND_CLI = None,
+    pip_only: PIP_ONLY_CLI = False,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
+    wheelhouse: WHEELHOUSE_CLI = None,
+    hashes: HASHES_CLI = False,
+    allow_empty: Annotated[bool | None, ALLOW_EMPTY_OPTION] = None,
+    output_format: PLAN_FORMAT_CLI = PlanFormat.json,
+    verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Export outputs of ``project`` as a build graph.
+
+    Each output depends on ``pyproject.toml``, any ``.python-version-default``
+    or ``.python-version`` file, any ``mapping-files``, and any ``pin-from``
+    lockfile, ``repodata`` files, and ``wheelhouse`` directory.  Outputs of an environment are regenerated by a
+    single ``pyproject2conda project`` command, so build systems (make, ninja,
+    just, ...) can schedule regeneration themselves.
+    """
+    from ._plan import PlanOutput, PlanTarget, to_json, to_make, to_ninja
+
+    options: dict[str, Any] = {
+        "reqs_ext": reqs_ext,
+        "yaml_ext": yaml_ext,
+        "json_ext": json_ext,
+        "template": template,
+        "template_python": template_python,
+        "pip_deps": pip_deps,
+        "conda_deps": conda_deps,
+        "header": header,
+        "custom_command": custom_command,
+        "allow_empty": allow_empty,
+        "pip_only": pip_only or None,
+        "repodata": repodata,
+        "pin_from": pin_from,
+        "pin_strategy": pin_strategy,
+        "wheelhouse": wheelhouse,
+        "hashes": hashes or None,
+    }
+
+    d, c = _get_configs(pyproject_filename)
+    c = c.update_options(options)
+
+    planned: list[tuple[str, str, Any]] = list(c.iter_named_envs(envs))
+    inputs = [
+        str(path)
+        for path in _input_files(pyproject_filename, d, planned)
+        if path.exists()
+    ]
+
+    outputs: dict[str, list[PlanOutput]] = {}
+    for env_name, style, spec in planned:
+        python = getattr(spec, "python", None)
+        outputs.setdefault(env_name, []).extend(
+            PlanOutput(env_name, style, python, str(path))
+            for path in (spec.output, getattr(spec, "output_pip", None))
+            if path is not None
+        )
+
+    base = [
+        "pyproject2conda",
+        "project",
+        "--pyproject",
+        str(pyproject_filename),
+        *_plan_args(options),
+        "--overwrite",
+        "force",
+    ]
+    targets = [
+        PlanTarget(env_name, tuple(env_outputs), (*base, "--envs", env_name))
+        for env_name, env_outputs in outputs.items()
+    ]
+
+    formatter = {
+        PlanFormat.json: to_json,
+        PlanFormat.make: to_make,
+        PlanFormat.ninja: to_ninja,
+    }[output_format]
+    _echo(formatter(inputs, targets), nl=False)
+
+
+# ** History
+@app.command()
+def history(
+    revs: REVS_CLI,
+    pyproject_filename: PYPROJECT_CLI,
+    envs: ENVS_CLI = None,
+    template: TEMPLATE_CLI = None,
+    template_python: TEMPLATE_PYTHON_CLI = None,
+    pip_deps: PIP_DEPS_CLI = None,
+    conda_deps: CONDA_DEPS_CLI = None,
+    reqs_ext: REQS_EXT_CLI = ".txt",
+    yaml_ext: YAML_EXT_CLI = ".yaml",
+    json_ext: JSON_EXT_CLI = ".json",
+    pip_only: PIP_ONLY_CLI = False,
+    repodata: REPODATA_CLI = None,
+    pin_from: PIN_FROM_CLI = None,
+    pin_strategy: PIN_STRATEGY_CLI = None,
+    allow_empty: Annotated[bool | None, ALLOW_EMPTY_OPTION] = None,
+    output_dir: OUTPUT_DIR_CLI = None,
+    jobs: JOBS_CLI = None,
+    verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Render outputs of ``project`` at many git revisions.
+
+    ``pyproject.toml`` is read at each revision directly from git (the working
+    tree is untouched).  Revisions with identical dependency tables are rendered
+    once.  By default, prints a json record per revision and output (keys
+    ``rev`` plus those of ``project --format json``), or ``rev`` and ``error``
+    if rendering a revision failed.  Outputs have no header.
+    """
+    import json
+
+    from ._history import iter_history
+
+    options = {
+        "reqs_ext": reqs_ext,
+        "yaml_ext": yaml_ext,
+        "json_ext": json_ext,
+        "template": template,
+        "template_python": template_python,
+        "pip_deps": pip_deps,
+        "conda_deps": conda_deps,
+        "allow_empty": allow_empty,
+        "pip_only": pip_only or None,
+        "repodata": repodata,
+        "pin_from": pin_from,
+        "pin_strategy": pin_strategy,
+    }
+
+    writer = OutputWriter()
+    for rev, rendered in iter_history(
+        revs, pyproject_filename, envs=envs, options=options, max_workers=jobs
+    ):
+        if isinstance(rendered, Exception):
+            logger.warning("Failed to render %s: %s", rev, rendered)
+            if output_dir is None:
+                _echo(json.dumps({"rev": rev, "error": str(rendered)}))
+            continue
+
+        if output_dir is None:
+            for r in rendered:
+                _echo(json.dumps({"rev": rev, **r.to_dict()}))
+            continue
+
+        files = [
+            (output_dir / rev[:12] / path, content)
+            for r in rendered
+            for path, content in r.files()
+        ]
+        make_parents(path for path, _ in files)
+        for path, content in files:
+            _ = writer.write(content, path)
+
+
+# ** Shards
+@app.command()
+def merge_manifests(
+    manifests: Annotated[
+        list[Path],
+        typer.Argument(help="Partial manifests (from ``--manifest``) of each shard."),
+    ],
+    output: Annotated[
+        Path | None,
+        typer.Option(
+            "--output", "-o", help="Write merged manifest here.  Default is stdout."
+        ),
+    ] = None,
+    verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Merge partial manifests of ``--shard`` runs.
+
+    Checks that every planned item was processed by exactly one shard, that all
+    shards are present, and that no output was produced with conflicting content.
+    Exits with non-zero status (listing problems on stderr) otherwise.
+    """
+    import json
+
+    from . import _shard
+
+    merged, problems = _shard.merge_manifests(Manifest.read(path) for path in manifests)
+    for problem in problems:
+        typer.echo(problem, err=True)
+
+    if output is None:
+        _echo(json.dumps(merged.to_dict(), indent=2))
+    else:
+        merged.write(output)
+
+    if problems:
+        raise typer.Exit(1)
+
+
+# ** Batch
+def _read_batch(path: Path | None) -> list[list[str]]:
+    """
+    Read sub-invocations.
+
+    ``.json`` files contain a list, and ``.toml`` files a ``commands`` list, of
+    either strings or lists of arguments.  Anything else (including stdin) has
+    one command per line, with blank lines and ``#`` comments ignored.
+    """
+    import shlex
+    import sys
+
+    if path is None or str(path) == "-":
+        text, suffix = sys.stdin.read(), ""
+    else:
+        text, suffix = path.read_text(encoding="utf-8"), path.suffix
+
+    items: list[str | list[str]]
+    if suffix == ".json":
+        import json
+
+        items = json.loads(text)
+    elif suffix == ".toml":
+        items = tomllib.loads(text).get("commands", [])
+    else:
+        items = [
+            line
+            for line in map(str.strip, text.splitlines())
+            if line and not line.startswith("#")
+        ]
+
+    out: list[list[str]] = []
+    for item in items:
+        args = shlex.split(item) if isinstance(item, str) else [str(x) for x in item]
+        if args and args[0] in {"p2c", "pyproject2conda"}:
+            args = args[1:]
+        out.append(args)
+    return out
+
+
+def _batch_params(
+    group: Any, ctx: Any, args: list[str]
+) -> tuple[str, dict[str, Any]] | None:
+    """Command name and parsed parameters of ``args``, or ``None`` if invalid."""
+    if not args or (cmd := group.get_command(ctx, args[0])) is None:
+        return None
+
+    try:
+        params = cmd.make_context(
+            cmd.name, args[1:], parent=ctx, resilient_parsing=True
+        ).params
+    except Exception:  # ruff:ignore[blind-except]  # pylint: disable=broad-exception-caught
+        # errors are reported when the command is run.
+        return None
+    return cmd.name, params
+
+
+def _batch_cost(group: Any, ctx: Any, args: list[str]) -> float:
+    """Estimated cost of command ``args``: its number of outputs."""
+    if (parsed := _batch_params(group, ctx, args)) is None or parsed[0] != "project":
+        return 1.0
+    params = parsed[1]
+    try:
+        _, c = _get_configs(Path(params["pyproject_filename"]))
+        return float(max(1, sum(1 for _ in c.iter_named_envs(params.get("envs")))))
+    except Exception:  # ruff:ignore[blind-except]  # pylint: disable=broad-exception-caught
+        return 1.0
+
+
+def _batch_output_key(group: Any, ctx: Any, args: list[str]) -> str | None:
+    """
+    Key identifying files written by command ``args``.
+
+    Commands with equal keys must not run concurrently.  ``None`` means the
+    command only writes to stdout.
+    """
+    if (parsed := _batch_params(group, ctx, args)) is None:
+        return None
+    name, params = parsed
+
+    if name == "project":
+        # outputs depend on config.  Serialize all project runs on same file.
+        if params.get("dry") or params.get("output_format") == ProjectFormat.ndjson:
+            return None
+        return f"project:{Path(params['pyproject_filename']).absolute()}"
+
+    outputs = sorted(
+        str(Path(params[k]).absolute())
+        for k in ("output", "path_conda", "path_pip", "prefix")
+        if params.get(k)
+    )
+    return "|".join(outputs) or None
+
+
+def _batch_lanes(
+    group: Any,
+    ctx: Any,
+    commands: list[list[str]],
+    ids: list[str],
+    *,
+    jobs: int,
+    shard: Shard | None,
+) -> list[list[int]]:
+    """
+    Indices of commands to run, grouped into lanes.
+
+    Commands sharing an output key run in order in the same lane.  With
+    ``shard``, only lanes in that shard are returned.
+    """
+    lanes: dict[str | int, list[int]] = {}
+    for index, args in enumerate(commands):
+        key = (
+            _batch_output_key(group, ctx, args)
+            if jobs > 1 or shard is not None
+            else None
+        )
+        lanes.setdefault(index if key is None else key, []).append(index)
+
+    if shard is None:
+        return list(lanes.values())
+
+    selected = set(
+        shard.select({
+            ids[lane[0]]: sum(_batch_cost(group, ctx, commands[i]) for i in lane)
+            for lane in lanes.values()
+        })
+    )
+    return [lane for lane in lanes.values() if ids[lane[0]] in selected]
+
+
+def _run_batch_command(group: Any, args: list[str]) -> tuple[int, str, str | None]:
+    """Run single command capturing stdout.  Returns (exit_code, stdout, error)."""
+    import io
+
+    buffer = io.StringIO()
+    _LOCAL.stdout, _LOCAL.argv = buffer, ["pyproject2conda", *args]
+    code, error = 0, None
+    try:
+        if args and args[0] == "batch":
+            code, error = 2, "Cannot nest batch commands"
+        else:
+            rv = group.main(
+                args=args, prog_name="pyproject2conda", standalone_mode=False
+            )
+            code = rv if isinstance(rv, int) else 0
+    except typer.exceptions.TyperException as e:
+        # click usage errors, etc.
+        code = getattr(e, "exit_code", 1)
+        error = getattr(e, "format_message", e.__str__)()
+    except Exception as e:  # ruff:ignore[blind-except]  # pylint: disable=broad-exception-caught
+        code, error = 1, f"{type(e).__name__}: {e}"
+    finally:
+        del _LOCAL.stdout, _LOCAL.argv
+
+    return code, buffer.getvalue(), error
+
+
+# @app.command("b", hidden=True)
+@app.command()
+def batch(
+    commands_file: Annotated[
+        Path | None,
+        typer.Argument(
+            help="""
+            File with commands to run.  Use ``.json`` (list of commands) or
+            ``.toml`` (``commands = [...]``) files, where each command is a
+            string or list of arguments. Otherwise, one command per line.
+            Reads from stdin if not passed or ``-``.
+            """,
+            show_default=False,
+        ),
+    ] = None,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "--jobs",
+            "-j",
+            min=1,
+            help="Number of commands to run in parallel.",
+        ),
+    ] = 1,
+    shard: SHARD_CLI = None,
+    manifest: MANIFEST_CLI = None,
+    verbose: VERBOSE_CLI = None,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Run many commands in a single process.
+
+    Each command is a normal invocation without the leading ``pyproject2conda``
+    (for example, ``yaml -g dev -o environment.yaml``).  Parsed
+    ``pyproject.toml`` files and resolved dependencies are shared between
+    commands. With ``--jobs`` greater than one, commands run in parallel, except
+    that commands writing the same output (and ``project`` commands using the same
+    ``pyproject.toml``) run in order. Standard output of each command is printed in
+    input order, followed by the exit status of each command on stderr.  Exits with
+    non-zero status if any command fails.
+
+    With ``--shard``, whole lanes (commands that must run in order, e.g., all
+    ``project`` commands for one ``pyproject.toml``) are partitioned between
+    shards, weighted by the number of outputs of each command.
+    """
+    import shlex
+    from concurrent.futures import ThreadPoolExecutor
+
+    group = typer.main.get_command(app)
+    ctx = group.make_context("pyproject2conda", [], resilient_parsing=True)
+
+    commands = _read_batch(commands_file)
+
+    ids = [f"{index}: {shlex.join(args)}" for index, args in enumerate(commands)]
+    lanes = _batch_lanes(group, ctx, commands, ids, jobs=jobs, shard=shard)
+
+    results: dict[int, tuple[int, str, str | None]] = {}
+
+    def run_lane(indices: list[int]) -> None:
+        for index in indices:
+            results[index] = _run_batch_command(group, commands[index])
+
+    if jobs == 1:
+        run_lane(sorted(i for lane in lanes for i in lane))
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for future in [pool.submit(run_lane, lane) for lane in lanes]:
+                future.result()
+
+    failed = 0
+    for index in sorted(results):
+        code, stdout, error = results[index]
+        if stdout:
+            _echo(stdout, nl=False)
+        failed += code != 0
+        typer.echo(
+            f"[exit {code}] pyproject2conda {shlex.join(commands[index])}", err=True
+        )
+        if error:
+            typer.echo(f"    {error}", err=True)
+
+    if manifest is not None:
+        Manifest(
+            kind="batch",
+            planned=ids,
+            items={
+                ids[index]: {"exit": results[index][0]} for index in sorted(results)
+            },
+            shards=[str(shard or Shard(1, 1))],
+        ).write(manifest)
+
+    if failed:
+        logger.error("%s of %s commands failed", failed, len(results))
+        raise typer.Exit(1)
@@ -12,6 +12,7 @@ from typing import TYPE_CHECKING
 
 from packaging.utils import NormalizedName, canonicalize_name
 
+from ._instrument import count, phase, timed
 from ._normalized_requirements import (
     CondaRequirement,
     NormalizedRequirement,
@@ -23,13 +24,16 @@ from ._resolve_dependencies import (
     ResolveOptionalDependencies,
 )
 from ._schema import PyProjectRequirementsWith2CondaSchema
-from ._utils import list_to_str, validate_iterable_str
+from ._utils import is_name_pattern, list_to_str, validate_iterable_str
+from ._writer import atomic_write
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Sequence
+    from collections.abc import Callable, Iterable, Mapping, Sequence
 
+    from ._lockfile import Lockfile
     from ._schema import DependencyMapping
     from ._typing_compat import Self
+    from ._wheelhouse import Wheelhouse
 
 
 # * Pyproject schema
@@ -54,6 +58,53 @@ def _conda_reqs_to_list(conda_reqs: set[CondaRequirement]) -> list[str]:
     ]
 
 
+def _override_packages(
+    override: DependencyMapping, locked: NormalizedRequirement | None = None
+) -> list[CondaRequirement]:
+    """
+    Conda packages of ``override``.
+
+    If ``override`` skips ``locked`` (a dependency pinned from a lockfile) in
+    favor of a single unversioned package, that package is pinned to the same
+    version.
+    """
+    packages = [CondaRequirement(p) for p in override.packages]
+    if (
+        locked is not None
+        and override.skip
+        and len(packages) == 1
+        and not packages[0].specifier
+    ):
+        _ = packages[0].update(specifier=locked.specifier, inplace=True)
+    return packages
+
+
+def _pin_pip_requirements(
+    pip_reqs: set[NormalizedRequirement],
+    *,
+    lockfile: Lockfile | None = None,
+    wheelhouse: Wheelhouse | None = None,
+    hashes: bool = False,
+) -> tuple[list[str], list[str]]:
+    """
+    Pinned requirements and requirements file lines.
+
+    Requirements are pinned to versions in ``lockfile`` (for the running
+    python), then to distributions in ``wheelhouse`` (with their ``--hash``
+    options if ``hashes``).
+    """
+    if hashes and wheelhouse is None:
+        msg = "hashes requires a wheelhouse"
+        raise ValueError(msg)
+    if lockfile is not None:
+        pip_reqs = set(lockfile.pin(pip_reqs))
+    if wheelhouse is None:
+        lines = _pip_reqs_to_list(pip_reqs)
+        return lines, lines
+    pinned = wheelhouse.pin(pip_reqs)
+    return [str(req) for req, _ in pinned], wheelhouse.lines(pinned, hashes=hashes)
+
+
 def conda_and_pip_reqs_to_list(
     conda_reqs: set[CondaRequirement], pip_reqs: set[NormalizedRequirement]
 ) -> tuple[list[str], list[str]]:
@@ -69,14 +120,26 @@ class RequirementsConfig:
     dependencies: list[NormalizedRequirement]
     optional_dependencies: ResolveOptionalDependencies
     dependency_groups: ResolveDependencyGroups
-    dependency_map: dict[NormalizedName, DependencyMapping] = field(
+    dependency_map: Mapping[NormalizedName, DependencyMapping] = field(
         default_factory=dict
     )
     requires_python: str | None = None
+    _marker_cache: dict[tuple[str, str], bool] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     @classmethod
-    def from_schema(cls, schema: PyProjectRequirementsWith2CondaSchema) -> Self:
-        """Build object from schema"""
+    def from_schema(
+        cls,
+        schema: PyProjectRequirementsWith2CondaSchema,
+        root: str | Path | None = None,
+    ) -> Self:
+        """
+        Build object from schema
+
+        ``mapping-files`` are relative to ``root`` (defaults to the current
+        directory).
+        """
         build_system = (
             {canonicalize_name("build-system.requires"): schema.build_system.requires}
             if schema.build_system.requires
@@ -100,7 +163,23 @@ class RequirementsConfig:
             optional_dependencies=optional_dependencies,
         )
 
-        dependency_map = schema.tool.pyproject2conda.dependencies
+        table: dict[NormalizedName, DependencyMapping] = {}
+        patterns: list[tuple[str, DependencyMapping]] = []
+        for name, mapping in schema.tool.pyproject2conda.dependencies.items():
+            if is_name_pattern(name):
+                patterns.append((name, mapping))
+            else:
+                table[name] = mapping
+
+        dependency_map: Mapping[NormalizedName, DependencyMapping] = table
+        mapping_files = schema.tool.pyproject2conda.mapping_files
+        if mapping_files or patterns:
+            from ._mapping import DependencyMap
+
+            root = Path(root or ".")
+            dependency_map = DependencyMap(
+                table, [root / path for path in mapping_files], patterns
+            )
 
         return cls(
             package_name=schema.project.name,
@@ -109,7 +188,7 @@ class RequirementsConfig:
             ],
             optional_dependencies=optional_dependencies,
             dependency_groups=dependency_groups,
-            dependency_map=dependency_map or {},
+            dependency_map=dependency_map,
             requires_python=schema.project.requires_python,
         )
 
@@ -117,6 +196,7 @@ class RequirementsConfig:
     def from_string(
         cls,
         s: str,
+        root: str | Path | None = None,
     ) -> Self:
         """Create from toml string."""
         from ._compat import tomllib
@@ -124,7 +204,7 @@ class RequirementsConfig:
         data = tomllib.loads(s)
 
         pyproject = PyProjectRequirementsWith2CondaSchema.model_validate(data)
-        return cls.from_schema(pyproject)
+        return cls.from_schema(pyproject, root=root)
 
     @classmethod
     def from_path(
@@ -132,7 +212,8 @@ class RequirementsConfig:
         p: str | Path,
     ) -> Self:
         """Create from toml path."""
-        return cls.from_string(Path(p).read_text(encoding="utf-8"))
+        p = Path(p)
+        return cls.from_string(p.read_text(encoding="utf-8"), root=p.parent)
 
     def _resolve_extras_and_groups(
         self,
@@ -157,6 +238,23 @@ class RequirementsConfig:
 
         return extras_out, groups_out
 
+    def _evaluate(self, req: CondaRequirement, python_version: str | None) -> bool:
+        """Cached evaluation of ``req.marker`` against ``python_version``."""
+        if req.marker is None or not python_version:
+            return True
+
+        key = (str(req.marker), python_version)
+        if (out := self._marker_cache.get(key)) is None:
+            count("marker_evaluations")
+            with phase("markers"):
+                out = self._marker_cache[key] = req.evaluate({
+                    "python_version": python_version
+                })
+        else:
+            count("marker_cache_hits")
+        return out
+
+    @timed("resolve")
     def pip_requirements(
         self,
         *,
@@ -183,7 +281,8 @@ class RequirementsConfig:
 
         return out
 
-    def conda_and_pip_requirements(  # ruff:ignore[complex-structure]
+    @timed("resolve")
+    def conda_and_pip_requirements(  # ruff:ignore[complex-structure,too-many-branches]
         self,
         *,
         extras: Iterable[str] = (),
@@ -195,8 +294,27 @@ class RequirementsConfig:
         conda_deps: Iterable[str] = (),
         python_version: str | None = None,
         python_include: str | None = None,
+        available: Callable[[NormalizedRequirement], bool] | None = None,
+        lockfile: Lockfile | None = None,
+        pin_conda: Callable[[set[CondaRequirement], str | None], set[CondaRequirement]]
+        | None = None,
     ) -> tuple[set[CondaRequirement], set[NormalizedRequirement]]:
-        """To conda and pip requirements."""
+        """
+        To conda and pip requirements.
+
+        Dependencies without an entry in ``dependency_map`` go to conda, unless
+        ``available`` (e.g., :meth:`~pyproject2conda._repodata.RepodataIndex.available`)
+        reports no conda package satisfying them, in which case they go to pip.
+        If ``lockfile`` is passed, ``pyproject.toml`` dependencies and
+        ``pip_deps`` are pinned (by PyPI name, before applying
+        ``dependency_map``) to versions locked for ``python_version``.
+        ``conda_deps`` and packages added by ``dependency_map`` are conda names,
+        and are not looked up in the lockfile, except that a skipped dependency
+        replaced by a single unversioned package (a rename, e.g., ``torch`` to
+        ``pytorch``) takes the dependency's locked version.  ``pin_conda`` (e.g., a partial of
+        :meth:`~pyproject2conda._repodata.RepodataIndex.pin`) maps conda
+        requirements and ``python_version`` to pinned conda requirements.
+        """
         if python_include == "infer":
             if self.requires_python is None:
                 msg = "No value for `requires-python` in pyproject.toml file"
@@ -208,20 +326,32 @@ class RequirementsConfig:
         pip_reqs = {
             canonicalize_pip_requirement(req) for req in validate_iterable_str(pip_deps)
         }
-        env = {"python_version": python_version} if python_version else {}
         conda_reqs = {
             dep.update(marker=None, extras=None)
             for dep in (CondaRequirement(c) for c in validate_iterable_str(conda_deps))
-            if dep.evaluate(env)
+            if self._evaluate(dep, python_version)
         }
 
+        deps = list(
+            self.pip_requirements(
+                extras=extras,
+                groups=groups,
+                extras_or_groups=extras_or_groups,
+                skip_package=skip_package,
+            )
+        )
+        locked: set[str] = set()
+        if lockfile is not None:
+            pinned = lockfile.pin([*deps, *pip_reqs], python_version)
+            locked = {
+                new.name
+                for old, new in zip(deps, pinned, strict=False)
+                if new is not old
+            }
+            deps, pip_reqs = pinned[: len(deps)], set(pinned[len(deps) :])
+
         override_table = self.dependency_map
-        for dep in self.pip_requirements(
-            extras=extras,
-            groups=groups,
-            extras_or_groups=extras_or_groups,
-            skip_package=skip_package,
-        ):
+        for dep in deps:
             name = dep.name
             if pip_only and name != "python":
                 pip_reqs.add(dep)
@@ -229,21 +359,28 @@ class RequirementsConfig:
             elif (override := override_table.get(name)) is not None:
                 if override.pip:
                     pip_reqs.add(dep)
-                elif not override.skip and (
-                    cdep := CondaRequirement(str(dep))
-                ).evaluate(env):
+                elif not override.skip and self._evaluate(
+                    cdep := CondaRequirement(str(dep)), python_version
+                ):
                     conda_reqs.add(
                         cdep.update(marker=None, extras=None, channel=override.channel)
                     )
 
                 conda_reqs.update(
                     cdep.update(marker=None, extras=None)
-                    for cdep in (CondaRequirement(p) for p in override.packages)
-                    if cdep.evaluate(env)
+                    for cdep in _override_packages(
+                        override, dep if name in locked else None
+                    )
+                    if self._evaluate(cdep, python_version)
                 )
-            elif (cdep := CondaRequirement(str(dep))).evaluate(env):
+            elif available is not None and name != "python" and not available(dep):
+                pip_reqs.add(dep)
+            elif self._evaluate(cdep := CondaRequirement(str(dep)), python_version):
                 conda_reqs.add(cdep.update(marker=None, extras=None))
 
+        if pin_conda is not None:
+            conda_reqs = pin_conda(conda_reqs, python_version)
+
         if pip_reqs and not any(dep.name == "pip" for dep in conda_reqs):
             conda_reqs.add(CondaRequirement("pip"))
 
@@ -252,7 +389,7 @@ class RequirementsConfig:
 
         return conda_reqs, pip_reqs
 
-    def to_conda_yaml(
+    def to_conda_yaml(  # ruff:ignore[too-many-arguments]
         self,
         *,
         extras: Iterable[str] | None = None,
@@ -269,6 +406,10 @@ class RequirementsConfig:
         header_cmd: str | None = None,
         output: str | Path | None = None,
         allow_empty: bool = False,
+        available: Callable[[NormalizedRequirement], bool] | None = None,
+        lockfile: Lockfile | None = None,
+        pin_conda: Callable[[set[CondaRequirement], str | None], set[CondaRequirement]]
+        | None = None,
     ) -> str:
         """Create yaml string."""
         conda_reqs, pip_reqs = self.conda_and_pip_requirements(
@@ -281,20 +422,21 @@ class RequirementsConfig:
             conda_deps=conda_deps or (),
             python_include=python_include,
             python_version=python_version,
+            available=available,
+            lockfile=lockfile,
+            pin_conda=pin_conda,
         )
 
         if not conda_reqs and not pip_reqs:
             return _check_allow_empty(allow_empty)
 
-        out = _conda_yaml(
+        out = _render_yaml(
+            *conda_and_pip_reqs_to_list(conda_reqs, pip_reqs),
             name=name,
             channels=channels,
-            conda_deps=_conda_reqs_to_list(conda_reqs),
-            pip_deps=_pip_reqs_to_list(pip_reqs),
+            header_cmd=header_cmd,
         )
 
-        out = _add_header(out, header_cmd)
-
         _optional_write(out, output)
 
         return out
@@ -310,8 +452,18 @@ class RequirementsConfig:
         output: str | Path | None = None,
         pip_deps: Iterable[str] | None = None,
         allow_empty: bool = False,
+        lockfile: Lockfile | None = None,
+        wheelhouse: Wheelhouse | None = None,
+        hashes: bool = False,
     ) -> str:
-        """Create requirements string."""
+        """
+        Create requirements string.
+
+        If ``lockfile`` is passed, requirements are pinned to versions locked for
+        the running python.  If ``wheelhouse`` is passed, requirements are
+        pinned to distributions in it (with their ``--hash`` options if
+        ``hashes``).
+        """
         pip_reqs = self.pip_requirements(
             extras=extras or (),
             groups=groups or (),
@@ -320,15 +472,18 @@ class RequirementsConfig:
             reqs=pip_deps or (),
         )
 
-        if not pip_reqs:
+        _, lines = _pin_pip_requirements(
+            pip_reqs, lockfile=lockfile, wheelhouse=wheelhouse, hashes=hashes
+        )
+        if not lines:
             return _check_allow_empty(allow_empty)
 
-        out = _add_header(list_to_str(_pip_reqs_to_list(pip_reqs)), header_cmd)
+        out = _render_requirements(lines, header_cmd=header_cmd)
 
         _optional_write(out, output)
         return out
 
-    def to_conda_requirements(
+    def to_conda_requirements(  # ruff:ignore[too-many-arguments]
         self,
         *,
         extras: Iterable[str] | None = None,
@@ -344,6 +499,10 @@ class RequirementsConfig:
         header_cmd: str | None = None,
         conda_deps: str | Iterable[str] | None = None,
         pip_deps: str | Iterable[str] | None = None,
+        available: Callable[[NormalizedRequirement], bool] | None = None,
+        lockfile: Lockfile | None = None,
+        pin_conda: Callable[[set[CondaRequirement], str | None], set[CondaRequirement]]
+        | None = None,
     ) -> tuple[str, str]:
         """Create conda and pip requirements files."""
         conda_deps, pip_deps = conda_and_pip_reqs_to_list(
@@ -356,6 +515,9 @@ class RequirementsConfig:
                 conda_deps=conda_deps or (),
                 python_include=python_include,
                 python_version=python_version,
+                available=available,
+                lockfile=lockfile,
+                pin_conda=pin_conda,
             )
         )
 
@@ -418,6 +580,26 @@ def _conda_yaml(
     return s
 
 
+def _render_yaml(
+    conda_deps: list[str],
+    pip_deps: list[str],
+    *,
+    name: str | None = None,
+    channels: Iterable[str] | None = None,
+    header_cmd: str | None = None,
+) -> str:
+    return _add_header(
+        _conda_yaml(
+            name=name, channels=channels, conda_deps=conda_deps, pip_deps=pip_deps
+        ),
+        header_cmd,
+    )
+
+
+def _render_requirements(pip_deps: list[str], *, header_cmd: str | None = None) -> str:
+    return _add_header(list_to_str(pip_deps), header_cmd)
+
+
 def _create_header(cmd: str | None = None) -> str:
     from textwrap import dedent
 
@@ -461,12 +643,8 @@ def _add_header(string: str, header_cmd: str | None) -> str:
 def _optional_write(
     string: str,
     output: str | Path | None,
-    mode: str = "w",  # force: bool = False,
 ) -> None:
     if output is None:
         return
 
-    path = Path(output)
-
-    with path.open(mode) as f:
-        _ = f.write(string)
+    atomic_write(string, output)
@@ -0,0 +1,803 @@
+"""
+Session API (:mod:`~pyproject2conda.session`)
+=============================================
+
+Parse a ``pyproject.toml`` file once and render any number of outputs from it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass, field, replace
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+from packaging.utils import canonicalize_name
+
+from ._compat import tomllib
+from ._config import PyProject2CondaConfig
+from ._instrument import count, phase, scope, timed
+from ._schema import Dedupe, EnvYaml, PyProjectRequirementsWith2CondaSchema
+from ._utils import directory_signature, list_to_str, update_target
+from ._writer import OutputWriter, make_parents
+from .requirements import (
+    RequirementsConfig,
+    _add_header,  # pyright: ignore[reportPrivateUsage]
+    _check_allow_empty,  # pyright: ignore[reportPrivateUsage]
+    _pin_pip_requirements,  # pyright: ignore[reportPrivateUsage]
+    _render_requirements,  # pyright: ignore[reportPrivateUsage]
+    _render_yaml,  # pyright: ignore[reportPrivateUsage]
+    conda_and_pip_reqs_to_list,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from typing import Any
+
+    from ._lockfile import Lockfile
+    from ._normalized_requirements import CondaRequirement
+    from ._schema import EnvRequirements
+    from ._typing_compat import TypeAlias
+    from ._wheelhouse import Wheelhouse
+
+    #: Cache of resolved ``(conda_deps, pip_deps)`` keyed by resolution options.
+    ResolvedCache: TypeAlias = dict[
+        tuple[Any, ...], tuple[tuple[str, ...], tuple[str, ...]]
+    ]
+
+
+# * Results --------------------------------------------------------------------
+@dataclass(frozen=True)
+class RenderedOutput:
+    """Single rendered environment output."""
+
+    env: str
+    style: str
+    python: str | None
+    output: Path | None
+    name: str | None = None
+    channels: tuple[str, ...] = ()
+    conda_deps: tuple[str, ...] = ()
+    pip_deps: tuple[str, ...] = ()
+    #: Rendered file contents.  ``None`` if the environment is empty (and ``allow_empty``).
+    content: str | None = None
+    #: Second (pip) output of ``conda-requirements`` style.
+    output_pip: Path | None = None
+    content_pip: str | None = None
+
+    def files(self) -> list[tuple[Path, str]]:
+        """List of ``(path, content)`` to write."""
+        return [
+            (path, content)
+            for path, content in (
+                (self.output, self.content),
+                (self.output_pip, self.content_pip),
+            )
+            if path is not None and content
+        ]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "env": self.env,
+            "style": self.style,
+            "python": self.python,
+            "output": None if self.output is None else str(self.output),
+            "output_pip": None if self.output_pip is None else str(self.output_pip),
+            "name": self.name,
+            "channels": list(self.channels),
+            "dependencies": list(self.conda_deps),
+            "pip": list(self.pip_deps),
+        }
+
+
+@dataclass(frozen=True)
+class WriteResult:
+    """Result of writing (or skipping) a single output."""
+
+    env: str
+    style: str
+    python: str | None
+    output: Path | None
+    #: ``"linked"`` if all files of the output were linked to identical outputs.
+    status: Literal["written", "linked", "skipped", "empty"]
+    rendered: RenderedOutput | None = None
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """Result of comparing a single rendered file to the file on disk."""
+
+    env: str
+    style: str
+    python: str | None
+    path: Path
+    status: Literal["ok", "stale", "missing"]
+    #: Expected contents (without header).
+    expected: str
+    #: Contents on disk (without header).  ``None`` if missing.
+    actual: str | None = None
+
+    def diff(self) -> str:
+        """
+        Unified diff from file on disk to expected contents.
+
+        Lines without a trailing newline are marked as by ``git diff``, so diffs
+        of several files concatenate.
+        """
+        import difflib
+
+        return "".join(
+            line if line.endswith("\n") else f"{line}\n\\ No newline at end of file\n"
+            for line in difflib.unified_diff(
+                (self.actual or "").splitlines(keepends=True),
+                self.expected.splitlines(keepends=True),
+                fromfile="/dev/null" if self.actual is None else f"a/{self.path}",
+                tofile=f"b/{self.path}",
+            )
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Json friendly representation."""
+        return {
+            "env": self.env,
+            "style": self.style,
+            "python": self.python,
+            "path": str(self.path),
+            "status": self.status,
+        }
+
+
+def strip_header(text: str) -> str:
+    """Remove leading comment block (the autogenerated header)."""
+    lines = text.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if not line.startswith("#"):
+            return "".join(lines[index:])
+    return ""
+
+
+def _check_file(rendered: RenderedOutput, path: Path, content: str) -> CheckResult:
+    expected = strip_header(content)
+    try:
+        actual: str | None = strip_header(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        actual = None
+
+    status: Literal["ok", "stale", "missing"]
+    status = "missing" if actual is None else "ok" if actual == expected else "stale"
+    return CheckResult(
+        rendered.env,
+        rendered.style,
+        rendered.python,
+        path,
+        status,
+        expected=expected,
+        actual=actual,
+    )
+
+
+# * Rendering ------------------------------------------------------------------
+def _header_cmd(spec: EnvRequirements | EnvYaml, header_cmd: str | None) -> str | None:
+    if spec.custom_command is not None:
+        return spec.custom_command
+
+    header = spec.output is not None if spec.header is None else spec.header
+    return header_cmd if header else None
+
+
+def _spec_python(spec: EnvRequirements | EnvYaml) -> str | None:
+    python = getattr(spec, "python", None)
+    return python if isinstance(python, str) else None
+
+
+def _spec_lockfile(spec: EnvRequirements | EnvYaml) -> Lockfile | None:
+    if not spec.pin_from:
+        return None
+    from ._lockfile import load_lockfile
+
+    return load_lockfile(spec.pin_from)
+
+
+def _spec_wheelhouse(
+    spec: EnvRequirements | EnvYaml, wheelhouse: Wheelhouse | None
+) -> Wheelhouse | None:
+    if not spec.wheelhouse:
+        return None
+    if wheelhouse is None:
+        from ._wheelhouse import load_wheelhouse
+
+        wheelhouse = load_wheelhouse(spec.wheelhouse)
+    return wheelhouse
+
+
+def _resolve_conda_and_pip(
+    requirements: RequirementsConfig,
+    config: PyProject2CondaConfig,
+    spec: EnvYaml,
+    resolved: ResolvedCache | None,
+) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    python_include, python_version = config.parse_pythons(
+        python_include=spec.python_include,
+        python_version=spec.python_version,
+        python=_spec_python(spec),
+    )
+    key = (
+        tuple(spec.extras),
+        tuple(spec.groups),
+        tuple(spec.extras_or_groups),
+        spec.skip_package,
+        tuple(spec.pip_deps),
+        spec.pip_only,
+        tuple(spec.conda_deps),
+        python_include,
+        python_version,
+        tuple(spec.repodata),
+        spec.pin_from,
+        spec.pin_strategy,
+    )
+    if resolved is not None and (out := resolved.get(key)) is not None:
+        return out
+
+    available = None
+    pin_conda: (
+        Callable[[set[CondaRequirement], str | None], set[CondaRequirement]] | None
+    ) = None
+    if spec.repodata:
+        from ._repodata import load_index
+
+        index = load_index(spec.repodata)
+        available = index.available
+        if spec.pin_strategy is not None:
+            pin_conda = partial(index.pin, strategy=spec.pin_strategy.value)
+
+    conda_deps, pip_deps = conda_and_pip_reqs_to_list(
+        *requirements.conda_and_pip_requirements(
+            extras=spec.extras,
+            groups=spec.groups,
+            extras_or_groups=spec.extras_or_groups,
+            skip_package=spec.skip_package,
+            pip_deps=spec.pip_deps,
+            pip_only=spec.pip_only,
+            conda_deps=spec.conda_deps,
+            python_include=python_include,
+            python_version=python_version,
+            available=available,
+            lockfile=_spec_lockfile(spec),
+            pin_conda=pin_conda,
+        )
+    )
+    out = (tuple(conda_deps), tuple(pip_deps))
+    if resolved is not None:
+        resolved[key] = out
+    return out
+
+
+def _json_content(
+    conda_deps: Sequence[str], pip_deps: Sequence[str], channels: Sequence[str]
+) -> str:
+    import json
+
+    result: dict[str, list[str]] = {
+        "dependencies": list(conda_deps),
+        "pip": list(pip_deps),
+    }
+    if channels:
+        result["channels"] = list(channels)
+    return json.dumps(result)
+
+
+@timed("render")
+def render_spec(
+    requirements: RequirementsConfig,
+    config: PyProject2CondaConfig,
+    env: str,
+    style: str,
+    spec: EnvRequirements | EnvYaml,
+    header_cmd: str | None = "",
+    resolved: ResolvedCache | None = None,
+    wheelhouse: Wheelhouse | None = None,
+) -> RenderedOutput:
+    """
+    Render single output from environment options.
+
+    Parameters
+    ----------
+    requirements, config :
+        Parsed ``pyproject.toml`` configurations.
+    env : str
+        Environment name.
+    style : {"yaml", "requirements", "conda-requirements", "json"}
+        Output style.
+    spec : EnvRequirements or EnvYaml
+        Environment options (e.g., from :meth:`PyProject2CondaConfig.iter_envs`).
+    header_cmd : str, optional
+        Command to place in header (if header enabled). The default (``""``)
+        leads to a generic header.
+    resolved : dict, optional
+        Cache of resolved dependencies.  Pass the same dictionary when rendering
+        several styles of the same environment so dependencies are resolved
+        once and serialized to each format.
+    wheelhouse : Wheelhouse, optional
+        Loaded ``spec.wheelhouse``.  Loaded (and scanned) here if not passed.
+    """
+    count("outputs_rendered")
+    header_cmd = _header_cmd(spec, header_cmd)
+    output_pip: Path | None = None
+    content_pip: str | None = None
+    name: str | None = None
+    channels: tuple[str, ...] = ()
+
+    if style == "requirements":
+        conda_deps: tuple[str, ...] = ()
+        pip_reqs = requirements.pip_requirements(
+            extras=spec.extras,
+            groups=spec.groups,
+            extras_or_groups=spec.extras_or_groups,
+            skip_package=spec.skip_package,
+            reqs=spec.pip_deps,
+        )
+        pinned, lines = _pin_pip_requirements(
+            pip_reqs,
+            lockfile=_spec_lockfile(spec),
+            wheelhouse=_spec_wheelhouse(spec, wheelhouse),
+            hashes=spec.hashes,
+        )
+        pip_deps = tuple(pinned)
+        content = (
+            _render_requirements(lines, header_cmd=header_cmd) if pip_deps else None
+        )
+
+    elif style in {"yaml", "json", "conda-requirements"}:
+        if not isinstance(spec, EnvYaml):  # pragma: no cover
+            msg = f"{style} style requires yaml options, not {type(spec)}"
+            raise TypeError(msg)
+
+        conda_deps, pip_deps = _resolve_conda_and_pip(
+            requirements, config, spec, resolved
+        )
+        channels = tuple(spec.channels)
+        content = None
+        if not conda_deps and not pip_deps:
+            pass
+        elif style == "yaml":
+            name = spec.name
+            content = _render_yaml(
+                list(conda_deps),
+                list(pip_deps),
+                name=name,
+                channels=channels,
+                header_cmd=header_cmd,
+            )
+        elif style == "json":
+            content = _json_content(conda_deps, pip_deps, channels)
+        else:
+            output_pip = getattr(spec, "output_pip", None)
+            content = _add_header(list_to_str(conda_deps), header_cmd)
+            content_pip = _add_header(list_to_str(pip_deps), header_cmd)
+
+    else:
+        msg = f"unknown style {style}"
+        raise ValueError(msg)
+
+    if content is None:
+        # raises if empty environments not allowed
+        _ = _check_allow_empty(spec.allow_empty)
+
+    return RenderedOutput(
+        env=env,
+        style=style,
+        python=_spec_python(spec),
+        output=spec.output,
+        name=name,
+        channels=channels,
+        conda_deps=conda_deps,
+        pip_deps=pip_deps,
+        content=content,
+        output_pip=output_pip,
+        content_pip=content_pip,
+    )
+
+
+# * Loading --------------------------------------------------------------------
+def load_configs(
+    path: str | Path, default_pythons: Sequence[str] | None = None
+) -> tuple[RequirementsConfig, PyProject2CondaConfig]:
+    """
+    Parse and validate ``pyproject.toml`` file ``path``.
+
+    Used by :class:`Session` and (cached) by the command line interface.
+
+    Parameters
+    ----------
+    path : str or Path
+        ``pyproject.toml`` file.  Relative mapping files are resolved against
+        its directory.
+    default_pythons : sequence of str, optional
+        Default python versions.  If ``None``, read from
+        ``.python-version-default`` or ``.python-version`` files.
+
+    Returns
+    -------
+    requirements : RequirementsConfig
+    config : PyProject2CondaConfig
+    """
+    path = Path(path)
+    with phase("parse"):
+        data = tomllib.loads(path.read_text(encoding="utf-8"))
+    with phase("validate"):
+        schema = PyProjectRequirementsWith2CondaSchema.model_validate(data)
+        requirements = RequirementsConfig.from_schema(schema, root=path.parent)
+        config = PyProject2CondaConfig.from_schema(
+            schema.tool.pyproject2conda,
+            default_pythons=default_pythons,
+            all_pythons=schema.all_python_versions,
+        )
+    return requirements, config
+
+
+def mapping_paths(requirements: RequirementsConfig) -> list[Path]:
+    """Paths of mapping files used by ``requirements``."""
+    return list(getattr(requirements.dependency_map, "paths", ()))
+
+
+def source_paths(specs: Iterable[EnvRequirements | EnvYaml]) -> list[Path]:
+    """
+    Lockfiles, repodata files, and wheelhouse directories used by ``specs``.
+
+    Repodata directories are expanded to their files (see
+    :func:`~pyproject2conda._repodata.expand_sources`).
+    """
+    paths: dict[Path, None] = {}
+    for spec in specs:
+        if spec.pin_from:
+            paths[Path(spec.pin_from)] = None
+        if repodata := getattr(spec, "repodata", None):
+            from ._repodata import expand_sources
+
+            paths.update(dict.fromkeys(expand_sources(repodata)))
+        if spec.wheelhouse:
+            paths[Path(spec.wheelhouse)] = None
+    return list(paths)
+
+
+# * Session --------------------------------------------------------------------
+_Signature = tuple[tuple[str, int | str | None, int | None], ...]
+
+
+def _signature(paths: Iterable[Path]) -> _Signature:
+    out: list[tuple[str, int | str | None, int | None]] = []
+    for path in paths:
+        if path.is_dir():
+            out.append((str(path), directory_signature(path), None))
+        elif path.exists():
+            stat = path.stat()
+            out.append((str(path), stat.st_mtime_ns, stat.st_size))
+        else:
+            out.append((str(path), None, None))
+    return tuple(out)
+
+
+def source_signature(paths: Iterable[Path]) -> str:
+    """
+    Hash of sizes and modification times of ``paths`` (from :func:`source_paths`).
+
+    Contents are not read, since repodata files may be large.
+    """
+    return hashlib.sha256(repr(_signature(paths)).encode()).hexdigest()
+
+
+def _digest(paths: Iterable[Path]) -> str:
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(str(path).encode())
+        h.update(path.read_bytes() if path.exists() else b"\0")
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class _SessionState:
+    #: Input files, including mapping files named in ``pyproject.toml``.
+    paths: tuple[Path, ...]
+    signature: _Signature
+    digest: str
+    #: Lockfiles, repodata files, and wheelhouses named in options.
+    sources: tuple[Path, ...]
+    sources_signature: str
+    requirements: RequirementsConfig
+    config: PyProject2CondaConfig
+
+
+@dataclass
+class Session:
+    """
+    Parse ``pyproject.toml`` once and render many outputs from it.
+
+    The parsed configuration, resolution and marker caches, and rendered
+    outputs are kept for the lifetime of the session.  Nothing is re-read
+    unless :meth:`refresh` (which checks input modification times, falling
+    back to content hashes) or :meth:`invalidate` is called.  Inputs include
+    mapping files, lockfiles (``pin_from``), ``repodata`` files, and
+    wheelhouses.
+
+    Parameters
+    ----------
+    path : path-like
+        Path to ``pyproject.toml`` file.
+    options : dict, optional
+        Options overriding the ``tool.pyproject2conda`` table (same names as
+        the ``project`` command line options).
+    default_pythons : sequence of str, optional
+        Versions used for ``python = "default"``.  Defaults to reading
+        ``.python-version-default`` or ``.python-version`` in the current
+        directory (which are then tracked for invalidation).
+    header_cmd : str, optional
+        Command to place in file headers.  The default (``""``) creates a
+        generic header.  Use ``None`` for no header.
+
+    Examples
+    --------
+    >>> session = Session("tests/data/test-pyproject.toml")
+    >>> out = session.render("test", python="3.10")
+    >>> str(out.output), out.conda_deps[:2]
+    ('py310-test.yaml', ('python=3.10', 'bthing-conda'))
+    """
+
+    path: Path
+    options: dict[str, Any] = field(default_factory=dict)
+    default_pythons: Sequence[str] | None = None
+    header_cmd: str | None = ""
+    _state: _SessionState = field(init=False, repr=False)
+    _outputs: dict[tuple[str, str | None, str], RenderedOutput] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _resolved: ResolvedCache = field(init=False, repr=False, default_factory=dict)
+    _lock: threading.RLock = field(
+        init=False, repr=False, compare=False, default_factory=threading.RLock
+    )
+
+    def __post_init__(self) -> None:
+        self.path = Path(self.path)
+        self._state = self._load()
+
+    # ** loading
+    def _input_paths(self) -> list[Path]:
+        paths = [self.path]
+        if self.default_pythons is None:
+            paths.extend(map(Path, (".python-version-default", ".python-version")))
+        return paths
+
+    def _load(self) -> _SessionState:
+        paths = self._input_paths()
+        signature = _signature(paths)
+        requirements, config = load_configs(self.path, self.default_pythons)
+        if self.options:
+            config = config.update_options(self.options)
+        mappings = mapping_paths(requirements)
+        paths.extend(mappings)
+        sources = source_paths(spec for _, _, spec in config.iter_named_envs())
+        return _SessionState(
+            paths=tuple(paths),
+            signature=(*signature, *_signature(mappings)),
+            digest=_digest(paths),
+            sources=tuple(sources),
+            sources_signature=source_signature(sources),
+            requirements=requirements,
+            config=config,
+        )
+
+    @property
+    def requirements(self) -> RequirementsConfig:
+        """Parsed requirements."""
+        return self._state.requirements
+
+    @property
+    def config(self) -> PyProject2CondaConfig:
+        """Parsed ``tool.pyproject2conda`` configuration."""
+        return self._state.config
+
+    @property
+    def digest(self) -> str:
+        """Hash of session inputs."""
+        return self._state.digest
+
+    def is_stale(self) -> bool:
+        """
+        Whether inputs changed since loading.
+
+        Inputs whose modification time changed but whose contents did not are
+        not considered stale.  Lockfiles, repodata files, and wheelhouses are
+        only compared by size and modification time.
+        """
+        with self._lock:
+            if source_signature(self._state.sources) != self._state.sources_signature:
+                return True
+            paths = self._state.paths
+            if (signature := _signature(paths)) == self._state.signature:
+                return False
+            if _digest(paths) == self._state.digest:
+                self._state = replace(self._state, signature=signature)
+                return False
+            return True
+
+    def invalidate(self) -> None:
+        """Reload inputs and drop all cached results."""
+        with self._lock:
+            self._state = self._load()
+            self._outputs.clear()
+            self._resolved = {}
+
+    def refresh(self) -> bool:
+        """Reload if inputs are stale.  Returns ``True`` if reloaded."""
+        with self._lock:
+            if stale := self.is_stale():
+                self.invalidate()
+            return stale
+
+    # ** rendering
+    def plan(
+        self, envs: Iterable[str] | None = None
+    ) -> list[tuple[str, EnvRequirements | EnvYaml]]:
+        """Planned ``(style, options)`` for each output of ``envs``."""
+        return list(self.config.iter_envs(envs=envs))
+
+    def _render_cached(
+        self,
+        env: str,
+        style: str,
+        spec: EnvRequirements | EnvYaml,
+    ) -> RenderedOutput:
+        key = (env, _spec_python(spec), style)
+        if (out := self._outputs.get(key)) is not None:
+            return out
+
+        state, resolved = self._state, self._resolved
+        with scope(env, spec.output):
+            out = render_spec(
+                state.requirements,
+                state.config,
+                env=env,
+                style=style,
+                spec=spec,
+                header_cmd=self.header_cmd,
+                resolved=resolved,
+            )
+        with self._lock:
+            if state is not self._state:  # pragma: no cover
+                # invalidated while rendering.  Don't cache stale result.
+                return out
+            return self._outputs.setdefault(key, out)
+
+    def render(
+        self,
+        env: str,
+        python: str | None = None,
+        style: str = "yaml",
+    ) -> RenderedOutput:
+        """
+        Render single output.
+
+        Parameters
+        ----------
+        env : str
+            Environment name.
+        python : str, optional
+            Python version (conda styles only).  If not passed, and the
+            environment has a single python version, use that.
+        style : {"yaml", "requirements", "conda-requirements", "json"}
+            Output style.
+        """
+        env = canonicalize_name(env)
+        config = self.config
+        spec: EnvRequirements | EnvYaml
+        getters = {
+            "yaml": config.yaml_env,
+            "json": config.json_env,
+            "conda-requirements": config.conda_requirements_env,
+        }
+        if style == "requirements":
+            spec = config.requirements_env(env)
+        elif style in getters:
+            if python is None:
+                # pylint: disable=protected-access
+                pythons = config._python(env)  # ruff:ignore[private-member-access]  # pyright: ignore[reportPrivateUsage]
+                if len(pythons) > 1:
+                    msg = f"env {env} has multiple python versions {pythons}. Pass `python`."
+                    raise ValueError(msg)
+                python = pythons[0] if pythons else None
+            spec = getters[style](env, python)
+        else:
+            msg = f"unknown style {style}"
+            raise ValueError(msg)
+
+        return self._render_cached(env, style, spec)
+
+    def iter_outputs(
+        self, envs: Iterable[str] | None = None
+    ) -> Iterator[RenderedOutput]:
+        """
+        Render every planned output of ``envs`` (default all).
+
+        Yields
+        ------
+        RenderedOutput
+        """
+        for env, style, spec in self.config.iter_named_envs(envs):
+            yield self._render_cached(env, style, spec)
+
+    def check(
+        self,
+        envs: Iterable[str] | None = None,
+        max_workers: int | None = None,
+    ) -> list[CheckResult]:
+        """
+        Compare every planned output of ``envs`` (default all) to disk.
+
+        Outputs are rendered in memory (in parallel, with ``max_workers``
+        threads), and compared to existing files ignoring the leading header
+        comment.  Nothing is written.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def _check(
+            item: tuple[str, str, EnvRequirements | EnvYaml],
+        ) -> list[CheckResult]:
+            rendered = self._render_cached(*item)
+            return [
+                _check_file(rendered, path, content)
+                for path, content in rendered.files()
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return [
+                result
+                for results in pool.map(_check, self.config.iter_named_envs(envs))
+                for result in results
+            ]
+
+    def write_all(
+        self,
+        envs: Iterable[str] | None = None,
+        dedupe: Dedupe | str = Dedupe.none,
+        fsync: bool = False,
+    ) -> list[WriteResult]:
+        """
+        Write every planned output of ``envs`` (default all).
+
+        Outputs are skipped according to each environment's ``overwrite`` option.
+        With ``dedupe`` of ``"hardlink"`` or ``"symlink"``, outputs with content
+        identical to an earlier output are linked to it instead of written.
+        Files are written atomically, and flushed to disk if ``fsync``.
+        """
+        planned = list(self.config.iter_named_envs(envs))
+        make_parents(
+            path
+            for _, _, spec in planned
+            for path in (spec.output, getattr(spec, "output_pip", None))
+        )
+
+        writer = OutputWriter(dedupe=Dedupe(dedupe), fsync=fsync)
+        results: list[WriteResult] = []
+        for env, style, spec in planned:
+            python = _spec_python(spec)
+            if not update_target(spec.output, self.path, overwrite=spec.overwrite):
+                results.append(
+                    WriteResult(env, style, python, spec.output, status="skipped")
+                )
+                continue
+
+            rendered = self._render_cached(env, style, spec)
+            if files := rendered.files():
+                with scope(env, spec.output):
+                    statuses = {writer.write(content, path) for path, content in files}
+                status: Literal["written", "linked", "empty"] = (
+                    "linked" if statuses == {"linked"} else "written"
+                )
+            else:
+                status = "empty"
+            results.append(
+                WriteResult(env, style, python, spec.output, status, rendered)
+            )
+        return results
@@ -0,0 +1,104 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pyproject2conda._cache import OutputCache, parse_size
+from pyproject2conda.session import RenderedOutput
+
+
+@pytest.fixture
+def rendered() -> RenderedOutput:
+    return RenderedOutput(
+        env="test",
+        style="conda-requirements",
+        python="3.10",
+        output=Path("conda.txt"),
+        conda_deps=("a",),
+        pip_deps=("b",),
+        content="a\n",
+        output_pip=Path("pip.txt"),
+        content_pip="b\n",
+    )
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [("10", 10), ("1k", 1024), ("1.5M", 1536 * 1024), ("2GiB", 2 * 1024**3)],
+)
+def test_parse_size(size: str, expected: int) -> None:
+    assert parse_size(size) == expected
+
+
+def test_parse_size_invalid() -> None:
+    with pytest.raises(ValueError, match="Invalid size"):
+        parse_size("big")
+
+
+def test_get_put(tmp_path: Path, rendered: RenderedOutput) -> None:
+    cache = OutputCache(tmp_path)
+    key = cache.key("a", {"b": 1})
+    assert key == OutputCache.key("a", {"b": 1})
+    assert key != cache.key("a", {"b": 2})
+
+    assert cache.get(key) is None
+    cache.put(key, rendered)
+    assert cache.get(key) == rendered
+    # shared between instances
+    other = OutputCache(tmp_path)
+    assert other.get_or_render(key, lambda: pytest.fail("not cached")) == rendered
+
+    assert cache.stats.to_dict() == {
+        "hits": 1,
+        "misses": 1,
+        "corrupt": 0,
+        "stored": 1,
+        "evicted": 0,
+        "hit_rate": 0.5,
+    }
+
+
+def test_corrupt(tmp_path: Path, rendered: RenderedOutput) -> None:
+    cache = OutputCache(tmp_path)
+    key = cache.key("a")
+    cache.put(key, rendered)
+    path = cache.path(key)
+    path.write_text(path.read_text().replace("a\\\\n", "x\\\\n"))
+
+    assert cache.get(key) is None
+    assert cache.stats.corrupt == 1
+    assert not path.exists()
+
+    # truncated entry
+    cache.put(key, rendered)
+    path.write_text(path.read_text()[:20])
+    assert cache.get_or_render(key, lambda: rendered) == rendered
+    assert cache.stats.corrupt == 2
+    assert cache.get(key) == rendered
+
+
+def test_put_failure(tmp_path: Path, rendered: RenderedOutput) -> None:
+    cache = OutputCache(tmp_path)
+    with patch("pyproject2conda._cache.atomic_write", side_effect=OSError("full")):
+        cache.put("abc", rendered)
+    assert cache.stats.stored == 0
+
+
+def test_prune(tmp_path: Path, rendered: RenderedOutput) -> None:
+    cache = OutputCache(tmp_path)
+    keys = [cache.key(i) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.put(key, rendered)
+        os.utime(cache.path(key), (i, i))
+    size = cache.path(keys[0]).stat().st_size
+    # recently used
+    assert cache.get(keys[0]) is not None
+
+    assert cache.prune() == 0
+    assert cache.prune(2 * size) == 2
+    assert [cache.path(k).exists() for k in keys] == [True, False, False, True]
+    assert cache.stats.evicted == 2
@@ -0,0 +1,274 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import shutil
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import _git
+from pyproject2conda.cli import app
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def _run(*args: str, cwd: Path) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(example_path: Path) -> Iterator[Path]:
+    _git.clear_cache()
+    _run("init", "-q", cwd=example_path)
+    _run("config", "user.email", "a@b.c", cwd=example_path)
+    _run("config", "user.name", "a", cwd=example_path)
+    (example_path / "a").mkdir()
+    shutil.copy(ROOT / "test-pyproject.toml", example_path / "a" / "pyproject.toml")
+    shutil.copy(ROOT / "test-pyproject.toml", example_path / "pyproject.toml")
+    _run("add", ".", cwd=example_path)
+    _run("commit", "-q", "-m", "init", cwd=example_path)
+    yield example_path
+    _git.clear_cache()
+
+
+def test_changed_files(repo: Path) -> None:
+    assert _git.toplevel(repo / "a") == repo.resolve()
+    assert _git.changed_files("HEAD", repo) == frozenset()
+
+    (repo / "a" / "pyproject.toml").write_text("changed")
+    (repo / "new.txt").write_text("new")
+    # cached for the process
+    assert _git.changed_files("HEAD", repo) == frozenset()
+
+    _git.clear_cache()
+    assert _git.changed_files("HEAD", repo / "a") == {
+        repo.resolve() / "a" / "pyproject.toml",
+        repo.resolve() / "new.txt",
+    }
+    assert _git.any_changed([repo / "a" / "pyproject.toml"], "HEAD")
+    assert not _git.any_changed([repo / "pyproject.toml", "missing"], "HEAD")
+
+    with pytest.raises(ValueError, match=r"git diff"):
+        _git.changed_files("not-a-rev", repo / "b")
+
+
+def test_single_git_call(repo: Path) -> None:
+    with patch.object(_git, "_git", wraps=_git._git) as spy:  # ruff: ignore[private-member-access]
+        for _ in range(3):
+            _git.any_changed([repo / "pyproject.toml"], "HEAD")
+            _git.any_changed([repo / "a" / "pyproject.toml"], "HEAD")
+    # rev-parse (per directory), diff and ls-files (untracked, tracked) per repo
+    assert [c.args[0] for c in spy.call_args_list] == [
+        "rev-parse",
+        "diff",
+        "ls-files",
+        "ls-files",
+        "rev-parse",
+    ]
+
+
+def test_project_since(repo: Path) -> None:
+    runner = CliRunner()
+    args = ["project", "--pyproject", str(repo / "pyproject.toml"), "--since", "HEAD"]
+
+    # missing outputs are created
+    assert runner.invoke(app, args).exit_code == 0
+    output = repo / "py310-test.yaml"
+
+    # unchanged -> skipped
+    output.write_text("edited")
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() == "edited"
+
+    # changed -> regenerated
+    _git.clear_cache()
+    with (repo / "pyproject.toml").open("a") as f:
+        f.write("\n")
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() != "edited"
+
+
+def test_project_since_lockfile(repo: Path) -> None:
+    lock = """
+version = 1
+
+[[package]]
+name = "athing"
+version = "{}"
+source = {{ registry = "https://pypi.org/simple" }}
+"""
+    (repo / "b").mkdir()
+    pyproject = repo / "b" / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing"]
+
+[tool.pyproject2conda]
+pin-from = "b/uv.lock"
+header = false
+template = "b/{env}"
+
+[tool.pyproject2conda.envs.base]
+style = "requirements"
+"""
+    )
+    (repo / "b" / "uv.lock").write_text(lock.format("1.0"))
+    _run("add", ".", cwd=repo)
+    _run("commit", "-q", "-m", "lock", cwd=repo)
+    _git.clear_cache()
+
+    runner = CliRunner()
+    args = ["project", "--pyproject", str(pyproject), "--since", "HEAD"]
+    output = repo / "b" / "base.txt"
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() == "athing==1.0\n"
+
+    # only the lockfile changed -> regenerated
+    _git.clear_cache()
+    (repo / "b" / "uv.lock").write_text(lock.format("2.0"))
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() == "athing==2.0\n"
+
+
+def test_any_changed_directory(repo: Path) -> None:
+    (repo / "a" / "new.txt").write_text("new")
+    assert _git.any_changed([repo / "pyproject.toml", repo / "a"], "HEAD")
+    assert not _git.any_changed([repo / "pyproject.toml"], "HEAD")
+
+
+def test_any_changed_untracked(repo: Path, tmp_path_factory) -> None:
+    (repo / ".gitignore").write_text("wh/\nignored.toml\n")
+    _run("add", ".gitignore", cwd=repo)
+    _run("commit", "-q", "-m", "ignore", cwd=repo)
+    (repo / "wh").mkdir()
+    (repo / "wh" / "athing-1.0-py3-none-any.whl").write_text("")
+    (repo / "ignored.toml").write_text("")
+    outside = tmp_path_factory.mktemp("shared") / "mappings.toml"
+    outside.write_text("")
+
+    pyproject = repo / "pyproject.toml"
+    assert not _git.any_changed([pyproject, repo / "a", repo / "missing"], "HEAD")
+    # git cannot report changes to ignored files, or files outside the repository
+    assert _git.any_changed([pyproject, repo / "wh"], "HEAD")
+    assert _git.any_changed([pyproject, repo / "ignored.toml"], "HEAD")
+    assert _git.any_changed([pyproject, outside], "HEAD")
+
+
+def test_project_since_ignored_wheelhouse(repo: Path) -> None:
+    (repo / ".gitignore").write_text("wh/\n")
+    (repo / "b").mkdir()
+    pyproject = repo / "b" / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing>=2"]
+
+[tool.pyproject2conda]
+header = false
+template = "b/{env}"
+
+[tool.pyproject2conda.envs.base]
+style = "requirements"
+"""
+    )
+    _run("add", ".", cwd=repo)
+    _run("commit", "-q", "-m", "b", cwd=repo)
+    (repo / "wh").mkdir()
+    _git.clear_cache()
+
+    runner = CliRunner()
+    args = ["project", "--pyproject", str(pyproject), "--since", "HEAD"]
+    args.extend(["--wheelhouse", "wh"])
+    output = repo / "b" / "base.txt"
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() == "athing>=2\n"
+
+    (repo / "wh" / "athing-3.0-py3-none-any.whl").write_text("")
+    assert runner.invoke(app, args).exit_code == 0
+    assert output.read_text() == "athing==3.0\n"
+
+
+def _commit(repo: Path, message: str) -> str:
+    _run("commit", "-q", "--allow-empty", "-am", message, cwd=repo)
+    return _git.rev_list(["HEAD"], repo)[0]
+
+
+def test_cat_file(repo: Path) -> None:
+    first = _git.rev_list(["HEAD"], repo)[0]
+    (repo / "pyproject.toml").write_text("changed\n")
+    second = _commit(repo, "second")
+
+    assert _git.rev_list([f"{first}..HEAD"], repo) == [second]
+    assert _git.rev_list(["HEAD~1", "HEAD"], repo) == [first, second]
+
+    with _git.CatFile(repo) as cat:
+        blob = cat.read(f"{second}:pyproject.toml")
+        assert blob is not None
+        assert blob[1] == b"changed\n"
+        assert cat.read(f"{second}:missing") is None
+        blob = cat.read(f"{first}:pyproject.toml")
+        assert blob is not None
+        assert blob[1] == (ROOT / "test-pyproject.toml").read_bytes()
+
+    with pytest.raises(RuntimeError):
+        _ = _git.CatFile(repo).read("HEAD:pyproject.toml")
+
+
+def test_history(repo: Path) -> None:
+    import json
+
+    from pyproject2conda import _history
+
+    pyproject = repo / "pyproject.toml"
+    first = _git.rev_list(["HEAD"], repo)[0]
+    # unrelated change -> rendered once
+    with pyproject.open("a") as f:
+        f.write("\n# comment\n")
+    second = _commit(repo, "comment")
+    pyproject.write_text(
+        pyproject.read_text().replace('python = [ "3.10" ]', 'python = [ "3.11" ]')
+    )
+    third = _commit(repo, "python")
+    pyproject.write_text("[project\n")
+    fourth = _commit(repo, "broken")
+
+    revisions = _history.read_revisions([f"{first}~0", f"{first}..HEAD"], pyproject)
+    assert [r.rev for r in revisions] == [first, second, third, fourth]
+    assert revisions[0].key == revisions[1].key
+    assert revisions[1].key != revisions[2].key
+
+    runner = CliRunner()
+    args = ["history", "--pyproject", str(pyproject), "--envs", "dev"]
+    result = runner.invoke(
+        app, [*args, "--revs", f"{first}~0", "--revs", f"{first}..{third}"]
+    )
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(r["rev"], r["python"], r["output"]) for r in records] == [
+        (first, "3.10", "py310-dev.yaml"),
+        (second, "3.10", "py310-dev.yaml"),
+        (third, "3.11", "py311-dev.yaml"),
+    ]
+
+    result = runner.invoke(app, [*args, "--revs", "HEAD", "-d", "out"])
+    assert result.exit_code == 0
+    assert not (repo / "out").exists()
+
+    result = runner.invoke(app, [*args, "--revs", f"{second}~0", "-d", "out"])
+    assert result.exit_code == 0
+    assert (repo / "out" / second[:12] / "py310-dev.yaml").exists()
+
+    result = runner.invoke(app, [*args, "--revs", f"{fourth}~0"])
+    assert "error" in json.loads(result.stdout)
@@ -0,0 +1,171 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import Session, _instrument, collect_stats
+from pyproject2conda.cli import _clear_configs_cache, app
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+
+def test_phase_noop_when_not_recording() -> None:
+    assert _instrument.active() is None
+    with _instrument.phase("parse"):
+        pass
+    with _instrument.record() as timings:
+        assert _instrument.active() is timings
+    assert _instrument.active() is None
+    assert timings.stats == {}
+
+
+def test_nested_and_scoped_phases() -> None:
+    @_instrument.timed("resolve")
+    def resolve(n: int) -> int:
+        # recursive calls count once
+        return n if n == 0 else resolve(n - 1)
+
+    with _instrument.record() as timings:
+        with _instrument.scope("test", "out.yaml"), _instrument.phase("render"):
+            assert resolve(3) == 0
+        with _instrument.phase("parse"):
+            pass
+
+    assert set(timings.stats) == {
+        ("render", "test", "out.yaml"),
+        ("resolve", "test", "out.yaml"),
+        ("parse", None, None),
+    }
+    render = timings.stats["render", "test", "out.yaml"]
+    resolve_stats = timings.stats["resolve", "test", "out.yaml"]
+    assert resolve_stats.calls == render.calls == 1
+    assert render.exclusive == pytest.approx(render.wall - resolve_stats.wall)
+
+    assert list(timings.totals()) == ["parse", "resolve", "render"]
+    assert set(timings.by_output()) == {("test", "out.yaml"), (None, None)}
+
+
+def test_threads_record_to_active() -> None:
+    def work() -> None:
+        with _instrument.phase("write"):
+            pass
+
+    with _instrument.record() as timings:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert timings.totals()["write"].calls == 4
+
+
+@pytest.mark.usefixtures("example_path")
+def test_session_phases() -> None:
+    with _instrument.record() as timings:
+        session = Session(ROOT / "test-pyproject.toml", default_pythons=["3.10"])
+        _ = session.write_all(envs=["test"])
+
+    totals = timings.totals()
+    for name in ("parse", "validate", "get_env", "resolve", "render", "write"):
+        assert totals[name].calls >= 1, name
+
+    data = timings.to_dict()
+    assert set(data["phases"]) == set(totals)
+    assert {
+        (r["env"], r["output"]) for r in data["records"] if r["phase"] == "write"
+    } == {("test", "py310-test.yaml"), ("test", "py311-test.yaml")}
+
+
+@pytest.mark.parametrize("output_format", ["table", "json"])
+def test_cli_timings(output_format, example_path) -> None:
+    result = CliRunner().invoke(
+        app,
+        [
+            "--timings",
+            output_format,
+            "project",
+            "--pyproject",
+            str(ROOT / "test-pyproject.toml"),
+            "--envs",
+            "test",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert (example_path / "py310-test.yaml").exists()
+    assert _instrument.active() is None
+
+    if output_format == "json":
+        data = json.loads(result.stderr)
+        assert data["phases"]["write"]["calls"] == 2
+    else:
+        assert result.stderr.splitlines()[0].split()[:2] == ["phase", "calls"]
+        assert "py310-test.yaml" in result.stderr
+
+
+def test_collect_stats() -> None:
+    _instrument.count("outputs_rendered")
+    with _instrument.collect_stats() as outer:
+        with _instrument.collect_stats() as inner:
+            _instrument.count("outputs_rendered", 2)
+        _instrument.count("outputs_written")
+    _instrument.count("outputs_written")
+
+    assert outer == {"outputs_rendered": 2, "outputs_written": 1}
+    assert inner == {"outputs_rendered": 2}
+    assert not _instrument._COUNTERS
+
+
+@pytest.mark.usefixtures("example_path")
+def test_session_stats() -> None:
+    with collect_stats() as stats:
+        session = Session(ROOT / "test-pyproject.toml", default_pythons=["3.10"])
+    # environments are merged once, when loading (to find lockfiles, etc.)
+    assert stats["env_merges"] == len(session.config.schema.envs)
+
+    with collect_stats() as stats:
+        _ = session.write_all(envs=["test"])
+    assert stats["outputs_rendered"] == stats["outputs_written"] == 2
+    assert stats["requirements_parsed"] >= 1
+    assert "env_merges" not in stats
+
+    # outputs up to date are skipped, and cached work is not repeated
+    with collect_stats() as stats:
+        _ = session.write_all(envs=["test"])
+    assert stats["outputs_skipped"] == 2
+    assert "outputs_rendered" not in stats
+    assert "env_merges" not in stats
+
+
+@pytest.mark.parametrize("output_format", ["table", "json"])
+def test_cli_stats(output_format, example_path) -> None:
+    _clear_configs_cache()
+    result = CliRunner().invoke(
+        app,
+        [
+            "--stats",
+            output_format,
+            "project",
+            "--pyproject",
+            str(ROOT / "test-pyproject.toml"),
+            "--envs",
+            "test",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert (example_path / "py310-test.yaml").exists()
+    assert not _instrument._COUNTERS
+
+    if output_format == "json":
+        data = json.loads(result.stderr)
+        assert data["outputs_written"] == data["outputs_rendered"] == 2
+        assert data["marker_evaluations"] >= 1
+    else:
+        assert result.stderr.splitlines()[0].split() == ["counter", "count"]
+        assert "outputs_written" in result.stderr
@@ -0,0 +1,106 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pyproject2conda._lock import (
+    LOCK_DIR_ENV,
+    Claim,
+    claim_outputs,
+    file_lock,
+    inputs_key,
+    lock_path,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def lock_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "locks"
+    monkeypatch.setenv(LOCK_DIR_ENV, str(path))
+    return path
+
+
+pytestmark = pytest.mark.usefixtures("lock_dir")
+
+
+def test_lock_path(lock_dir: Path, tmp_path: Path) -> None:
+    path = lock_path(tmp_path / "pyproject.toml")
+    assert path.parent == lock_dir / "pyproject2conda-locks"
+    assert path != lock_path(tmp_path / "other.toml")
+
+
+def test_file_lock_timeout(tmp_path: Path) -> None:
+    path = tmp_path / "x.lock"
+    with file_lock(path) as waited:
+        assert not waited
+        with pytest.raises(TimeoutError), file_lock(path, timeout=0.05):
+            pass
+    with file_lock(path, timeout=0.05):
+        pass
+
+
+def _generate(pyproject: Path, key: str, output: Path, delay: float = 0.0) -> str:
+    with claim_outputs(pyproject, key) as claim:
+        if claim.reused:
+            return "reused"
+        time.sleep(delay)
+        output.write_text(key, encoding="utf-8")
+        claim.complete([output])
+        return "generated"
+
+
+def test_claim_reuse(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    pyproject, output = tmp_path / "pyproject.toml", tmp_path / "out.txt"
+    barrier = threading.Barrier(4)
+
+    def worker(_: int) -> str:
+        barrier.wait()
+        return _generate(pyproject, "a", output, delay=0.1)
+
+    with (
+        caplog.at_level(logging.INFO, logger="pyproject2conda"),
+        ThreadPoolExecutor(4) as pool,
+    ):
+        results = list(pool.map(worker, range(4)))
+
+    assert sorted(results) == ["generated", "reused", "reused", "reused"]
+    assert "Waited" in caplog.text
+
+    # later invocation regenerates
+    assert _generate(pyproject, "a", output) == "generated"
+
+
+def test_claim_check_reusable(tmp_path: Path) -> None:
+    pyproject, output = tmp_path / "pyproject.toml", tmp_path / "out.txt"
+    with claim_outputs(pyproject, "a") as claim:
+        assert not claim.reused
+        output.write_text("a")
+        claim.complete([output])
+
+    assert Claim(path=claim.path, key="a", started=0.0).check_reusable()
+    # different inputs
+    assert not Claim(path=claim.path, key="b", started=0.0).check_reusable()
+    # completed before we started
+    assert not Claim(path=claim.path, key="a", started=time.time()).check_reusable()
+
+    # output changed since
+    output.write_text("changed")
+    assert not Claim(path=claim.path, key="a", started=0.0).check_reusable()
+
+
+def test_inputs_key(tmp_path: Path) -> None:
+    path = tmp_path / "a.toml"
+    missing = inputs_key([path], "x")
+    path.write_text("a")
+    assert inputs_key([path], "x") != missing
+    assert inputs_key([path], "x") == inputs_key([path], "x")
+    assert inputs_key([path], "y") != inputs_key([path], "x")
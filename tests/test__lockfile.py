@@ -0,0 +1,308 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import _lockfile
+from pyproject2conda.cli import app
+from pyproject2conda.requirements import RequirementsConfig
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+UV_LOCK = """
+version = 1
+requires-python = ">=3.10"
+
+[[package]]
+name = "hello"
+version = "0.1.0"
+source = { editable = "." }
+
+[[package]]
+name = "Athing"
+version = "1.2.3"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "numpy"
+version = "2.2.6"
+source = { registry = "https://pypi.org/simple" }
+resolution-markers = ["python_full_version < '3.11'"]
+
+[[package]]
+name = "numpy"
+version = "2.3.1"
+source = { registry = "https://pypi.org/simple" }
+resolution-markers = [
+    "python_full_version >= '3.12'",
+    "python_full_version == '3.11.*'",
+]
+
+[[package]]
+name = "torch"
+version = "2.7.1"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "workspace"
+source = { virtual = "." }
+"""
+
+PYLOCK = """
+lock-version = "1.0"
+created-by = "test"
+
+[[packages]]
+name = "athing"
+version = "1.2.3"
+
+[[packages]]
+name = "numpy"
+version = "2.2.6"
+marker = "python_version < '3.11'"
+
+[[packages]]
+name = "numpy"
+version = "2.3.1"
+marker = "python_version >= '3.11'"
+"""
+
+PYPROJECT = """
+[project]
+name = "hello"
+requires-python = ">=3.10"
+dependencies = ["athing>=1", "numpy", "other", "torch>=2"]
+
+[tool.pyproject2conda.dependencies]
+athing = { pip = true }
+torch = { channel = "pytorch", packages = "cuda-toolkit" }
+"""
+
+# map torch to the conda package pytorch
+PYPROJECT_RENAMED = PYPROJECT.replace(
+    'torch = { channel = "pytorch", packages = "cuda-toolkit" }',
+    'torch = { skip = true, packages = "pytorch>=2" }',
+)
+
+
+@pytest.fixture
+def clear_cache() -> Iterator[None]:
+    _lockfile.clear_cache()
+    yield
+    _lockfile.clear_cache()
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+@pytest.mark.parametrize(
+    ("name", "text"), [("uv.lock", UV_LOCK), ("pylock.toml", PYLOCK)]
+)
+def test_lockfile(tmp_path: Path, name: str, text: str) -> None:
+    path = tmp_path / name
+    path.write_text(text)
+    lockfile = _lockfile.load_lockfile(path)
+    assert _lockfile.load_lockfile(path) is lockfile
+
+    assert "athing" in lockfile
+    assert lockfile.version("athing") == "1.2.3"
+    assert lockfile.version("numpy", "3.10") == "2.2.6"
+    assert lockfile.version("numpy", "3.11") == "2.3.1"
+    assert lockfile.version("numpy", "3.13") == "2.3.1"
+    assert lockfile.version("other", "3.13") is None
+
+
+def test_invalid(tmp_path: Path) -> None:
+    path = tmp_path / "bad.lock"
+    path.write_text("version = 1\n")
+    with pytest.raises(ValueError, match="must be a uv"):
+        _lockfile.load_lockfile(path)
+
+
+def test_pin(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "uv.lock"
+    path.write_text(UV_LOCK)
+    d = RequirementsConfig.from_string(PYPROJECT)
+
+    with caplog.at_level(logging.WARNING):
+        conda, pip = d.conda_and_pip_requirements(
+            python_version="3.10",
+            python_include="infer",
+            conda_deps=["conda-forge::cthing"],
+            lockfile=_lockfile.load_lockfile(path),
+        )
+    assert sorted(map(str, conda)) == [
+        "conda-forge::cthing",
+        "cuda-toolkit",
+        "numpy==2.2.6",
+        "other",
+        "pip",
+        "python>=3.10",
+        "pytorch::torch==2.7.1",
+    ]
+    assert sorted(map(str, pip)) == ["athing==1.2.3"]
+    # only PyPI names are looked up
+    assert "Not pinned" in caplog.text
+    assert "missing from" in caplog.text
+    assert caplog.text.rstrip().endswith(": other")
+
+
+def test_pin_stale(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "uv.lock"
+    path.write_text(UV_LOCK)
+    d = RequirementsConfig.from_string(
+        PYPROJECT.replace('"athing>=1"', '"athing>=2"').replace(
+            '"numpy"', '"numpy<2.3"'
+        )
+    )
+
+    with caplog.at_level(logging.WARNING):
+        conda, pip = d.conda_and_pip_requirements(
+            python_version="3.12",
+            lockfile=_lockfile.load_lockfile(path),
+        )
+    # locked versions contradicting project metadata are not pinned
+    assert sorted(map(str, pip)) == ["athing>=2"]
+    assert "numpy<2.3" in set(map(str, conda))
+    assert "pytorch::torch==2.7.1" in set(map(str, conda))
+    assert "does not satisfy" in caplog.text
+    assert "athing>=2 (locked 1.2.3), numpy<2.3 (locked 2.3.1)" in caplog.text
+
+
+@pytest.mark.parametrize("python_version", ["3.10", "3.11"])
+def test_pin_marker_excluded(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture, python_version: str
+) -> None:
+    path = tmp_path / "uv.lock"
+    path.write_text(UV_LOCK)
+    d = RequirementsConfig.from_string(
+        PYPROJECT.replace('"other", ', "").replace(
+            '"torch>=2"', '"torch>=2", "cthing; python_version < \'3.10\'"'
+        )
+    )
+
+    with caplog.at_level(logging.WARNING):
+        conda, pip = d.conda_and_pip_requirements(
+            python_version=python_version,
+            lockfile=_lockfile.load_lockfile(path),
+        )
+    # dependency excluded by its marker is not looked up in the lockfile
+    assert "cthing" not in {req.name for req in (*conda, *pip)}
+    assert "Not pinned" not in caplog.text
+
+
+def test_pin_mapped(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "uv.lock"
+    path.write_text(UV_LOCK)
+    d = RequirementsConfig.from_string(PYPROJECT_RENAMED)
+
+    with caplog.at_level(logging.WARNING):
+        conda, _ = d.conda_and_pip_requirements(
+            python_version="3.12",
+            lockfile=_lockfile.load_lockfile(path),
+        )
+    # conda package from mapping is not looked up in the lockfile
+    assert "pytorch>=2" in set(map(str, conda))
+    assert "torch" not in caplog.text
+
+
+def test_pin_renamed(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "uv.lock"
+    path.write_text(UV_LOCK)
+    d = RequirementsConfig.from_string(
+        PYPROJECT_RENAMED.replace('"pytorch>=2"', '"pytorch"')
+    )
+
+    with caplog.at_level(logging.WARNING):
+        conda, _ = d.conda_and_pip_requirements(
+            python_version="3.12",
+            lockfile=_lockfile.load_lockfile(path),
+        )
+    # renamed package takes the locked version of the PyPI package
+    assert "pytorch==2.7.1" in set(map(str, conda))
+    assert "torch" not in caplog.text
+
+
+def test_cli(example_path: Path) -> None:
+    (example_path / "uv.lock").write_text(UV_LOCK)
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(PYPROJECT)
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "yaml",
+            "--pyproject",
+            str(pyproject),
+            "--no-header",
+            "--python-version",
+            "3.12",
+            "--pin-from",
+            "uv.lock",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout == (
+        "dependencies:\n"
+        "  - cuda-toolkit\n"
+        "  - numpy==2.3.1\n"
+        "  - other\n"
+        "  - pytorch::torch==2.7.1\n"
+        "  - pip\n"
+        "  - pip:\n"
+        "      - athing==1.2.3\n"
+    )
+
+
+def test_cli_requirements(example_path: Path) -> None:
+    (example_path / "uv.lock").write_text(UV_LOCK)
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(PYPROJECT)
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "requirements",
+            "--pyproject",
+            str(pyproject),
+            "--no-header",
+            "--pin-from",
+            "uv.lock",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.stdout.splitlines()
+    assert lines[0] == "athing==1.2.3"
+    assert lines[1].startswith("numpy==")
+    assert lines[2:] == ["other", "torch==2.7.1"]
+
+
+def test_cli_project_requirements(example_path: Path) -> None:
+    (example_path / "uv.lock").write_text(UV_LOCK)
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        PYPROJECT
+        + """
+[tool.pyproject2conda]
+pin-from = "uv.lock"
+header = false
+
+[tool.pyproject2conda.envs.base]
+style = ["requirements", "yaml"]
+python = "3.12"
+"""
+    )
+
+    result = CliRunner().invoke(app, ["project", "--pyproject", str(pyproject)])
+    assert result.exit_code == 0, result.output
+    assert "torch==2.7.1" in (example_path / "base.txt").read_text().splitlines()
+    assert "  - pytorch::torch==2.7.1" in (
+        (example_path / "py312-base.yaml").read_text().splitlines()
+    )
@@ -0,0 +1,215 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import json
+import re
+from typing import TYPE_CHECKING
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import _mapping, _repodata
+from pyproject2conda.cli import _get_configs, app
+from pyproject2conda.requirements import RequirementsConfig
+from pyproject2conda.session import Session, mapping_paths
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture
+def index_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    path = tmp_path / "index"
+    monkeypatch.setenv(_repodata.INDEX_DIR_ENV, str(path))
+    _mapping.clear_cache()
+    yield path
+    _mapping.clear_cache()
+
+
+pytestmark = pytest.mark.usefixtures("index_dir")
+
+MAPPINGS = """
+torch = { packages = "pytorch", skip = true }
+Jupyter_Lab = { pip = true }
+cthing = { channel = "pip" }
+"""
+
+
+@pytest.fixture
+def mapping_file(tmp_path: Path) -> Path:
+    path = tmp_path / "mappings.toml"
+    path.write_text(MAPPINGS)
+    return path
+
+
+def test_mapping_file(mapping_file: Path, index_dir: Path) -> None:
+    file = _mapping.load_mapping_file(mapping_file)
+    assert _mapping.load_mapping_file(mapping_file) is file
+    assert [p.name for p in (index_dir / "pyproject2conda-mappings").iterdir()] == [
+        f"{file.digest[:32]}.sqlite"
+    ]
+
+    torch = file.get("torch")
+    assert torch is not None
+    assert torch.skip
+    assert torch.packages == ["pytorch"]
+    assert file.get("torch") is torch
+    # names normalized, and ``channel = "pip"`` as in pyproject.toml
+    assert file.get("jupyter-lab") is not None
+    cthing = file.get("cthing")
+    assert cthing is not None
+    assert cthing.pip
+    assert file.get("other") is None
+
+    # same contents share an index
+    copy = mapping_file.with_name("copy.json")
+    copy.write_text(
+        json.dumps({
+            "tool": {
+                "pyproject2conda": {
+                    "dependencies": {
+                        "torch": {"packages": "pytorch", "skip": True},
+                    }
+                }
+            }
+        })
+    )
+    other = _mapping.load_mapping_file(copy)
+    assert other.digest != file.digest
+    other_torch = other.get("torch")
+    assert other_torch is not None
+    assert other_torch.packages == ["pytorch"]
+
+    # changed file is recompiled
+    mapping_file.write_text(
+        'torch = { pip = true, packages = ["a", "b"] }\n', encoding="utf-8"
+    )
+    updated = _mapping.load_mapping_file(mapping_file)
+    assert updated is not file
+    assert updated.get("jupyter-lab") is None
+
+
+def test_invalid(tmp_path: Path) -> None:
+    path = tmp_path / "bad.toml"
+    path.write_text("torch = { pip = 1.5 }\n")
+    with pytest.raises(ValueError, match="pip"):
+        _mapping.load_mapping_file(path)
+
+    path = tmp_path / "bad.json"
+    path.write_text("[1, 2]")
+    with pytest.raises(TypeError, match="must contain a table"):
+        _mapping.load_mapping_file(path)
+
+
+def test_dependency_map(mapping_file: Path) -> None:
+    d = RequirementsConfig.from_string(
+        """
+[project]
+name = "hello"
+dependencies = ["torch", "jupyter-lab", "cthing", "other"]
+
+[tool.pyproject2conda]
+mapping-files = ["mappings.toml"]
+
+[tool.pyproject2conda.dependencies]
+cthing = { channel = "conda-forge" }
+""",
+        root=mapping_file.parent,
+    )
+    dependency_map = d.dependency_map
+    assert isinstance(dependency_map, _mapping.DependencyMap)
+    assert list(dependency_map) == ["cthing"]
+    assert "torch" in dependency_map
+    assert "other" not in dependency_map
+
+    conda, pip = d.conda_and_pip_requirements()
+    assert sorted(map(str, conda)) == ["conda-forge::cthing", "other", "pip", "pytorch"]
+    assert sorted(map(str, pip)) == ["jupyter-lab"]
+
+
+def test_cli_and_session(mapping_file: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["torch", "jupyter-lab"]
+
+[tool.pyproject2conda]
+mapping-files = ["mappings.toml"]
+"""
+    )
+    result = CliRunner().invoke(
+        app, ["yaml", "--pyproject", str(pyproject), "--no-header"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "  - pytorch\n" in result.stdout
+    assert "  - pip:\n      - jupyter-lab\n" in result.stdout
+
+    session = Session(pyproject, default_pythons=["3.12"])
+    assert not session.is_stale()
+    mapping_file.write_text(
+        MAPPINGS.replace("pip = true", "skip = true"), encoding="utf-8"
+    )
+    assert session.is_stale()
+
+    # session and cli load configs the same way, and track the same inputs
+    paths = mapping_paths(session.requirements)
+    assert paths == [mapping_file.resolve()]
+    assert paths == mapping_paths(_get_configs(pyproject)[0])
+
+
+def test_name_patterns() -> None:
+    patterns = _mapping.NamePatterns([
+        ("jupyterlab-*", "prefix"),
+        ("jupyterlab-git*", "longer-prefix"),
+        ("*-stubs", "glob"),
+        ("re:types-.+", "regex"),
+        ("re:.*-stubs", "later"),
+        ("py?", "single"),
+    ])
+    assert patterns
+    assert not _mapping.NamePatterns([])
+    assert patterns.match("jupyterlab-lsp") == "prefix"
+    assert patterns.match("jupyterlab-git") == "longer-prefix"
+    assert patterns.match("jupyterlab") is None
+    assert patterns.match("pandas-stubs") == "glob"
+    assert patterns.match("types-requests") == "regex"
+    assert patterns.match("types-") is None
+    assert patterns.match("pyx") == "single"
+    assert patterns.match("pyxy") is None
+
+    with pytest.raises(re.error):
+        _mapping.NamePatterns([("re:(", 1)])
+
+
+def test_dependency_patterns() -> None:
+    d = RequirementsConfig.from_string(
+        """
+[project]
+name = "hello"
+dependencies = [
+    "jupyterlab_git",
+    "jupyterlab-server",
+    "types-requests",
+    "Types.PyYAML",
+    "pandas-stubs",
+]
+
+[tool.pyproject2conda.dependencies]
+"jupyterlab-*" = { pip = true }
+jupyterlab-server = { channel = "conda-forge" }
+"re:types-.+" = { skip = true }
+"*_stubs" = { channel = "conda-forge" }
+"""
+    )
+    dependency_map = d.dependency_map
+    assert list(dependency_map) == ["jupyterlab-server"]
+    conda, pip = d.conda_and_pip_requirements()
+    assert sorted(map(str, conda)) == [
+        "conda-forge::jupyterlab-server",
+        "conda-forge::pandas-stubs",
+        "pip",
+    ]
+    assert sorted(map(str, pip)) == ["jupyterlab-git"]
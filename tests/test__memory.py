@@ -0,0 +1,102 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import json
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import _instrument, _memory
+from pyproject2conda.cli import _clear_configs_cache, app
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+
+def _transient(size: int) -> int:
+    return len(bytearray(size))
+
+
+def test_memory_report_phases() -> None:
+    retained: list[bytes] = []
+    with _memory.MemoryReport() as report:
+        assert tracemalloc.is_tracing()
+        with _instrument.project("a/pyproject.toml"):
+            with _instrument.phase("render"):
+                # transient allocation within nested phase
+                with _instrument.phase("resolve"):
+                    assert _transient(1_000_000) == 1_000_000
+                retained.append(b"x" * 100_000)
+            with _instrument.phase("write"):
+                pass
+
+    assert not tracemalloc.is_tracing()
+    assert not _instrument._HOOKS
+
+    stats = report.stats
+    assert set(stats) == {
+        ("project", "a/pyproject.toml"),
+        ("render", "a/pyproject.toml"),
+        ("resolve", "a/pyproject.toml"),
+        ("write", "a/pyproject.toml"),
+    }
+    render = stats["render", "a/pyproject.toml"]
+    resolve = stats["resolve", "a/pyproject.toml"]
+    # peak of nested phase counts toward enclosing phase
+    assert resolve.peak >= 1_000_000
+    assert render.peak >= resolve.peak
+    assert stats["project", "a/pyproject.toml"].peak >= render.peak
+    assert report.peak >= render.peak
+
+    assert 100_000 <= render.net < 1_000_000
+    # top sites only for ``project`` and phases directly within it
+    assert render.top()[0][0].startswith(__file__)
+    assert render.top()[0][1] >= 100_000
+    assert not resolve.sites
+
+    data = report.to_dict()
+    assert [x["phase"] for x in data["phases"]] == [
+        "project",
+        "resolve",
+        "render",
+        "write",
+    ]
+    assert "configs" in data["gauges"]
+    assert "Top allocations: a/pyproject.toml render" in report.table()
+
+
+def test_gauges() -> None:
+    _instrument.register_gauge("test-gauge", lambda: 3)
+    try:
+        assert _instrument.gauges()["test-gauge"] == 3
+    finally:
+        del _instrument._GAUGES["test-gauge"]
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [(10, "10.0 B"), (2048, "2.0 KiB"), (3 * 1024**3, "3.0 GiB")],
+)
+def test_format_size(size, expected) -> None:
+    assert _memory._format_size(size) == expected
+
+
+@pytest.mark.usefixtures("example_path")
+def test_cli_memory_report() -> None:
+    pyproject = str(ROOT / "test-pyproject.toml")
+    _clear_configs_cache()
+    result = CliRunner().invoke(
+        app,
+        ["--memory-report", "json", "project", "--pyproject", pyproject],
+    )
+    assert result.exit_code == 0, result.output
+    data = json.loads(result.stderr)
+
+    phases = {x["phase"]: x for x in data["phases"]}
+    assert {x["project"] for x in data["phases"]} == {pyproject}
+    assert {"project", "parse", "validate", "render", "write"} <= set(phases)
+    assert phases["project"]["top"]
+    assert data["gauges"]["configs"] >= 1
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,96 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import cProfile
+import pstats
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import _instrument, _profile
+from pyproject2conda.cli import app
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+
+def _leaf() -> int:
+    return sum(range(1000))
+
+
+def _a() -> int:
+    return _leaf()
+
+
+def _b() -> int:
+    return _leaf() + _leaf()
+
+
+def test_collapsed_stacks() -> None:
+    profile = cProfile.Profile()
+    profile.enable()
+    for _ in range(20):
+        _ = _a() + _b()
+    profile.disable()
+
+    stacks = _profile.collapsed_stacks(pstats.Stats(profile), min_time=0.0)
+    leaf = {
+        stack.split(";")[-2].split()[0]: seconds
+        for stack, seconds in stacks.items()
+        if stack.split(";")[-1].startswith("_leaf ")
+    }
+    assert set(leaf) == {"_a", "_b"}
+    # time of ``_leaf`` split between callers by their calls
+    assert leaf["_b"] > leaf["_a"]
+
+
+def test_profiler_phase() -> None:
+    with _profile.Profiler(phase="resolve") as profiler:
+        _ = _a()
+        with _instrument.phase("resolve"):
+            _ = _b()
+
+    stats = profiler.stats()
+    assert stats is not None
+    names = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+    assert "_b" in names
+    assert "_a" not in names
+    assert not _instrument._HOOKS
+
+
+def test_profiler_nothing_profiled(tmp_path, caplog) -> None:
+    with _profile.Profiler(phase="write") as profiler:
+        _ = _a()
+    profiler.write(tmp_path / "out.prof")
+    assert not (tmp_path / "out.prof").exists()
+    assert "Nothing profiled" in caplog.text
+
+
+def test_profiler_bad_phase() -> None:
+    with pytest.raises(ValueError, match="Unknown phase"):
+        _ = _profile.Profiler(phase="other")
+
+
+@pytest.mark.parametrize("phase", [None, "render"])
+def test_cli_profile(phase, example_path) -> None:
+    args = ["--profile", "prof/{command}.prof"]
+    if phase is not None:
+        args.extend(["--profile-phase", phase])
+    result = CliRunner().invoke(
+        app,
+        [*args, "project", "--pyproject", str(ROOT / "test-pyproject.toml")],
+    )
+    assert result.exit_code == 0, result.output
+
+    stats = pstats.Stats(str(example_path / "prof" / "project.prof"))
+    assert any(
+        name == "render_spec"
+        for _, _, name in stats.stats  # type: ignore[attr-defined]
+    )
+    folded = (example_path / "prof" / "project.folded").read_text()
+    assert "render_spec (session.py:" in folded
+    for line in folded.splitlines():
+        _, micro = line.rsplit(" ", 1)
+        assert int(micro) > 0
+    assert not _instrument._HOOKS
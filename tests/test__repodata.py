@@ -0,0 +1,350 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import io
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import Session, _repodata
+from pyproject2conda._normalized_requirements import (
+    CondaRequirement,
+    NormalizedRequirement,
+)
+from pyproject2conda.cli import app
+from pyproject2conda.requirements import RequirementsConfig
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+REPODATA = {
+    "info": {"subdir": "noarch"},
+    "packages": {
+        "numpy-1.26.4-0.tar.bz2": {"name": "numpy", "version": "1.26.4", "depends": []},
+        "ruamel.yaml-0.18.0-0.tar.bz2": {"name": "ruamel.yaml", "version": "0.18.0"},
+    },
+    "packages.conda": {
+        "numpy-2.0.0-0.conda": {
+            "name": "numpy",
+            "version": "2.0.0",
+            "depends": ["libblas", "python >=3.12,<3.13.0a0"],
+            "size": 12345,
+        },
+        "python-3.12.0-0.conda": {"name": "python", "version": "3.12.0"},
+        "odd-1.0-0.conda": {"name": "odd", "version": "1.0_custom"},
+    },
+    "removed": ["a-1-0.tar.bz2"],
+    "repodata_version": 1,
+}
+
+
+@pytest.fixture
+def index_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    path = tmp_path / "index"
+    monkeypatch.setenv(_repodata.INDEX_DIR_ENV, str(path))
+    _repodata.clear_cache()
+    yield path
+    _repodata.clear_cache()
+
+
+pytestmark = pytest.mark.usefixtures("index_dir")
+
+
+@pytest.fixture
+def repodata(tmp_path: Path) -> Path:
+    path = tmp_path / "repodata.json"
+    path.write_text(json.dumps(REPODATA, indent=1))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_json_stream(chunk_size: int) -> None:
+    stream = _repodata._JsonStream(
+        io.StringIO(' { "a" : 12345 , "b": [1, {"c": "d"}]}'), chunk_size
+    )
+    stream.take("{")
+    assert stream.value() == "a"
+    stream.take(":")
+    assert stream.value() == 12345
+    stream.take(",")
+    assert stream.value() == "b"
+    stream.take(":")
+    assert stream.value() == [1, {"c": "d"}]
+    stream.take("}")
+    assert not stream.peek()
+
+    with pytest.raises(ValueError, match="Expected"):
+        stream.take("}")
+
+
+def test_iter_repodata(repodata: Path) -> None:
+    assert list(_repodata.iter_repodata(repodata)) == [
+        ("numpy", "1.26.4", ""),
+        ("ruamel.yaml", "0.18.0", ""),
+        ("numpy", "2.0.0", ">=3.12,<3.13.0a0"),
+        ("python", "3.12.0", ""),
+        ("odd", "1.0_custom", ""),
+    ]
+
+
+def test_index(repodata: Path, index_dir: Path) -> None:
+    index = _repodata.RepodataIndex.open([repodata])
+    assert index.path.parent == index_dir / "pyproject2conda-repodata"
+    assert "numpy" in index
+    assert "ruamel-yaml" in index
+    assert "odd" in index
+    assert "missing" not in index
+    assert [str(v) for v in sorted(index.versions("numpy"))] == ["1.26.4", "2.0.0"]
+    # unparsable versions skipped
+    assert index.versions("odd") == ()
+
+    def available(req: str) -> bool:
+        return index.available(NormalizedRequirement(req))
+
+    assert available("numpy")
+    assert available("numpy>=2")
+    assert not available("numpy>2")
+    assert available("ruamel.yaml<1")
+    assert not available("missing")
+    index.close()
+
+    # reused unless a source changes
+    mtime = index.path.stat().st_mtime_ns
+    _repodata.RepodataIndex.open([repodata]).close()
+    assert index.path.stat().st_mtime_ns == mtime
+    repodata.write_text(json.dumps({"packages": {}}), encoding="utf-8")
+    index = _repodata.RepodataIndex.open([repodata])
+    assert "numpy" not in index
+    index.close()
+
+
+def test_directories(tmp_path: Path) -> None:
+    prefix = tmp_path / "env"
+    (prefix / "conda-meta").mkdir(parents=True)
+    (prefix / "conda-meta" / "a-1.0-0.json").write_text(
+        json.dumps({"name": "a", "version": "1.0"})
+    )
+    pkgs = tmp_path / "pkgs"
+    (pkgs / "b-2.0-0" / "info").mkdir(parents=True)
+    (pkgs / "b-2.0-0" / "info" / "index.json").write_text(
+        json.dumps({"name": "b", "version": "2.0"})
+    )
+    (pkgs / "linux-64").mkdir()
+    (pkgs / "linux-64" / "repodata.json").write_text(json.dumps(REPODATA))
+
+    assert len(_repodata.expand_sources([prefix, pkgs])) == 3
+    index = _repodata.load_index([prefix, pkgs])
+    assert _repodata.load_index([prefix, pkgs]) is index
+    assert {"a", "b", "numpy"} <= {
+        name for name in ("a", "b", "numpy", "c") if name in index
+    }
+    assert "c" not in index
+
+
+def _add_numpy(repodata: Path, version: str) -> None:
+    data = json.loads(repodata.read_text(encoding="utf-8"))
+    data["packages.conda"][f"numpy-{version}-0.conda"] = {
+        "name": "numpy",
+        "version": version,
+    }
+    repodata.write_text(json.dumps(data, indent=1), encoding="utf-8")
+
+
+def test_load_index_reopened(repodata: Path) -> None:
+    index = _repodata.load_index([repodata])
+    assert _repodata.load_index([repodata]) is index
+    assert not index.available(NormalizedRequirement("numpy>2"))
+
+    # rewritten in place within the same process
+    _add_numpy(repodata, "2.1.0")
+    new = _repodata.load_index([repodata])
+    assert new is not index
+    assert new.available(NormalizedRequirement("numpy>2"))
+
+
+def test_session_tracks_repodata(repodata: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        f"""
+[project]
+name = "hello"
+dependencies = ["numpy>2"]
+
+[tool.pyproject2conda]
+repodata = ["{repodata.as_posix()}"]
+
+[tool.pyproject2conda.envs.base]
+style = "yaml"
+"""
+    )
+    session = Session(pyproject, default_pythons=["3.12"], header_cmd=None)
+    assert session.render("base").pip_deps == ("numpy>2",)
+    assert not session.refresh()
+
+    _add_numpy(repodata, "2.1.0")
+    assert session.is_stale()
+    assert session.refresh()
+    out = session.render("base")
+    assert out.pip_deps == ()
+    assert "numpy>2" in out.conda_deps
+
+
+def test_routing(repodata: Path) -> None:
+    d = RequirementsConfig.from_string(
+        """
+[project]
+name = "hello"
+requires-python = ">=3.10"
+dependencies = ["numpy>=2", "missing", "mapped"]
+
+[tool.pyproject2conda.dependencies]
+mapped = { channel = "conda-forge" }
+"""
+    )
+    index = _repodata.load_index([repodata])
+    conda, pip = d.conda_and_pip_requirements(
+        python_include="infer", available=index.available
+    )
+    assert sorted(map(str, conda)) == [
+        "conda-forge::mapped",
+        "numpy>=2",
+        "pip",
+        "python>=3.10",
+    ]
+    assert sorted(map(str, pip)) == ["missing"]
+
+
+def test_cli(repodata: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        f"""
+[project]
+name = "hello"
+dependencies = ["numpy>2", "ruamel.yaml"]
+
+[tool.pyproject2conda]
+repodata = ["{repodata.as_posix()}"]
+"""
+    )
+    runner = CliRunner()
+    result = runner.invoke(app, ["yaml", "--pyproject", str(pyproject), "--no-header"])
+    assert result.exit_code == 0, result.output
+    assert "  - pip:\n      - numpy>2\n" in result.stdout
+    assert "  - ruamel-yaml\n" in result.stdout
+
+    result = runner.invoke(app, ["json", "--pyproject", str(pyproject)])
+    assert json.loads(result.stdout)["pip"] == ["numpy>2"]
+
+
+@pytest.mark.parametrize(
+    ("constraint", "python", "expected"),
+    [
+        ("", "3.10", True),
+        (">=3.12,<3.13.0a0", "3.12", True),
+        (">=3.12,<3.13.0a0", "3.13", False),
+        ("3.10.*", "3.10", True),
+        ("3.10", "3.11", False),
+        ("=3.11", "3.11", True),
+        ("<3.9|>=3.12", "3.10", False),
+        ("<3.9|>=3.12", "3.13", True),
+        ("not a version", "3.10", True),
+    ],
+)
+def test_python_matches(constraint: str, python: str, expected: bool) -> None:
+    assert _repodata.python_matches(constraint, python) is expected
+
+
+def test_pin(repodata: Path, caplog: pytest.LogCaptureFixture) -> None:
+    index = _repodata.load_index([repodata])
+
+    def select(req: str, python: str | None = None, strategy: str = "highest") -> str:
+        return str(index.select(NormalizedRequirement(req), python, strategy))
+
+    assert select("numpy") == "2.0.0"
+    assert select("numpy", "3.11") == "1.26.4"
+    assert select("numpy", strategy="lowest") == "1.26.4"
+    assert select("numpy>=2", "3.11") == "None"
+
+    pinned = index.pin(
+        {
+            CondaRequirement("conda-forge::numpy"),
+            CondaRequirement("ruamel.yaml"),
+            CondaRequirement("python>=3.10"),
+            CondaRequirement("missing"),
+        },
+        python_version="3.12",
+    )
+    assert sorted(map(str, pinned)) == [
+        "conda-forge::numpy==2.0.0",
+        "missing",
+        "python>=3.10",
+        "ruamel-yaml==0.18.0",
+    ]
+    assert "Not pinned (no matching version in repodata): missing" in caplog.text
+
+
+def test_cli_pin_strategy(repodata: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["numpy", "ruamel.yaml<1"]
+"""
+    )
+    args = ["yaml", "--pyproject", str(pyproject), "--no-header", "-p", "3.11"]
+    runner = CliRunner()
+    result = runner.invoke(
+        app, [*args, "--repodata", str(repodata), "--pin-strategy", "highest"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout == (
+        "dependencies:\n  - python=3.11\n  - numpy==1.26.4\n  - ruamel-yaml==0.18.0\n"
+    )
+
+    result = runner.invoke(app, [*args, "--pin-strategy", "lowest"])
+    assert isinstance(result.exception, ValueError)
+
+
+def test_cli_cache_refreshed_repodata(repodata: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        f"""
+[project]
+name = "hello"
+dependencies = ["numpy>2"]
+
+[tool.pyproject2conda]
+repodata = ["{repodata.as_posix()}"]
+header = false
+
+[tool.pyproject2conda.envs.base]
+style = "yaml"
+"""
+    )
+    args = ["project", "--pyproject", str(pyproject), "--cache-dir", "cache"]
+    args.extend(["-w", "force"])
+    runner = CliRunner()
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0, result.output
+    assert (example_path / "base.yaml").read_text() == (
+        "dependencies:\n  - pip\n  - pip:\n      - numpy>2\n"
+    )
+
+    # refresh snapshot in place (new process, so no in-memory index)
+    data = json.loads(json.dumps(REPODATA))
+    data["packages.conda"]["numpy-2.1.0-0.conda"] = {
+        "name": "numpy",
+        "version": "2.1.0",
+    }
+    repodata.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    _repodata.clear_cache()
+
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0, result.output
+    assert (example_path / "base.yaml").read_text() == ("dependencies:\n  - numpy>2\n")
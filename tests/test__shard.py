@@ -0,0 +1,71 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import pytest
+
+from pyproject2conda._shard import Manifest, Shard, merge_manifests, partition
+
+
+def test_shard_parse() -> None:
+    assert Shard.parse("3/8") == Shard(3, 8)
+    assert str(Shard(3, 8)) == "3/8"
+    for value in ("3", "a/b", "0/2", "3/2"):
+        with pytest.raises(ValueError, match="Shard"):
+            Shard.parse(value)
+
+
+def test_partition() -> None:
+    costs = {"a": 5.0, "b": 4.0, "c": 3.0, "d": 3.0, "e": 1.0}
+    bins = partition(costs, 2)
+    assert sorted(x for b in bins for x in b) == sorted(costs)
+    assert sorted(sum(costs[x] for x in b) for b in bins) == [8.0, 8.0]
+    # deterministic and independent of input order
+    assert partition(dict(reversed(costs.items())), 2) == bins
+    assert partition(costs, 8)[5:] == [[], [], []]
+
+    selected = [Shard(i, 3).select(costs) for i in (1, 2, 3)]
+    assert sorted(x for s in selected for x in s) == sorted(costs)
+
+
+def _manifest(shard: str, items: dict[str, str]) -> Manifest:
+    return Manifest(
+        kind="project",
+        planned=["a", "b"],
+        items={k: {"files": {k: v}} for k, v in items.items()},
+        shards=[shard],
+    )
+
+
+def test_merge_manifests() -> None:
+    merged, problems = merge_manifests([
+        _manifest("1/2", {"a": "x"}),
+        Manifest.from_dict(_manifest("2/2", {"b": "y"}).to_dict()),
+    ])
+    assert problems == []
+    assert merged.shards == ["1/2", "2/2"]
+    assert set(merged.items) == {"a", "b"}
+
+    _, problems = merge_manifests([_manifest("1/2", {"a": "x"})])
+    assert problems == ["Missing shards 2/2", "Missing b"]
+
+    _, problems = merge_manifests([
+        _manifest("1/2", {"a": "x"}),
+        _manifest("2/2", {"a": "z", "b": "y"}),
+        _manifest("2/2", {"b": "y", "c": "w"}),
+    ])
+    assert problems == [
+        "Conflicting results for a",
+        "Conflicting content for a",
+        "Shard 2/2 appears more than once",
+        "Unexpected c",
+    ]
+
+    other = _manifest("2/2", {"b": "y"})
+    other.planned = ["b"]
+    _, problems = merge_manifests([_manifest("1/2", {"a": "x"}), other])
+    assert problems[0] == "Manifest for shards ['2/2'] has a different plan"
+
+    assert merge_manifests([])[1] == ["No manifests"]
+
+    with pytest.raises(ValueError, match="version"):
+        Manifest.from_dict({"version": 0})
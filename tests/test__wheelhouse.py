@@ -0,0 +1,229 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from packaging.version import Version
+from typer.testing import CliRunner
+
+from pyproject2conda import _wheelhouse
+from pyproject2conda._normalized_requirements import NormalizedRequirement
+from pyproject2conda.cli import app
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+FILES = {
+    "athing-1.0-py3-none-any.whl": b"athing 1.0 wheel",
+    "athing-1.0.tar.gz": b"athing 1.0 sdist",
+    "athing-2.0-py3-none-any.whl": b"athing 2.0 wheel",
+    "athing-3.0rc1-py3-none-any.whl": b"athing 3.0rc1 wheel",
+    "B_Thing-0.1.zip": b"",
+    "notes.txt": b"not a distribution",
+}
+
+
+def _sha(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture
+def wheelhouse(tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "wheels"
+    path.mkdir()
+    for name, content in FILES.items():
+        (path / name).write_bytes(content)
+    _wheelhouse.clear_cache()
+    yield path
+    _wheelhouse.clear_cache()
+
+
+def test_parse_filename() -> None:
+    assert _wheelhouse.parse_filename(Path("a_b-1.0-py3-none-any.whl")) == (
+        "a-b",
+        Version("1.0"),
+    )
+    assert _wheelhouse.parse_filename(Path("A.b-2.0.tar.gz")) == ("a-b", Version("2.0"))
+    assert _wheelhouse.parse_filename(Path("bad.whl")) is None
+    assert _wheelhouse.parse_filename(Path("notes.txt")) is None
+
+
+def test_file_hashes(
+    wheelhouse: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    paths = sorted(wheelhouse.iterdir())
+    db = tmp_path / "hashes.sqlite"
+    expected = {path: _sha(path.read_bytes()) for path in paths}
+    assert _wheelhouse.file_hashes(paths, db) == expected
+    assert _wheelhouse.sha256(wheelhouse / "B_Thing-0.1.zip") == _sha(b"")
+
+    # cached by path, size, and mtime
+    hashed: list[Path] = []
+
+    def sha256(path: Path) -> str:
+        hashed.append(path)
+        return _sha(path.read_bytes())
+
+    monkeypatch.setattr(_wheelhouse, "sha256", sha256)
+    assert _wheelhouse.file_hashes(paths, db) == expected
+    assert not hashed
+
+    changed = wheelhouse / "athing-2.0-py3-none-any.whl"
+    changed.write_bytes(b"rebuilt")
+    assert _wheelhouse.file_hashes(paths, db)[changed] == _sha(b"rebuilt")
+    assert hashed == [changed]
+
+
+def test_pin(wheelhouse: Path, caplog: pytest.LogCaptureFixture) -> None:
+    house = _wheelhouse.load_wheelhouse(wheelhouse)
+    assert _wheelhouse.load_wheelhouse(wheelhouse) is house
+
+    reqs = [
+        NormalizedRequirement(r)
+        for r in ("athing<2", "b.thing; python_version < '3.20'", "missing")
+    ]
+    assert house.lines(house.pin(reqs)) == [
+        "athing==1.0",
+        'b-thing==0.1; python_version < "3.20"',
+        "missing",
+    ]
+    assert "missing" in caplog.text
+    assert house.lines(house.pin([NormalizedRequirement("athing")])) == ["athing==2.0"]
+
+    first, second = sorted(
+        _sha(FILES[name])
+        for name in ("athing-1.0-py3-none-any.whl", "athing-1.0.tar.gz")
+    )
+    assert house.lines(house.pin(reqs[:1]), hashes=True) == [
+        f"athing==1.0 \\\n    --hash=sha256:{first} \\\n    --hash=sha256:{second}"
+    ]
+    assert (wheelhouse / _wheelhouse.SIDECAR_NAME).exists()
+
+    # pip rejects files with any unhashed requirement
+    with pytest.raises(ValueError, match=r"without a distribution.*: missing"):
+        _ = house.lines(house.pin(reqs), hashes=True)
+
+
+def test_load_wheelhouse(wheelhouse: Path) -> None:
+    house = _wheelhouse.load_wheelhouse(wheelhouse)
+    _ = house.lines(house.pin([NormalizedRequirement("athing")]), hashes=True)
+    # hash database in the directory is not a distribution
+    assert (wheelhouse / _wheelhouse.SIDECAR_NAME).exists()
+    assert _wheelhouse.load_wheelhouse(wheelhouse) is house
+
+    (wheelhouse / "athing-4.0-py3-none-any.whl").write_bytes(b"athing 4.0 wheel")
+    new = _wheelhouse.load_wheelhouse(wheelhouse)
+    assert new is not house
+    assert new.signature != house.signature
+    assert str(new.select(NormalizedRequirement("athing"))) == "4.0"
+    assert len(_wheelhouse._WHEELHOUSES) == 1
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_cli_project_scans_once(
+    wheelhouse: Path, example_path: Path, cache: bool
+) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        f"""
+[project]
+name = "hello"
+dependencies = ["athing>=2"]
+
+[project.optional-dependencies]
+b = ["b-thing"]
+
+[tool.pyproject2conda]
+wheelhouse = "{wheelhouse.as_posix()}"
+header = false
+
+[tool.pyproject2conda.envs.base]
+style = ["requirements", "yaml"]
+
+[tool.pyproject2conda.envs.b]
+extras = ["b"]
+style = ["requirements", "yaml"]
+"""
+    )
+    args = ["project", "--pyproject", str(pyproject)]
+    if cache:
+        args.extend(["--cache-dir", str(example_path / "cache")])
+
+    with patch.object(_wheelhouse, "_scan", wraps=_wheelhouse._scan) as spy:
+        result = CliRunner().invoke(app, args)
+    assert result.exit_code == 0, result.output
+    assert spy.call_count == 1
+    assert (example_path / "b.txt").read_text() == "athing==2.0\nb-thing==0.1\n"
+
+
+def test_cli(wheelhouse: Path, example_path: Path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing>=2"]
+"""
+    )
+    args = ["requirements", "--pyproject", str(pyproject), "--no-header"]
+    runner = CliRunner()
+    result = runner.invoke(app, [*args, "--wheelhouse", str(wheelhouse), "--hashes"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout == (
+        "athing==2.0 \\\n"
+        f"    --hash=sha256:{_sha(FILES['athing-2.0-py3-none-any.whl'])}\n"
+    )
+
+    result = runner.invoke(app, [*args, "--hashes"])
+    assert isinstance(result.exception, ValueError)
+
+    # no matching distribution
+    other = example_path / "other.toml"
+    other.write_text(pyproject.read_text().replace('"athing>=2"', '"athing>=4"'))
+    args[2] = str(other)
+    result = runner.invoke(app, [*args, "--wheelhouse", str(wheelhouse), "--hashes"])
+    assert result.exit_code != 0
+    assert isinstance(result.exception, ValueError)
+
+
+@pytest.mark.parametrize("wheelhouse_option", [False, True])
+def test_cli_project_hashes(
+    wheelhouse: Path, example_path: Path, wheelhouse_option: bool
+) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing>=2"]
+
+[tool.pyproject2conda]
+hashes = true
+header = false
+
+[tool.pyproject2conda.envs.base]
+style = "requirements"
+"""
+    )
+    args = ["project", "--pyproject", str(pyproject)]
+    if wheelhouse_option:
+        args.extend(["--wheelhouse", str(wheelhouse)])
+    result = CliRunner().invoke(app, args)
+
+    if wheelhouse_option:
+        assert result.exit_code == 0, result.output
+        assert (example_path / "base.txt").read_text() == (
+            "athing==2.0 \\\n"
+            f"    --hash=sha256:{_sha(FILES['athing-2.0-py3-none-any.whl'])}\n"
+        )
+    else:
+        # same validation as the requirements command
+        assert isinstance(result.exception, ValueError)
+        assert "requires a wheelhouse" in str(result.exception)
+        assert not (example_path / "base.txt").exists()
@@ -0,0 +1,75 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+
+from pyproject2conda._schema import Dedupe
+from pyproject2conda._writer import OutputWriter, atomic_write, make_parents
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_no_dedupe(tmp_path: Path) -> None:
+    writer = OutputWriter()
+    assert writer.write("a\n", tmp_path / "a.txt") == "written"
+    assert writer.write("a\n", tmp_path / "b.txt") == "written"
+    assert not (tmp_path / "b.txt").samefile(tmp_path / "a.txt")
+
+
+@pytest.mark.parametrize("dedupe", [Dedupe.hardlink, Dedupe.symlink])
+def test_dedupe(dedupe: Dedupe, tmp_path: Path) -> None:
+    a, b, c = (tmp_path / f"{x}.txt" for x in "abc")
+    c.write_text("old\n")
+
+    writer = OutputWriter(dedupe=dedupe)
+    assert writer.write("a\n", a) == "written"
+    assert writer.write("a\n", b) == "linked"
+    assert writer.write("a\n", c) == "linked"
+    assert writer.write("other\n", tmp_path / "d.txt") == "written"
+
+    for path in (b, c):
+        assert path.samefile(a)
+        assert path.read_text() == "a\n"
+        assert path.is_symlink() == (dedupe == Dedupe.symlink)
+
+    # second pass keeps links, and writing new content to a link does not
+    # change the canonical file.
+    writer = OutputWriter(dedupe=dedupe)
+    assert writer.write("a\n", a) == "written"
+    assert writer.write("a\n", b) == "linked"
+    assert OutputWriter().write("new\n", c) == "written"
+    assert a.read_text() == "a\n"
+    assert c.read_text() == "new\n"
+    assert not c.is_symlink()
+
+
+def test_atomic_write(tmp_path: Path) -> None:
+    path = tmp_path / "requirements" / "a.txt"
+    atomic_write("a\n", path, fsync=True)
+    assert path.read_text() == "a\n"
+
+    # no temporary files left behind, and normal permissions
+    assert [p.name for p in path.parent.iterdir()] == ["a.txt"]
+    assert path.stat().st_mode & 0o644 == 0o644
+
+    # failure leaves original in place
+    def fail(tmp, content, **_):
+        tmp.write_text(content[:1])
+        raise OSError
+
+    with (
+        patch("pyproject2conda._writer._write_tmp", side_effect=fail),
+        pytest.raises(OSError),
+    ):
+        atomic_write("b\n", path)
+    assert path.read_text() == "a\n"
+    assert [p.name for p in path.parent.iterdir()] == ["a.txt"]
+
+
+def test_make_parents(tmp_path: Path) -> None:
+    make_parents([tmp_path / "a" / "x.txt", tmp_path / "a" / "y.txt", None])
+    assert (tmp_path / "a").is_dir()
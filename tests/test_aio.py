@@ -0,0 +1,129 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from pyproject2conda import (
+    Session,
+    async_render_project,
+    async_render_projects,
+    async_write_project,
+)
+from pyproject2conda import aio as mod
+from pyproject2conda.aio import _render_sync
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+
+def _make_monorepo(root: Path, count: int) -> list[Path]:
+    template = (ROOT / "test-pyproject-groups.toml").read_text(encoding="utf-8")
+    paths: list[Path] = []
+    for i in range(count):
+        project = root / f"pkg{i}"
+        project.mkdir()
+        path = project / "pyproject.toml"
+        path.write_text(
+            template.replace('name = "hello"', f'name = "pkg{i}"').replace(
+                '"pandas"', f'"pandas>={i}"'
+            )
+            + dedent(f"""
+            [tool.pyproject2conda.envs.local]
+            groups = "test"
+            template-python = "{project}/py{{py}}-{{env}}"
+            """),
+            encoding="utf-8",
+        )
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def monorepo(tmp_path: Path) -> list[Path]:
+    return _make_monorepo(tmp_path, 12)
+
+
+def test_async_render_project(monorepo) -> None:
+    path = monorepo[3]
+    expected = list(Session(path, default_pythons=["3.10"]).iter_outputs())
+    result = asyncio.run(async_render_project(path, default_pythons=["3.10"]))
+    assert result == expected
+    assert any("pandas>=3" in out.conda_deps for out in result)
+
+
+def test_async_write_project(monorepo) -> None:
+    path = monorepo[0]
+    results = asyncio.run(
+        async_write_project(path, ["local"], default_pythons=["3.10"])
+    )
+    assert [(r.status, r.output) for r in results] == [
+        ("written", path.parent / "py310-local.yaml"),
+    ]
+    assert (path.parent / "py310-local.yaml").exists()
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2, 4, 8])
+def test_async_render_projects(
+    monorepo, max_concurrency, record_property, monkeypatch
+) -> None:
+    expected = {
+        path: list(Session(path, default_pythons=["3.10"]).iter_outputs())
+        for path in monorepo
+    }
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def counting(*args):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        try:
+            return _render_sync(*args)
+        finally:
+            with lock:
+                active -= 1
+
+    monkeypatch.setattr(mod, "_render_sync", counting)
+
+    async def main():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results = await async_render_projects(
+            monorepo, max_concurrency=max_concurrency, default_pythons=["3.10"]
+        )
+        elapsed = time.perf_counter() - start
+        done.set()
+        await task
+        return results, ticks, elapsed
+
+    results, ticks, elapsed = asyncio.run(main())
+
+    assert results == expected
+    assert list(results) == monorepo
+    # loop was never blocked for the whole run
+    assert ticks > len(monorepo)
+    assert peak <= max_concurrency
+
+    record_property("projects_per_second", len(monorepo) / elapsed)
+
+
+def test_async_render_projects_error(monorepo) -> None:
+    with pytest.raises(ValueError, match="max_concurrency"):
+        asyncio.run(async_render_projects(monorepo, max_concurrency=0))
@@ -804,3 +804,596 @@ def test_overwrite(filename, caplog) -> None:
                 f"Skipping requirements {path}. Pass `-w force` to force recreate output"
                 in caplog.text
             )
+
+
+def test_batch(filename, runner, tmp_path: Path) -> None:
+    commands = dedent(f"""\
+    # comment
+    yaml --pyproject {filename} -e test
+
+    p2c requirements --pyproject {filename} -e test -o {tmp_path}/test.txt --header
+    yaml --pyproject {filename} -e missing
+    """)
+    result = runner.invoke(app, ["batch"], input=commands)
+
+    assert result.exit_code == 1
+    expected = runner.invoke(app, ["yaml", "--pyproject", str(filename), "-e", "test"])
+    assert result.stdout == expected.stdout
+
+    lines = result.stderr.splitlines()
+    assert lines[0] == f"[exit 0] pyproject2conda yaml --pyproject {filename} -e test"
+    assert lines[1].startswith("[exit 0] pyproject2conda requirements")
+    assert lines[2].startswith("[exit 1] pyproject2conda yaml")
+    assert "missing" in lines[3]
+
+    # header reflects sub-command
+    assert (
+        f"$ pyproject2conda requirements --pyproject {filename} -e test -o"
+        in (tmp_path / "test.txt").read_text()
+    )
+
+
+@pytest.mark.parametrize("suffix", [".json", ".toml"])
+def test_batch_parallel(filename, runner, tmp_path: Path, suffix) -> None:
+    commands = [
+        [
+            "yaml",
+            "--pyproject",
+            str(filename),
+            "-e",
+            extra,
+            "-p",
+            python,
+            "-o",
+            str(tmp_path / f"batch-{extra}-{python}.yaml"),
+        ]
+        for extra in ("test", "dev", "dist-pypi")
+        for python in ("3.10", "3.11")
+    ]
+    # same output twice -> must run in order.
+    commands.extend((
+        [
+            "requirements",
+            "--pyproject",
+            str(filename),
+            "-o",
+            str(tmp_path / "reqs.txt"),
+        ],
+        [
+            "requirements",
+            "--pyproject",
+            str(filename),
+            "-e",
+            "test",
+            "-o",
+            str(tmp_path / "reqs.txt"),
+        ],
+    ))
+
+    path = tmp_path / f"commands{suffix}"
+    if suffix == ".json":
+        path.write_text(json.dumps(commands))
+    else:
+        path.write_text(
+            "commands = [\n"
+            + "".join(f"    {json.dumps(c)},\n" for c in commands)
+            + "]\n"
+        )
+
+    result = runner.invoke(app, ["batch", str(path), "-j", "4"])
+    assert result.exit_code == 0
+    assert result.stderr.count("[exit 0]") == len(commands)
+
+    for extra in ("test", "dev", "dist-pypi"):
+        for python in ("3.10", "3.11"):
+            expected = runner.invoke(
+                app,
+                [
+                    "yaml",
+                    "--pyproject",
+                    str(filename),
+                    "-e",
+                    extra,
+                    "-p",
+                    python,
+                    "--no-header",
+                ],
+            )
+            assert (
+                (tmp_path / f"batch-{extra}-{python}.yaml")
+                .read_text()
+                .endswith(expected.stdout)
+            )
+
+    # last requirements command wins
+    assert "pytest" in (tmp_path / "reqs.txt").read_text()
+
+
+def test_batch_nested(runner) -> None:
+    result = runner.invoke(app, ["batch"], input="batch\n")
+    assert result.exit_code == 1
+    assert "Cannot nest batch" in result.stderr
+
+
+@pytest.mark.parametrize("fname", ["test-pyproject.toml", "test-pyproject-groups.toml"])
+def test_project_ndjson(fname, runner, example_path) -> None:
+    filename = ROOT / fname
+    result = runner.invoke(
+        app, ["project", "--pyproject", str(filename), "--format", "ndjson"]
+    )
+    assert result.exit_code == 0
+    # nothing written
+    assert not list(example_path.iterdir())
+
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(r["env"], r["style"], r["python"]) for r in records] == [
+        ("base", "requirements", None),
+        ("test-extras", "yaml", "3.10"),
+        ("test-extras", "yaml", "3.11"),
+        ("test-extras", "requirements", None),
+        ("test", "yaml", "3.10"),
+        ("test", "yaml", "3.11"),
+        ("dev", "yaml", "3.10"),
+        ("dist-pypi", "yaml", "3.10"),
+    ]
+
+    # consistent with single json command
+    test_311 = records[5]
+    assert test_311["output"] == "py311-test.yaml"
+    expected = json.loads(
+        runner.invoke(
+            app,
+            [
+                "json",
+                "--pyproject",
+                str(filename),
+                "--extra-or-group",
+                "test",
+                "-p",
+                "3.11",
+            ],
+        ).stdout
+    )
+    assert {k: test_311[k] for k in expected} == expected
+
+    assert records[0]["pip"] == ["athing", "bthing", 'cthing; python_version < "3.10"']
+
+
+def test_project_multi_style(runner, example_path) -> None:
+    from pyproject2conda.requirements import RequirementsConfig
+
+    text = (ROOT / "test-pyproject.toml").read_text(encoding="utf-8")
+    (example_path / "pyproject.toml").write_text(
+        text.replace(
+            '[tool.pyproject2conda.envs.base]\nstyle = [ "requirements" ]',
+            '[tool.pyproject2conda.envs.base]\nstyle = [ "requirements" ]\n\n'
+            '[tool.pyproject2conda.envs."dev-all"]\n'
+            'extras-or-groups = "dev"\n'
+            'style = [ "yaml", "json", "conda-requirements" ]',
+        ),
+        encoding="utf-8",
+    )
+
+    calls = []
+    original = RequirementsConfig.conda_and_pip_requirements
+
+    def counted(self, **kwargs):
+        calls.append(kwargs)
+        return original(self, **kwargs)
+
+    with patch.object(RequirementsConfig, "conda_and_pip_requirements", counted):
+        result = runner.invoke(
+            app,
+            [
+                "project",
+                "--pyproject",
+                str(example_path / "pyproject.toml"),
+                "--envs",
+                "dev-all",
+                "--no-header",
+                "--json-ext",
+                ".jsn",
+            ],
+        )
+    assert result.exit_code == 0
+    # single resolution for all three styles
+    assert len(calls) == 1
+
+    assert sorted(p.name for p in example_path.iterdir()) == [
+        "py310-dev-all-conda.txt",
+        "py310-dev-all-pip.txt",
+        "py310-dev-all.jsn",
+        "py310-dev-all.yaml",
+        "pyproject.toml",
+    ]
+
+    def expected(*args: str) -> str:
+        return cast(
+            "str",
+            runner.invoke(app, [*args, "--extra-or-group", "dev", "-p", "3.10"]).stdout,
+        )
+
+    assert (example_path / "py310-dev-all.yaml").read_text() == expected(
+        "yaml", "--no-header"
+    )
+    assert json.loads((example_path / "py310-dev-all.jsn").read_text()) == json.loads(
+        expected("json")
+    )
+    conda_reqs = expected("conda-requirements", "--no-header")
+    assert conda_reqs == (
+        "#conda requirements\n"
+        + (example_path / "py310-dev-all-conda.txt").read_text()
+        + "\n#pip requirements\n"
+        + (example_path / "py310-dev-all-pip.txt").read_text()
+    )
+
+    # dry run prints each output
+    result = runner.invoke(
+        app,
+        [
+            "project",
+            "--pyproject",
+            str(example_path / "pyproject.toml"),
+            "--envs",
+            "dev-all",
+            "--no-header",
+            "--dry",
+        ],
+    )
+    assert "# Creating json py310-dev-all.json" in result.stdout
+    assert "# Creating conda-requirements py310-dev-all-conda.txt" in result.stdout
+    assert conda_reqs in result.stdout
+
+
+def test_project_dedupe(runner, example_path) -> None:
+    text = (ROOT / "test-pyproject.toml").read_text(encoding="utf-8")
+    (example_path / "pyproject.toml").write_text(
+        text
+        + '\n[tool.pyproject2conda.envs."test-copy"]\n'
+        + 'extras = [ "test" ]\nskip-package = true\nstyle = [ "requirements" ]\n',
+        encoding="utf-8",
+    )
+    result = runner.invoke(
+        app,
+        [
+            "project",
+            "--pyproject",
+            str(example_path / "pyproject.toml"),
+            "--envs",
+            "test-extras",
+            "--envs",
+            "test-copy",
+            "--dedupe",
+            "symlink",
+        ],
+    )
+    assert result.exit_code == 0
+    assert (example_path / "test-copy.txt").is_symlink()
+    assert (example_path / "test-copy.txt").samefile(example_path / "test-extras.txt")
+    assert not (example_path / "py310-test-extras.yaml").is_symlink()
+
+
+def test_project_creates_directories(runner, example_path) -> None:
+    result = runner.invoke(
+        app,
+        [
+            "project",
+            "--pyproject",
+            str(ROOT / "test-pyproject.toml"),
+            "--template",
+            "requirements/{env}",
+            "--template-python",
+            "requirements/py{py}/{env}",
+            "--fsync",
+        ],
+    )
+    assert result.exit_code == 0
+    assert sorted(
+        str(p.relative_to(example_path)) for p in example_path.rglob("*.*")
+    ) == [
+        "requirements/base.txt",
+        "requirements/py310/dev.yaml",
+        "requirements/py310/dist-pypi.yaml",
+        "requirements/py310/test-extras.yaml",
+        "requirements/py310/test.yaml",
+        "requirements/py311/test-extras.yaml",
+        "requirements/py311/test.yaml",
+        "requirements/test-extras.txt",
+    ]
+
+
+def test_project_lock(runner, example_path, monkeypatch) -> None:
+    from pyproject2conda import _lock
+
+    monkeypatch.setenv(_lock.LOCK_DIR_ENV, str(example_path / "locks"))
+    args = ["project", "--pyproject", str(ROOT / "test-pyproject.toml")]
+
+    # claim from a concurrent invocation with same inputs that finished while we waited
+    with patch.object(_lock.Claim, "check_reusable", return_value=True):
+        result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert not list(example_path.glob("*.yaml"))
+
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert len(list(example_path.glob("*.yaml"))) == 6
+    assert (example_path / "locks" / "pyproject2conda-locks").is_dir()
+
+    with _lock.file_lock(_lock.lock_path(ROOT / "test-pyproject.toml")):
+        result = runner.invoke(app, [*args, "--lock-timeout", "0.01"])
+        assert isinstance(result.exception, TimeoutError)
+        # no lock
+        assert runner.invoke(app, [*args, "--no-lock"]).exit_code == 0
+
+
+@pytest.mark.parametrize("fname", ["test-pyproject.toml", "test-pyproject-groups.toml"])
+def test_check(fname, runner, example_path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text((ROOT / fname).read_text(encoding="utf-8"), encoding="utf-8")
+    args = ["--pyproject", str(pyproject)]
+
+    result = runner.invoke(app, ["check", *args, "--format", "json"])
+    assert result.exit_code == 1
+    summary = json.loads(result.stdout)
+    assert summary["checked"] == 8
+    assert {r["status"] for r in summary["stale"]} == {"missing"}
+
+    assert (
+        runner.invoke(app, ["project", *args, "--custom-command", "hello"]).exit_code
+        == 0
+    )
+    mtimes = {p: p.stat().st_mtime_ns for p in example_path.glob("*.*")}
+
+    result = runner.invoke(app, ["check", *args, "-j", "4"])
+    assert result.exit_code == 0
+    assert not result.stdout
+
+    # stale output
+    pyproject.write_text(
+        pyproject.read_text(encoding="utf-8").replace('"pandas"', '"polars"'),
+        encoding="utf-8",
+    )
+    (example_path / "py310-dev.yaml").unlink()
+    result = runner.invoke(app, ["check", *args])
+    assert result.exit_code == 1
+    assert "--- a/py310-test.yaml\n+++ b/py310-test.yaml\n" in result.stdout
+    assert "-  - pandas\n+  - polars\n" in result.stdout
+    assert "--- /dev/null\n+++ b/py310-dev.yaml\n" in result.stdout
+
+    result = runner.invoke(app, ["check", *args, "--format", "json"])
+    stale = {r["path"]: r["status"] for r in json.loads(result.stdout)["stale"]}
+    assert stale["py310-dev.yaml"] == "missing"
+    assert stale["py311-test.yaml"] == "stale"
+    assert "base.txt" not in stale
+
+    # nothing touched
+    del mtimes[pyproject]
+    del mtimes[example_path / "py310-dev.yaml"]
+    assert all(p.stat().st_mtime_ns == m for p, m in mtimes.items())
+
+
+def test_check_no_trailing_newline(runner, example_path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing"]
+
+[tool.pyproject2conda]
+header = false
+
+[tool.pyproject2conda.envs.base]
+style = ["json", "requirements"]
+""",
+        encoding="utf-8",
+    )
+    args = ["--pyproject", str(pyproject)]
+    assert runner.invoke(app, ["project", *args]).exit_code == 0
+
+    pyproject.write_text(
+        pyproject.read_text(encoding="utf-8").replace('"athing"', '"bthing"'),
+        encoding="utf-8",
+    )
+    result = runner.invoke(app, ["check", *args])
+    assert result.exit_code == 1
+    # json output has no trailing newline.  Following file header on own line.
+    assert result.stdout == (
+        "--- a/base.json\n+++ b/base.json\n@@ -1 +1 @@\n"
+        '-{"dependencies": ["athing"], "pip": []}\n'
+        "\\ No newline at end of file\n"
+        '+{"dependencies": ["bthing"], "pip": []}\n'
+        "\\ No newline at end of file\n"
+        "--- a/base.txt\n+++ b/base.txt\n@@ -1 +1 @@\n-athing\n+bthing\n"
+    )
+
+
+def test_plan(runner, example_path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        (ROOT / "test-pyproject.toml").read_text(encoding="utf-8"), encoding="utf-8"
+    )
+    (example_path / ".python-version").write_text("3.10\n")
+    args = ["plan", "--pyproject", str(pyproject), "--template", "reqs/{env}"]
+
+    result = runner.invoke(app, [*args, "--format", "json"])
+    assert result.exit_code == 0
+    plan = json.loads(result.stdout)
+    assert plan["inputs"] == [str(pyproject), ".python-version"]
+    outputs = {r["output"]: r for r in plan["outputs"]}
+    assert len(outputs) == 8
+    assert outputs["reqs/base.txt"]["command"][-2:] == ["--envs", "base"]
+    assert "--template" in outputs["reqs/base.txt"]["command"]
+
+    # running each command creates exactly the planned outputs
+    for command in {tuple(r["command"]) for r in plan["outputs"]}:
+        assert command[0] == "pyproject2conda"
+        assert runner.invoke(app, list(command[1:])).exit_code == 0
+    assert {
+        str(p.relative_to(example_path))
+        for p in example_path.rglob("*")
+        if p.is_file() and p.suffix in {".txt", ".yaml"}
+    } == set(outputs)
+
+    make = runner.invoke(app, [*args, "--format", "make"]).stdout
+    assert f"P2C_INPUTS := {pyproject} .python-version\n" in make
+    assert "\nreqs/base.txt &: $(P2C_INPUTS)\n\tpyproject2conda project " in make
+
+    ninja = runner.invoke(app, [*args, "--format", "ninja"]).stdout
+    assert "build reqs/base.txt: p2c " in ninja
+    assert "default p2c-all\n" in ninja
+
+    # prefix still resolves to project
+    result = runner.invoke(app, ["p", "--pyproject", str(pyproject), "--dry"])
+    assert result.exit_code == 0
+    assert "# Creating yaml py310-dev.yaml" in result.stdout
+
+
+def test_plan_mapping_files(runner, example_path) -> None:
+    pyproject = example_path / "pyproject.toml"
+    pyproject.write_text(
+        """
+[project]
+name = "hello"
+dependencies = ["athing"]
+
+[tool.pyproject2conda]
+mapping-files = ["mappings.toml"]
+
+[tool.pyproject2conda.envs.base]
+style = "yaml"
+""",
+        encoding="utf-8",
+    )
+    (example_path / "mappings.toml").write_text("athing = { pip = true }\n")
+    args = ["plan", "--pyproject", str(pyproject)]
+
+    result = runner.invoke(app, [*args, "--format", "json"])
+    assert result.exit_code == 0, result.output
+    inputs = json.loads(result.stdout)["inputs"]
+    assert inputs == [str(pyproject), str(example_path / "mappings.toml")]
+
+    # shared mapping table is a prerequisite of outputs
+    make = runner.invoke(app, [*args, "--format", "make"]).stdout
+    assert f"P2C_INPUTS := {pyproject} {example_path / 'mappings.toml'}\n" in make
+
+    # as are lockfiles and wheelhouses
+    (example_path / "uv.lock").write_text("version = 1\n")
+    (example_path / "wheels").mkdir()
+    result = runner.invoke(
+        app,
+        [*args, "--pin-from", "uv.lock", "--wheelhouse", "wheels", "--format", "json"],
+    )
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.stdout)["inputs"][-2:] == ["uv.lock", "wheels"]
+
+
+def test_plan_escape() -> None:
+    from pyproject2conda._plan import PlanOutput, PlanTarget, to_make, to_ninja
+
+    targets = [
+        PlanTarget(
+            "a", (PlanOutput("a", "yaml", None, "my dir/a.yaml"),), ("p2c", "$x")
+        )
+    ]
+    assert "my\\ dir/a.yaml &:" in to_make(["pyproject.toml"], targets)
+    assert "\tp2c '$$x'\n" in to_make(["pyproject.toml"], targets)
+    assert "build my$ dir/a.yaml: p2c" in to_ninja(["c:/pyproject.toml"], targets)
+    assert "p2c c$:/pyproject.toml" in to_ninja(["c:/pyproject.toml"], targets)
+
+
+def test_project_cache(runner, example_path) -> None:
+    args = [
+        "project",
+        "--pyproject",
+        str(ROOT / "test-pyproject.toml"),
+        "--envs",
+        "test-extras",
+        "--no-lock",
+        "--cache-dir",
+        str(example_path / "cache"),
+        "--cache-max-size",
+        "1M",
+    ]
+    assert runner.invoke(app, args).exit_code == 0
+    expected = {
+        path.name: path.read_text() for path in example_path.glob("*test-extras*")
+    }
+    assert len(expected) == 3
+    for path in example_path.glob("*test-extras*"):
+        path.unlink()
+
+    # served from cache
+    with patch(
+        "pyproject2conda.session.render_spec", side_effect=AssertionError("rendered")
+    ):
+        result = runner.invoke(app, args)
+    assert result.exit_code == 0, result.output
+    assert {
+        path.name: path.read_text() for path in example_path.glob("*test-extras*")
+    } == expected
+
+
+def test_project_shard(runner, example_path) -> None:
+    base = ["project", "--pyproject", str(ROOT / "test-pyproject.toml"), "--no-lock"]
+    assert runner.invoke(app, [*base, "--manifest", "full.json"]).exit_code == 0
+    expected = {
+        p.name: p.read_text() for p in example_path.glob("*.*") if p.suffix != ".json"
+    }
+    for path in expected:
+        (example_path / path).unlink()
+
+    manifests = []
+    for i in (1, 2, 3):
+        manifests.append(f"shard-{i}.json")
+        result = runner.invoke(
+            app, [*base, "--shard", f"{i}/3", "--manifest", manifests[-1]]
+        )
+        assert result.exit_code == 0
+    outputs = {
+        p.name: p.read_text() for p in example_path.glob("*.*") if p.suffix != ".json"
+    }
+    assert outputs == expected
+
+    shards = [json.loads((example_path / m).read_text())["items"] for m in manifests]
+    assert all(shards)
+    assert sum(len(s) for s in shards) == len(
+        json.loads((example_path / "full.json").read_text())["planned"]
+    )
+
+    result = runner.invoke(app, ["merge-manifests", *manifests, "-o", "merged.json"])
+    assert result.exit_code == 0, result.output
+    merged = json.loads((example_path / "merged.json").read_text())
+    full = json.loads((example_path / "full.json").read_text())
+    assert merged["items"] == full["items"]
+
+    result = runner.invoke(app, ["merge-manifests", *manifests[:2]])
+    assert result.exit_code == 1
+    assert "Missing shards 3/3" in result.stderr
+
+    result = runner.invoke(app, [*base, "--shard", "4/3"])
+    assert result.exit_code == 2
+
+
+def test_batch_shard(runner, example_path) -> None:
+    pyproject = str(ROOT / "test-pyproject.toml")
+    commands = example_path / "commands.txt"
+    commands.write_text(
+        "\n".join(
+            f"yaml --pyproject {pyproject} -e {extra} -o {extra}.yaml"
+            for extra in ("test", "dev", "dist-pypi", "dev-extras")
+        )
+        + "\n"
+    )
+    manifests = []
+    for i in (1, 2):
+        manifests.append(f"shard-{i}.json")
+        result = runner.invoke(
+            app,
+            ["batch", str(commands), "--shard", f"{i}/2", "--manifest", manifests[-1]],
+        )
+        assert result.exit_code == 0, result.output
+        assert result.stderr.count("[exit 0]") == 2
+    result = runner.invoke(app, ["merge-manifests", *manifests])
+    assert result.exit_code == 0, result.output
+    assert len(json.loads(result.stdout)["items"]) == 4
@@ -0,0 +1,198 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+# ruff:file-ignore[private-member-access]
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pyproject2conda import cli, session
+from pyproject2conda._config import PyProject2CondaConfig
+from pyproject2conda.cli import _clear_configs_cache, _get_configs
+from pyproject2conda.requirements import RequirementsConfig
+
+if TYPE_CHECKING:
+    from typing import Any
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+CALLS: list[dict[str, Any]] = [
+    {"groups": ["dev"], "python_version": "3.10"},
+    {"groups": ["optional-all"], "python_version": "3.9"},
+    {"extras": ["all"], "python_version": "3.8"},
+    {"groups": ["test", "dist-pypi"], "skip_package": True},
+    {"extras_or_groups": ["opt1", "dev-extras"], "python_version": "3.8"},
+    {"groups": ["dev"], "pip_only": True},
+]
+
+
+def _freeze(result):
+    conda_reqs, pip_reqs = result
+    return sorted(map(str, conda_reqs)), sorted(map(str, pip_reqs))
+
+
+def _run_concurrent(config, nthreads: int, repeat: int = 20):
+    barrier = threading.Barrier(nthreads)
+
+    def worker(offset: int):
+        barrier.wait()
+        out = []
+        for j in range(repeat):
+            index = (j + offset) % len(CALLS)
+            out.append((
+                index,
+                _freeze(config.conda_and_pip_requirements(**CALLS[index])),
+            ))
+        return out
+
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        return [r for rs in pool.map(worker, range(nthreads)) for r in rs]
+
+
+@pytest.fixture
+def expected():
+    config = RequirementsConfig.from_path(ROOT / "test-pyproject-groups.toml")
+    return [_freeze(config.conda_and_pip_requirements(**kws)) for kws in CALLS]
+
+
+@pytest.mark.parametrize("nthreads", [1, 2, 4, 8])
+def test_conda_and_pip_requirements_threads(nthreads, expected, record_property):
+    # fresh config each time so threads race to fill the resolver caches.
+    config = RequirementsConfig.from_path(ROOT / "test-pyproject-groups.toml")
+
+    start = time.perf_counter()
+    results = _run_concurrent(config, nthreads)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 20 * nthreads
+    for index, result in results:
+        assert result == expected[index]
+
+    # resolved cache is immutable once filled
+    assert all(
+        isinstance(v, frozenset) for v in config.dependency_groups.resolved.values()
+    )
+
+    record_property("calls_per_second", len(results) / elapsed)
+
+
+def test_get_env_threads() -> None:
+    config = PyProject2CondaConfig.from_string(
+        (ROOT / "test-pyproject-groups.toml").read_text(encoding="utf-8"),
+        default_pythons=["3.10"],
+    )
+    envs = list(config.schema.envs)
+    barrier = threading.Barrier(8)
+
+    def worker(_: int):
+        barrier.wait()
+        return [config.get_env(env) for env in envs]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(worker, range(8)))
+
+    # every thread sees the same cached instance
+    for result in results[1:]:
+        assert all(a is b for a, b in zip(result, results[0], strict=True))
+
+
+def test_get_configs_threads() -> None:
+    path = ROOT / "test-pyproject-groups.toml"
+    _clear_configs_cache()
+    barrier = threading.Barrier(8)
+
+    def worker(_: int):
+        barrier.wait()
+        return _get_configs(path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(worker, range(8)))
+
+    assert all(r is results[0] for r in results)
+
+
+def test_get_configs_reload_and_bound(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _clear_configs_cache()
+    monkeypatch.setattr(cli, "_CONFIGS_MAXSIZE", 2)
+    text = (ROOT / "test-pyproject.toml").read_text(encoding="utf-8")
+    paths = [tmp_path / f"pyproject-{i}.toml" for i in range(3)]
+    for path in paths:
+        path.write_text(text, encoding="utf-8")
+
+    first = _get_configs(paths[0])
+    assert _get_configs(paths[0]) is first
+
+    # edited file is reloaded
+    paths[0].write_text(text.replace('name = "hello"', 'name = "other-name"'))
+    edited = _get_configs(paths[0])
+    assert edited is not first
+    assert edited[0].package_name == "other-name"
+    assert len(cli._CONFIGS_CACHE) == 1
+
+    # least recently used are evicted
+    for path in paths[1:]:
+        _ = _get_configs(path)
+    assert list(cli._CONFIGS_CACHE) == paths[1:]
+    assert not cli._CONFIGS_LOADING
+    _clear_configs_cache()
+
+
+def test_get_configs_parallel_files(monkeypatch: pytest.MonkeyPatch) -> None:
+    _clear_configs_cache()
+    slow, fast = ROOT / "test-pyproject.toml", ROOT / "test-pyproject-groups.toml"
+    started, release = threading.Event(), threading.Event()
+
+    def load_configs(path: Path):
+        if path == slow:
+            started.set()
+            assert release.wait(10)
+        return session.load_configs(path)
+
+    monkeypatch.setattr(cli, "load_configs", load_configs)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow_future = pool.submit(_get_configs, slow)
+        assert started.wait(10)
+        try:
+            # other files load while ``slow`` is being parsed
+            _ = pool.submit(_get_configs, fast).result(timeout=5)
+        finally:
+            release.set()
+        _ = slow_future.result()
+    _clear_configs_cache()
+
+
+def test_get_configs_shared_lock(monkeypatch: pytest.MonkeyPatch) -> None:
+    _clear_configs_cache()
+    path = ROOT / "test-pyproject.toml"
+    started, release = threading.Event(), threading.Event()
+    loads: list[Path] = []
+
+    def load_configs(path: Path):
+        loads.append(path)
+        started.set()
+        assert release.wait(10)
+        return session.load_configs(path)
+
+    monkeypatch.setattr(cli, "load_configs", load_configs)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(_get_configs, path)
+        assert started.wait(10)
+        waiting = [pool.submit(_get_configs, path) for _ in range(3)]
+        deadline = time.monotonic() + 10
+        while cli._CONFIGS_LOADING[path][1] < 4:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in (first, *waiting)]
+
+    # late arrivals share the lock of the running load, so the file is parsed once
+    assert loads == [path]
+    assert all(r is results[0] for r in results)
+    assert not cli._CONFIGS_LOADING
+    _clear_configs_cache()
@@ -0,0 +1,175 @@
+# mypy: disable-error-code="no-untyped-def, no-untyped-call"
+from __future__ import annotations
+
+import filecmp
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pyproject2conda import Session
+from pyproject2conda.cli import app
+
+ROOT = Path(__file__).resolve().parent / "data"
+
+
+@pytest.fixture
+def pyproject(example_path: Path) -> Path:
+    path = example_path / "pyproject.toml"
+    shutil.copy(ROOT / "test-pyproject.toml", path)
+    return path
+
+
+@pytest.mark.parametrize("fname", ["test-pyproject.toml", "test-pyproject-groups.toml"])
+def test_write_all_matches_cli(fname, tmp_path: Path) -> None:
+    options = {
+        "template": f"{tmp_path}/session/{{env}}",
+        "template_python": f"{tmp_path}/session/py{{py}}-{{env}}",
+        "custom_command": "hello",
+    }
+    (tmp_path / "session").mkdir()
+    (tmp_path / "cli").mkdir()
+
+    session = Session(ROOT / fname, options=options, default_pythons=["3.10"])
+    results = session.write_all()
+    assert {r.status for r in results} == {"written"}
+
+    CliRunner().invoke(
+        app,
+        [
+            "project",
+            "--pyproject",
+            str(ROOT / fname),
+            "--template",
+            f"{tmp_path}/cli/{{env}}",
+            "--template-python",
+            f"{tmp_path}/cli/py{{py}}-{{env}}",
+            "--custom-command",
+            "hello",
+        ],
+    )
+
+    names = {p.name for p in (tmp_path / "cli").iterdir()}
+    assert names == {p.name for p in (tmp_path / "session").iterdir()}
+    for name in names:
+        assert filecmp.cmp(tmp_path / "cli" / name, tmp_path / "session" / name)
+
+    # second time, all up to date.
+    assert {r.status for r in session.write_all()} == {"skipped"}
+
+
+def test_render(pyproject: Path) -> None:
+    session = Session(pyproject, default_pythons=["3.10"])
+
+    out = session.render("test", python="3.11")
+    assert out is session.render("test", python="3.11")
+    assert out.output == Path("py311-test.yaml")
+    assert out.name is None
+    assert out.channels == ("conda-forge",)
+    assert out.conda_deps == (
+        "python=3.11",
+        "bthing-conda",
+        "conda-forge::pytest",
+        "pandas",
+        "pip",
+    )
+    assert out.pip_deps == ("athing",)
+    assert out.content is not None
+    assert out.content.startswith("#\n# This file is autogenerated by pyproject2conda.")
+    assert out.to_dict()["dependencies"] == list(out.conda_deps)
+
+    reqs = session.render("test-extras", style="requirements")
+    assert reqs.output == Path("test-extras.txt")
+    assert reqs.pip_deps == ("pandas", "pytest")
+
+    # other conda styles share resolution
+    as_json = session.render("test", python="3.11", style="json")
+    assert as_json.output == Path("py311-test.json")
+    assert as_json.conda_deps == out.conda_deps
+    cr = session.render("test", python="3.11", style="conda-requirements")
+    assert [p for p, _ in cr.files()] == [
+        Path("py311-test-conda.txt"),
+        Path("py311-test-pip.txt"),
+    ]
+    assert cr.to_dict()["output_pip"] == "py311-test-pip.txt"
+
+    # single default python
+    assert session.render("dev").python == "3.10"
+
+    with pytest.raises(ValueError, match=r"multiple python versions"):
+        session.render("test")
+
+    with pytest.raises(ValueError, match=r"unknown style"):
+        session.render("test", style="other")
+
+    assert [
+        (o.env, o.style, o.python) for o in session.iter_outputs(["test-extras"])
+    ] == [
+        ("test-extras", "yaml", "3.10"),
+        ("test-extras", "yaml", "3.11"),
+        ("test-extras", "requirements", None),
+    ]
+
+
+def test_no_header(pyproject: Path) -> None:
+    session = Session(pyproject, default_pythons=["3.10"], header_cmd=None)
+    out = session.render("base", style="requirements")
+    assert out.content == 'athing\nbthing\ncthing; python_version < "3.10"\n'
+
+
+def test_refresh(pyproject: Path) -> None:
+    session = Session(pyproject, default_pythons=["3.10"])
+    out = session.render("test", python="3.10")
+    digest = session.digest
+
+    # touch without changes -> not stale
+    stat = pyproject.stat()
+    os.utime(pyproject, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not session.is_stale()
+    assert not session.refresh()
+    assert session.render("test", python="3.10") is out
+
+    pyproject.write_text(
+        pyproject.read_text(encoding="utf-8").replace('"pandas"', '"polars"'),
+        encoding="utf-8",
+    )
+    assert session.is_stale()
+    assert session.refresh()
+    assert session.digest != digest
+
+    new = session.render("test", python="3.10")
+    assert "polars" in new.conda_deps
+    assert "pandas" not in new.conda_deps
+
+    session.invalidate()
+    assert session.render("test", python="3.10") is not new
+
+
+def test_tracks_python_version_file(pyproject: Path, example_path: Path) -> None:
+    (example_path / ".python-version").write_text("3.10\n")
+    session = Session(pyproject, options={"python": "default"})
+    assert session.render("dev").python == "3.10"
+
+    (example_path / ".python-version").write_text("3.11\n")
+    assert session.refresh()
+    assert session.render("dev").python == "3.11"
+
+
+@pytest.mark.parametrize("dedupe", ["hardlink", "symlink"])
+def test_write_all_dedupe(dedupe, pyproject: Path, example_path: Path) -> None:
+    pyproject.write_text(
+        pyproject.read_text(encoding="utf-8")
+        + '\n[tool.pyproject2conda.envs."test-copy"]\n'
+        + 'extras = [ "test" ]\nskip-package = true\nstyle = [ "requirements" ]\n',
+        encoding="utf-8",
+    )
+    session = Session(pyproject, default_pythons=["3.10"])
+    results = {
+        r.output: r.status
+        for r in session.write_all(["test-extras", "test-copy"], dedupe=dedupe)
+    }
+    assert results[Path("test-extras.txt")] == "written"
+    assert results[Path("test-copy.txt")] == "linked"
+    assert (example_path / "test-copy.txt").samefile(example_path / "test-extras.txt")